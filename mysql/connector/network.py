@@ -24,6 +24,7 @@
 """Module implementing low-level socket communication with MySQL servers.
 """
 
+import errno
 import os
 import socket
 import struct
@@ -66,7 +67,10 @@ class BaseMySQLSocket(object):
         self._packet_number = -1
         self._packet_queue = deque()
         self.recvsize = 8192
-    
+        self._recvbuf = None
+        self._recvstart = 0
+        self._recvend = 0
+
     @property
     def next_packet_number(self):
         self._packet_number = self._packet_number + 1
@@ -201,6 +205,127 @@ class BaseMySQLSocket(object):
                                         values=(self.get_address(), msg))
     recv = recv_plain
 
+    def set_buffered(self, recvsize=None, rcvbuf=None):
+        """Switch the socket to buffered receiving
+
+        Data is read with large recv_into() calls into a reusable receive
+        buffer of recvsize bytes and every complete packet found in it is
+        queued, so a stream of small packets costs one system call per
+        buffer fill instead of several per packet. When rcvbuf is given,
+        it is used as the SO_RCVBUF size of the socket.
+        """
+        if not self.sock:
+            raise errors.InterfaceError(errno=2048)
+        if recvsize:
+            self.recvsize = recvsize
+        if rcvbuf:
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                     rcvbuf)
+            except socket.error, err:
+                raise errors.InterfaceError(
+                    "Failed setting SO_RCVBUF; %s" % err)
+        self._recvbuf = bytearray(self.recvsize)
+        self._recvstart = 0
+        self._recvend = 0
+        self.recv = self.recv_buffered
+
+    def _split_recv_buffer(self):
+        """Queue all complete packets found in the receive buffer
+
+        Returns the total length of the first incomplete packet, or 0 when
+        its header was not received yet.
+        """
+        buf = self._recvbuf
+        start = self._recvstart
+        end = self._recvend
+        queue = self._packet_queue
+        packet_totlen = 0
+        while end - start >= 4:
+            packet_totlen = (buf[start] | (buf[start + 1] << 8)
+                             | (buf[start + 2] << 16)) + 4
+            if end - start < packet_totlen:
+                break
+            queue.append(str(buffer(buf, start, packet_totlen)))
+            self._packet_number = buf[start + 3]
+            start += packet_totlen
+            packet_totlen = 0
+        if start == end:
+            start = end = 0
+        self._recvstart = start
+        self._recvend = end
+        return packet_totlen
+
+    def _fill_recv_buffer(self, packet_totlen=0):
+        """Read once from the socket into the receive buffer
+
+        The pending bytes are moved to the front of the buffer first, and
+        the buffer grows when a single packet does not fit in it.
+
+        Returns the number of bytes read.
+        """
+        buf = self._recvbuf
+        start = self._recvstart
+        end = self._recvend
+        if start > 0:
+            buf[0:end - start] = buf[start:end]
+            end -= start
+            self._recvstart = 0
+            self._recvend = end
+        if packet_totlen > len(buf):
+            buf.extend('\x00' * (packet_totlen - len(buf)))
+        nbytes = self.sock.recv_into(memoryview(buf)[end:])
+        if not nbytes:
+            raise errors.InterfaceError(errno=2013)
+        self._recvend = end + nbytes
+        return nbytes
+
+    def recv_buffered(self):
+        """Receive packets from the MySQL server using the receive buffer"""
+        try:
+            return self._packet_queue.popleft()
+        except IndexError:
+            pass
+
+        try:
+            packet_totlen = self._split_recv_buffer()
+            while not self._packet_queue:
+                self._fill_recv_buffer(packet_totlen)
+                packet_totlen = self._split_recv_buffer()
+        except socket.timeout, err:
+            raise errors.InterfaceError(errno=2013)
+        except socket.error, err:
+            try:
+                msg = err.errno
+                if msg is None:
+                    msg = str(err)
+            except AttributeError:
+                msg = str(err)
+            raise errors.InterfaceError(errno=2055,
+                                        values=(self.get_address(), msg))
+        return self._packet_queue.popleft()
+
+    def recv_available(self):
+        """Receive the packets available without blocking
+
+        Meant for a non-blocking socket in buffered mode, or one known to
+        be readable: reads once into the receive buffer and returns the
+        list of complete packets, maybe empty. A partial packet stays in
+        the buffer until the next call.
+        """
+        try:
+            self._fill_recv_buffer(self._split_recv_buffer())
+        except socket.timeout, err:
+            pass
+        except socket.error, err:
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise errors.InterfaceError(errno=2055,
+                    values=(self.get_address(), err.errno or str(err)))
+        self._split_recv_buffer()
+        packets = list(self._packet_queue)
+        self._packet_queue.clear()
+        return packets
+
     def _split_zipped_payload(self, packet_bunch):
         """Split compressed payload"""
         while packet_bunch:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from source import Source
+from event import EVENT_HEADER_OFFSET
+from mysql.connector import errors
+import asyncore
+
+
+class _Dispatcher(asyncore.dispatcher):
+    """
+    asyncore side of an AsyncSource, watching its dump socket.
+    """
+    def __init__(self, source, sock, map):
+        asyncore.dispatcher.__init__(self, sock, map)
+        self._source = source
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        self._source._handle_read()
+
+    def handle_close(self):
+        self._source._finish()
+
+    def handle_error(self):
+        log.warning("dump socket error.", exc_info=True)
+        self._source._finish()
+
+
+class AsyncSource(Source):
+    """
+    Source driven by an asyncore loop instead of being iterated, so many
+    of them share one thread:
+
+        source = AsyncSource(handler, map=sources, **conf)
+        source.connect()
+        source.binlog_dump(log_file, offset)
+        ...
+        asyncore.loop(map=sources)
+
+    handler(event) is called with the events as they are received, and
+    handler(None) once at the end of the stream. Subclasses may override
+    handle_event() and handle_end() instead. Connecting and sending the
+    dump still block, the stream is then read without blocking, through
+    the receive buffer, recv_buffer_size cannot be 0.
+    """
+    def __init__(self, handler=None, map=None, **kwargs):
+        if not kwargs.get("recv_buffer_size", 1):
+            raise ValueError("AsyncSource reads through the receive buffer, "
+                             "recv_buffer_size cannot be 0.")
+        super(AsyncSource, self).__init__(**kwargs)
+        self._handler = handler
+        self._map = map
+        self._dispatcher = None
+
+    def binlog_dump(self, log_file=None, offset=None):
+        super(AsyncSource, self).binlog_dump(log_file, offset)
+        self._start()
+
+    def _start(self):
+        self._dispatcher = _Dispatcher(self, self._socket.sock, self._map)
+        # events may have come in with the dump response.
+        self._handle_read()
+
+    def disconnect(self):
+        if self._dispatcher is not None:
+            self._dispatcher.del_channel()
+            self._dispatcher = None
+        super(AsyncSource, self).disconnect()
+
+    def handle_event(self, event):
+        if self._handler is not None:
+            self._handler(event)
+
+    def handle_end(self):
+        if self._handler is not None:
+            self._handler(None)
+
+    def _handle_read(self):
+        try:
+            packets = self._socket.recv_available()
+        except errors.Error:
+            log.warning("read failed.", exc_info=True)
+            self._finish()
+            return
+        for packet in packets:
+            if packet[4] == '\xfe' or packet[4] == '\xff':
+                log.debug("received eof or err packet.")
+                self._finish()
+                return
+            event = self._make_event(packet, EVENT_HEADER_OFFSET)
+            if event is None:
+                continue
+            self.handle_event(event)
+            # the handler is done with the events up to the boundary.
+            if self._boundary is not None:
+                if self._checkpoint is not None:
+                    self._checkpoint.save(*self._boundary)
+                self._boundary = None
+
+    def _finish(self):
+        if self._dispatcher is None:
+            return
+        self._dispatcher.del_channel()
+        self._dispatcher = None
+        self.handle_end()
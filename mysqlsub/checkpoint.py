@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+import json
+import os
+import time
+
+
+class Checkpoint(object):
+    """
+    Binlog position (log_file, log_pos) kept in a file to resume a dump
+    from after a restart.
+
+    save() is called at every transaction boundary but the file is only
+    written and fsynced every sync_every saves or once sync_interval
+    seconds passed since the last sync, whichever comes first. A crash
+    replays at most the transactions saved since. The file is replaced
+    by rename, it holds either the previous or the new position. While
+    the stream is idle, the source calls tick() on every heartbeat, its
+    heartbeat period being no longer than sync_interval.
+    """
+    def __init__(self, path, sync_every=1, sync_interval=None):
+        self._path = path
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._pending = 0
+        self._last_sync = time.time()
+        self.log_file = None
+        self.log_pos = None
+
+    def load(self):
+        """
+        Read the last durable position, None when there is none.
+        """
+        if not os.path.exists(self._path):
+            return None
+        f = open(self._path, "rb")
+        try:
+            position = json.loads(f.read())
+        finally:
+            f.close()
+        self.log_file = str(position["log_file"])
+        self.log_pos = position["log_pos"]
+        return (self.log_file, self.log_pos)
+
+    def save(self, log_file, log_pos):
+        """
+        Record a position, syncing it to disk if the batch is full.
+        """
+        self.log_file = log_file
+        self.log_pos = log_pos
+        self._pending += 1
+        if self._pending >= self._sync_every:
+            self.sync()
+        else:
+            self.tick()
+
+    def tick(self):
+        """
+        Sync the saves pending since sync_interval seconds or more.
+        """
+        if self._pending and self._sync_interval is not None and \
+           time.time() - self._last_sync >= self._sync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Make the last recorded position durable.
+        """
+        if not self._pending:
+            return
+        tmp = self._path + ".tmp"
+        f = open(tmp, "wb")
+        try:
+            f.write(json.dumps({"log_file":self.log_file,
+                                "log_pos":self.log_pos}))
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        os.rename(tmp, self._path)
+        # the rename itself is only durable once the directory is synced.
+        fd = os.open(os.path.dirname(os.path.abspath(self._path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._pending = 0
+        self._last_sync = time.time()
+        log.debug("checkpoint %s:%d synced.", self.log_file, self.log_pos)
+
+    def close(self):
+        self.sync()
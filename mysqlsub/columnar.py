@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+import array
+import itertools
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ColumnBatch(object):
+    """
+    Rows of rows events of one table gathered column by column, for
+    consumers working on columns rather than rows.
+
+    Numeric columns go to array.array of their type, the others to
+    lists. Every column has a null mask, an array.array('B') with 1 for
+    the NULL rows, whose slots hold 0 in the typed arrays and None in
+    the lists. Events leaving out a column (a minimal row image) add
+    NULLs to it. A column whose typecode changes from an event to the
+    next, after an ALTER TABLE, becomes a list.
+    """
+    def __init__(self):
+        self.schema = None
+        self.table = None
+        self._size = 0
+        self._columns = {}
+
+    def __len__(self):
+        return self._size
+
+    def add(self, event, before=False):
+        """
+        Add the rows of a rows event, the before images of an update
+        when before is true.
+        """
+        names, typecodes, rows = event.row_values(before)
+        if event.schema is None:
+            # no table map, nothing decoded.
+            return
+        if self.schema is None:
+            self.schema = event.schema
+            self.table = event.table
+        elif (self.schema, self.table) != (event.schema, event.table):
+            raise ValueError("rows of %s.%s added to a batch of %s.%s"
+                             % (event.schema, event.table, self.schema,
+                                self.table))
+        count = len(rows)
+        if not count:
+            return
+        for name, typecode, values in zip(names, typecodes, zip(*rows)):
+            column = self._columns.get(name)
+            if column is None:
+                column = self._new_column(typecode, name)
+            elif isinstance(column[0], array.array) and \
+                 column[0].typecode != typecode:
+                column = self._to_list(name, column)
+            self._extend(column, values)
+        for name, column in self._columns.items():
+            if name not in names:
+                self._pad(column, count)
+        self._size += count
+
+    def _new_column(self, typecode, name):
+        values = []
+        if typecode is not None:
+            values = array.array(typecode)
+        column = (values, array.array('B'))
+        self._pad(column, self._size)
+        self._columns[name] = column
+        return column
+
+    def _to_list(self, name, column):
+        values, nulls = column
+        values = [None if null else value
+                  for (value, null) in itertools.izip(values, nulls)]
+        column = (values, nulls)
+        self._columns[name] = column
+        return column
+
+    def _pad(self, column, count):
+        values, nulls = column
+        values.extend([0 if isinstance(values, array.array) else None] *
+                      count)
+        nulls.fromstring('\x01' * count)
+
+    def _extend(self, column, values):
+        data, nulls = column
+        if None not in values:
+            data.extend(values)
+            nulls.fromstring('\x00' * len(values))
+            return
+        nulls.extend(map(operator.is_, values,
+                         itertools.repeat(None, len(values))))
+        if isinstance(data, array.array):
+            values = [0 if v is None else v for v in values]
+        data.extend(values)
+
+    def columns(self, use_numpy=None):
+        """
+        Get the columns as a dict of name to (values, null mask).
+
+        With use_numpy, or when it is None and NumPy is installed, they
+        are copied to NumPy arrays, the lists to arrays of objects and
+        the masks to arrays of booleans.
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        if not use_numpy:
+            return dict([(name, (values, nulls)) for (name, (values, nulls))
+                         in self._columns.items()])
+        res = {}
+        for name, (values, nulls) in self._columns.items():
+            if isinstance(values, array.array):
+                values = numpy.frombuffer(values, values.typecode).copy()
+            else:
+                objects = numpy.empty(len(values), object)
+                objects[:] = values
+                values = objects
+            res[name] = (values,
+                         numpy.frombuffer(nulls, numpy.bool_).copy())
+        return res
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from mysql.connector.constants import FieldType
+from constants import ColumnType
+import utils
+import array
+import datetime
+import struct
+
+
+"""
+Row image of a rows event.
++============================================+
+| null bitmap      |  (present columns + 7) / 8 |
+|                  +-------------------------+
+| values           |  present, non NULL     X |
+|                  |  columns in order        |
++============================================+
+NULL columns take no room at all in the values part.
+"""
+
+"""
+Fractional temporal types of 5.6, big-endian, followed by (fsp + 1) / 2
+bytes of fractional seconds.
++============================================+
+| DATETIME2        |  sign               1 bit |
+|  5 bytes         |  year * 13 + month  17   |
+|                  |  day                 5   |
+|                  |  hour                5   |
+|                  |  minute              6   |
+|                  |  second              6   |
++============================================+
+| TIME2            |  sign               1 bit |
+|  3 bytes         |  unused              1   |
+|                  |  hour               10   |
+|                  |  minute              6   |
+|                  |  second              6   |
++============================================+
+| TIMESTAMP2       |  seconds since epoch     |
+|  4 bytes         |                          |
++============================================+
+The sign bit is set for positive values, they are stored plus
+DATETIMEF_INT_OFS and TIMEF_INT_OFS.
+"""
+DATETIMEF_INT_OFS = 0x8000000000
+TIMEF_INT_OFS = 0x800000
+TIMEF_OFS = 0x800000000000
+
+# big-endian format of the fractional seconds by fsp and the microseconds
+# of its unit. 3 bytes fractions take a layout of their own.
+_FRACTIONS = [('', 0), ('B', 10000), ('B', 10000), ('H', 100), ('H', 100),
+              (None, 1), (None, 1)]
+
+def _int24(low, high):
+    return low | (high << 16)
+
+def _year(year):
+    return year + 1900
+
+def _time(low, high):
+    return utils.to_time(low | (high << 16))
+
+def _date(low, high):
+    return utils.to_date(low | (high << 16))
+
+def _datetime2_value(intpart, usec):
+    ymd = intpart >> 17
+    ym = ymd >> 5
+    hms = intpart & 0x1ffff
+    try:
+        return datetime.datetime(ym / 13, ym % 13, ymd & 0x1f, hms >> 12,
+                                 (hms >> 6) & 0x3f, hms & 0x3f, usec)
+    except ValueError:
+        # zero dates.
+        return None
+
+def _datetime2(fsp):
+    """
+    (size, converter) of a DATETIME2(fsp) column, its layout chosen once.
+    """
+    fmt, scale = _FRACTIONS[fsp]
+    if fmt is None:
+        unpack = struct.Struct('>Q').unpack
+        def convert(raw):
+            value = unpack(raw)[0]
+            return _datetime2_value((value >> 24) - DATETIMEF_INT_OFS,
+                                    value & 0xffffff)
+        return (8, convert)
+    layout = struct.Struct('>BI' + fmt)
+    unpack = layout.unpack
+    if not fmt:
+        def convert(raw):
+            high, low = unpack(raw)
+            return _datetime2_value(((high << 32) | low) - DATETIMEF_INT_OFS,
+                                    0)
+        return (layout.size, convert)
+    def convert(raw):
+        high, low, frac = unpack(raw)
+        return _datetime2_value(((high << 32) | low) - DATETIMEF_INT_OFS,
+                                frac * scale)
+    return (layout.size, convert)
+
+def _time2_value(packed):
+    """
+    timedelta of a packed TIME2, (hms << 24) + microseconds signed as
+    the time. TIME ranges over +-838 hours, a datetime.time cannot hold
+    it.
+    """
+    if packed < 0:
+        return -_time2_value(-packed)
+    hms = packed >> 24
+    return datetime.timedelta(0, ((hms >> 12) & 0x3ff) * 3600 +
+                                 ((hms >> 6) & 0x3f) * 60 + (hms & 0x3f),
+                              packed & 0xffffff)
+
+def _time2(fsp):
+    """
+    (size, converter) of a TIME2(fsp) column, its layout chosen once.
+    Negative times with a fraction have it stored complemented, counted
+    from the next integral value.
+    """
+    fmt, scale = _FRACTIONS[fsp]
+    if fmt is None:
+        unpack = struct.Struct('>HI').unpack
+        def convert(raw):
+            high, low = unpack(raw)
+            return _time2_value(((high << 32) | low) - TIMEF_OFS)
+        return (6, convert)
+    layout = struct.Struct('>HB' + fmt)
+    unpack = layout.unpack
+    if not fmt:
+        def convert(raw):
+            high, low = unpack(raw)
+            return _time2_value((((high << 8) | low) - TIMEF_INT_OFS) << 24)
+        return (layout.size, convert)
+    wrap = 0x100 if fmt == 'B' else 0x10000
+    def convert(raw):
+        high, low, frac = unpack(raw)
+        intpart = ((high << 8) | low) - TIMEF_INT_OFS
+        if intpart < 0 and frac:
+            intpart += 1
+            frac -= wrap
+        return _time2_value((intpart << 24) + frac * scale)
+    return (layout.size, convert)
+
+def _timestamp2(fsp):
+    """
+    (size, converter) of a TIMESTAMP2(fsp) column, its layout chosen
+    once. Local times, as TIMESTAMP.
+    """
+    fromtimestamp = datetime.datetime.fromtimestamp
+    fmt, scale = _FRACTIONS[fsp]
+    if fmt is None:
+        unpack = struct.Struct('>IBH').unpack
+        def convert(raw):
+            seconds, high, low = unpack(raw)
+            return fromtimestamp(seconds).replace(
+                microsecond=(high << 16) | low)
+        return (7, convert)
+    layout = struct.Struct('>I' + fmt)
+    if not fmt:
+        return (4, lambda raw: fromtimestamp(layout.unpack(raw)[0]))
+    unpack = layout.unpack
+    def convert(raw):
+        seconds, frac = unpack(raw)
+        return fromtimestamp(seconds).replace(microsecond=frac * scale)
+    return (layout.size, convert)
+
+def _enum(values):
+    def convert(index):
+        if not values:
+            return index
+        if 0 < index <= len(values):
+            return values[index - 1]
+        return ""
+    return convert
+
+def _set(values):
+    def convert(raw):
+        bits = utils.BufferReader(raw).read_bitmap(len(raw))
+        return set([v for (b, v) in enumerate(values) if bits & (1 << b)])
+    return convert
+
+def _bits(bits):
+    def convert(raw):
+        return utils.to_bits(raw, bits)
+    return convert
+
+def _compile_column(schema, decimal_mode="decimal"):
+    """
+    Compile the decoding of one column from its table map schema,
+    DECIMAL columns to values of decimal_mode, see
+    utils.new_decimal_converter.
+
+    Returns (struct format, number of unpacked values, converter) for a
+    fixed width column and (None, length size, None) for a variable
+    one. The converter is None when the unpacked value is the result.
+    """
+    t = schema["REAL_TYPE"]
+    unsigned = schema["IS_UNSIGNED"]
+    if t == FieldType.TINY:
+        return ('B' if unsigned else 'b', 1, None)
+    elif t == FieldType.SHORT:
+        return ('H' if unsigned else 'h', 1, None)
+    elif t == FieldType.INT24:
+        return ('HB' if unsigned else 'Hb', 2, _int24)
+    elif t == FieldType.LONG:
+        return ('I' if unsigned else 'i', 1, None)
+    elif t == FieldType.LONGLONG:
+        return ('Q' if unsigned else 'q', 1, None)
+    elif t == FieldType.FLOAT:
+        return ('f', 1, None)
+    elif t == FieldType.DOUBLE:
+        return ('d', 1, None)
+    elif t == FieldType.YEAR:
+        return ('B', 1, _year)
+    elif t == FieldType.TIMESTAMP:
+        return ('I', 1, datetime.datetime.fromtimestamp)
+    elif t == FieldType.DATETIME:
+        return ('Q', 1, utils.to_datetime)
+    elif t == FieldType.TIME:
+        return ('HB', 2, _time)
+    elif t == FieldType.DATE:
+        return ('HB', 2, _date)
+    elif t == ColumnType.DATETIME2:
+        size, convert = _datetime2(schema["FSP"])
+        return ('%ds' % size, 1, convert)
+    elif t == ColumnType.TIME2:
+        size, convert = _time2(schema["FSP"])
+        return ('%ds' % size, 1, convert)
+    elif t == ColumnType.TIMESTAMP2:
+        size, convert = _timestamp2(schema["FSP"])
+        return ('%ds' % size, 1, convert)
+    elif t == FieldType.NEWDECIMAL:
+        precision = schema["PRECISION"]
+        decimals = schema["DECIMALS"]
+        size = utils.new_decimal_size(precision, decimals)
+        return ('%ds' % size, 1,
+                utils.new_decimal_converter(precision, decimals,
+                                            decimal_mode))
+    elif t == FieldType.ENUM:
+        fmt = 'B' if schema["SIZE"] == 1 else 'H'
+        return (fmt, 1, _enum(schema.get("ENUM_VALUES", [])))
+    elif t == FieldType.SET:
+        return ('%ds' % schema["SIZE"], 1, _set(schema.get("SET_VALUES", [])))
+    elif t == FieldType.BIT:
+        return ('%ds' % schema["BYTES"], 1, _bits(schema["BITS"]))
+    elif t == FieldType.VARCHAR or t == FieldType.STRING or \
+         t == FieldType.VAR_STRING:
+        return (None, 2 if schema["MAX_LENGTH"] > 255 else 1, None)
+    elif t == FieldType.BLOB or t == FieldType.GEOMETRY:
+        return (None, schema["LENGTH_SIZE"], None)
+    raise NotImplementedError("Unknown MySQL column type: %d" % (t))
+
+# array.array typecodes of the 64 bits integers, none when a C long is
+# narrower.
+_INT64, _UINT64 = ('l', 'L') if array.array('l').itemsize == 8 else \
+                  (None, None)
+
+# array.array typecodes of the numeric columns, signed and unsigned.
+_TYPECODES = {FieldType.TINY:('b', 'B'), FieldType.SHORT:('h', 'H'),
+              FieldType.INT24:('i', 'i'), FieldType.LONG:('i', 'I'),
+              FieldType.LONGLONG:(_INT64, _UINT64),
+              FieldType.FLOAT:('f', 'f'), FieldType.DOUBLE:('d', 'd'),
+              FieldType.YEAR:('H', 'H')}
+
+def column_typecode(schema, decimal_mode="decimal"):
+    """
+    array.array typecode holding the values of a column, None when they
+    are not numbers or do not fit one.
+    """
+    t = schema["REAL_TYPE"]
+    if t in _TYPECODES:
+        return _TYPECODES[t][bool(schema["IS_UNSIGNED"])]
+    if t == FieldType.NEWDECIMAL:
+        if decimal_mode == "float":
+            return 'd'
+        if decimal_mode == "int" and schema["PRECISION"] <= 18:
+            return _INT64
+    return None
+
+def _fixed_step(run):
+    """
+    Decoding step of consecutive fixed width columns. They are unpacked
+    together with one struct unless one of them is NULL in the row, the
+    columns left out of the row are pad bytes of that struct.
+
+    run is a list of (bit index, row index or None, struct format,
+    number of unpacked values, converter).
+    """
+    fields = []
+    formats = []
+    plan = []
+    start = 0
+    mask = 0
+    for (bit, index, fmt, n, convert) in run:
+        field = struct.Struct('<' + fmt)
+        mask |= 1 << bit
+        if index is None:
+            fields.append((bit, None, field.size, None, 0, None))
+            formats.append('%dx' % field.size)
+            continue
+        fields.append((bit, index, field.size, field, n, convert))
+        formats.append(fmt)
+        plan.append((index, start, n, convert))
+        start += n
+    merged = struct.Struct('<' + ''.join(formats))
+    size = merged.size
+
+    def slow_step(data, offset, nulls, row):
+        for bit, index, field_size, field, n, convert in fields:
+            if nulls & (1 << bit):
+                continue
+            if index is not None:
+                values = field.unpack_from(data, offset)
+                if convert is None:
+                    row[index] = values[0]
+                else:
+                    row[index] = convert(*values)
+            offset += field_size
+        return offset
+
+    if not plan:
+        def step(data, offset, nulls, row):
+            if nulls & mask:
+                return slow_step(data, offset, nulls, row)
+            return offset + size
+        return step
+
+    if all([n == 1 and convert is None for (_, _, n, convert) in plan]):
+        first = plan[0][0]
+        last = plan[-1][0] + 1
+        def step(data, offset, nulls, row):
+            if nulls & mask:
+                return slow_step(data, offset, nulls, row)
+            row[first:last] = merged.unpack_from(data, offset)
+            return offset + size
+        return step
+
+    def step(data, offset, nulls, row):
+        if nulls & mask:
+            return slow_step(data, offset, nulls, row)
+        values = merged.unpack_from(data, offset)
+        for index, start, n, convert in plan:
+            if convert is None:
+                row[index] = values[start]
+            else:
+                row[index] = convert(*values[start:start + n])
+        return offset + size
+    return step
+
+def _var_step(bit, index, length_size):
+    """
+    Decoding step of a column prefixed by its length. A column left out
+    of the row (index is None) is skipped without being copied.
+    """
+    bit = 1 << bit
+    if length_size == 3:
+        length = struct.Struct('<HB')
+        def step(data, offset, nulls, row):
+            if nulls & bit:
+                return offset
+            low, high = length.unpack_from(data, offset)
+            offset += 3
+            end = offset + (low | (high << 16))
+            if index is not None:
+                row[index] = data[offset:end]
+            return end
+        return step
+
+    length = struct.Struct({1:'<B', 2:'<H', 4:'<I'}[length_size])
+    if index is None:
+        def step(data, offset, nulls, row):
+            if nulls & bit:
+                return offset
+            return offset + length_size + \
+                   length.unpack_from(data, offset)[0]
+        return step
+
+    def step(data, offset, nulls, row):
+        if nulls & bit:
+            return offset
+        offset += length_size
+        end = offset + length.unpack_from(data, offset - length_size)[0]
+        row[index] = data[offset:end]
+        return end
+    return step
+
+
+class RowDecoder(object):
+    """
+    Decoding plan of the rows of a table, compiled once from its table
+    map and replayed for every row.
+
+    Runs of fixed width columns are merged into single struct formats,
+    so a row without NULL in a run reads the run with one unpack.
+    When projection, a collection of column names, is given the other
+    columns are only measured and skipped, never turned into values.
+    """
+    def __init__(self, column_schemas, present_bitmap=None, projection=None,
+                 decimal_mode="decimal"):
+        present = [i for i in range(len(column_schemas))
+                   if present_bitmap is None or (present_bitmap >> i) & 1]
+        self.columns = []
+        self.null_bitmap_size = (len(present) + 7) / 8
+        self._steps = []
+        run = []
+        for bit, i in enumerate(present):
+            schema = column_schemas[i]
+            index = None
+            if projection is None or schema.get("COLUMN_NAME") in projection:
+                index = len(self.columns)
+                self.columns.append(i)
+            fmt, n, convert = _compile_column(schema, decimal_mode)
+            if fmt is not None:
+                run.append((bit, index, fmt, n, convert))
+                continue
+            if run:
+                self._steps.append(_fixed_step(run))
+                run = []
+            self._steps.append(_var_step(bit, index, n))
+        if run:
+            self._steps.append(_fixed_step(run))
+        self.names = tuple([column_schemas[i].get("COLUMN_NAME", i)
+                            for i in self.columns])
+        self.typecodes = tuple([column_typecode(column_schemas[i],
+                                                decimal_mode)
+                                for i in self.columns])
+
+    def decode(self, reader):
+        """
+        Decode the row at the reader offset and move past it.
+
+        Returns the list of values of the present, projected columns.
+        """
+        nulls = reader.read_bitmap(self.null_bitmap_size)
+        row = [None] * len(self.columns)
+        data = reader.data
+        offset = reader.offset
+        for step in self._steps:
+            offset = step(data, offset, nulls, row)
+        reader.offset = offset
+        return row
+
+
+def get_decoder(table, present_bitmap):
+    """
+    Get the RowDecoder of a table map entry for a present columns bitmap,
+    compiled on first use and kept with the entry. The entry's
+    "do_columns", when set, is the projection of the decoder, its
+    "decimal_mode" the values of its DECIMAL columns.
+    """
+    decoders = table.get("decoders")
+    if decoders is None:
+        decoders = table["decoders"] = {}
+    decoder = decoders.get(present_bitmap)
+    if decoder is None:
+        decoder = RowDecoder(table["column_schemas"], present_bitmap,
+                             table.get("do_columns"),
+                             table.get("decimal_mode", "decimal"))
+        decoders[present_bitmap] = decoder
+    return decoder
@@ -1,374 +1,637 @@
-#!/usr/bin/env python
-#coding:utf-8
-
-from tools import log
-from tools import get_trace_info
-from constants import EventType
-from mysql.connector.constants import FieldType
-from mysql.connector.conversion import MySQLConverter
-import utils 
-import json
-import time
-import struct
-import datetime
-
-
-"""
-Binlog::EventHeader.
-+============================================+
-| event_header     |  timestamp         0 : 4 |
-|                  +------------------------―+
-|                  |  event_type        4 : 1 |
-|                  +-------------------------+
-|                  |  server_id         5 : 4 |
-|                  |  event_size        9 : 4 |
-|                  |  log_pos          13 : 4 |
-|                  |  flags            17 : 2 |
-+============================================+
-more details refer to 
-http://dev.mysql.com/doc/internals/en/replication-protocol.html#binlog-event-header
-"""
-
-class EventHeader(object):
-    def __init__(self, buf):
-        self.timestamp = utils.read_int(buf, 4)[1]
-        self.event_type = utils.read_int(buf[4:], 1)[1]
-        self.server_id = utils.read_int(buf[5:], 4)[1]
-        self.event_size = utils.read_int(buf[9:], 4)[1]
-        self.log_pos = utils.read_int(buf[13:], 4)[1]
-        self.flags = utils.read_int(buf[17:], 2)[1]
-        
-    def __str__(self):
-        res = {}
-        res["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S", \
-                                         time.localtime(self.timestamp))
-        res["event_type"] = "0x%.2x"%self.event_type
-        res["server_id"] = self.server_id
-        res["event_size"] = self.event_size
-        res["log_pos"] = self.log_pos
-        res["flags"] = "0x%.4x"%self.flags
-        return json.dumps(res)
-
-"""
-Binlog packet.
-+=============================================+
-| packet header    |  packet length     0 : 3 |   
-|                  +-------------------------+   
-|                  |  sequence number   3 : 1 |
-+============================================+
-| OK/ERR/EOF       |                    4 : 1 |
-| event_header     |                    5 : X |
-+============================================+
-"""
-
-class BinlogEvent(object):
-    def __init__(self, packet):
-        self._body = packet[4:]
-        self.header = None
-        try:
-            self.header = EventHeader(self._body[1:20])
-        except:
-            msg = get_trace_info()
-            log.warning(msg)
-        
-    
-    def is_eof(self):
-        header = utils.read_int(self._body, 1)[1]
-        if 0xfe == header:
-            log.debug("received eof packet.")
-            return True
-        else:
-            return False
-    
-    def is_error(self):
-        header = utils.read_int(self._body, 1)[1]
-        if 0xff == header:
-            log.debug("received err packet.")
-            return True
-        else:
-            return False
-     
-    def type(self):
-        return self.header.event_type
-    
-    def __str__(self):
-        return self.header.__str__()
-
-
-class TableMapEvent(BinlogEvent):
-    
-    def __init__(self, packet, table_map, table_subscribed, ctl_conn):
-        super(TableMapEvent, self).__init__(packet)
-        self._payload = packet[24:]
-        self._ctl_conn = ctl_conn
-        head = self._payload
-        
-        head, self.table_id = utils.read_int(head, 6)
-        # add or modify table map.
-        if self.table_id not in table_map:
-            table_map[self.table_id] = {"schema":None, "table":None, "column_schemas":[]}           
-        if self.schema in table_subscribed and self.table in table_subscribed[self.schema]:
-            table_map[self.table_id]["column_schemas"] = \
-               self.__get_table_informations(self.schema, self.table)
-               
-        head, self.flags = utils.read_int(head, 2)
-        head, schema_name_len = utils.read_int(head, 1)
-        head, self.schema = utils.read_bytes(head, schema_name_len)
-        self.schema = str(self.schema)
-        table_map[self.table_id]["schema"] = self.schema
-        head, _ = utils.read_bytes(head, 1) #filler
-        head, table_name_len = utils.read_int(head, 1)
-        head, self.table = utils.read_bytes(head, table_name_len)
-        self.table = str(self.table)
-        table_map[self.table_id]["table"] = self.table
-        head, _ = utils.read_bytes(head, 1) #filler
-        head, self.columns_cnt = utils.read_lc_int(head)
-        head, column_types = utils.read_bytes(head, self.columns_cnt)
-        for i in range(0, self.columns_cnt):
-            schema = table_map[self.table_id]["column_schemas"][i]
-            t = ord(column_types[i])
-            schema["TYPE_ID"] = t
-            head, _ = self.__read_metadata(t, schema, head)
-            
-    def __get_table_informations(self, schema, table):
-        sql = '''SELECT * FROM information_schema.columns WHERE table_schema="%s" AND table_name="%s";''', (schema, table)
-        res, _ = self._ctl_conn.query(sql)
-        return res
-    
-    def __read_metadata(self, column_type, column_schema, head):
-        column_schema["REAL_TYPE"] = column_schema["TYPE_ID"]
-        if column_schema["COLUMN_TYPE"].find("unsigned") != -1:
-            column_schema["IS_UNSIGNED"] = True
-        else:
-            column_schema["IS_UNSIGNED"] = False
-        if column_type == FieldType.VAR_STRING or column_type == FieldType.STRING:
-            head, _ = self.__read_string_metadata(column_schema, head)
-        elif column_type == FieldType.VARCHAR:
-            head, column_schema["MAX_LENGTH"] = utils.read_unsigned_int(head, 2)
-        elif column_type == FieldType.BLOB:
-            head, column_schema["LENGTH_SIZE"] = utils.read_unsigned_int(head, 1)
-        elif column_type == FieldType.GEOMETRY:
-            head, column_schema["LENGTH_SIZE"] = utils.read_unsigned_int(head, 1)
-        elif column_type == FieldType.NEWDECIMAL:
-            head, column_schema["PRECISION"] = utils.read_unsigned_int(head, 1)
-            head, column_schema["DECIMALS"] = utils.read_unsigned_int(head, 1)
-        elif column_type == FieldType.DOUBLE:
-            head, column_schema["SIZE"] = utils.read_unsigned_int(head, 1)
-        elif column_type == FieldType.FLOAT:
-            head, column_schema["SIZE"] = utils.read_unsigned_int(head, 1)
-        elif column_type == FieldType.BIT:
-            head, bit = utils.read_unsigned_int(head, 1)
-            head, byte = utils.read_unsigned_int(head, 1)
-            column_schema["BITS"] = (byte * 8) + bit
-            column_schema["BYTES"] = int((bit + 7) / 8)
-        return (head, None)
- 
-    def __read_string_metadata(self, column_schema, head):
-        head, byte0 = utils.read_unsigned_int(head, 1)
-        head, byte1 = utils.read_unsigned_int(head, 1)
-        metadata  = (byte0 << 8) + byte1
-        real_type = metadata >> 8
-        if real_type == FieldType.SET or real_type == FieldType.ENUM:
-            column_schema["TYPE_ID"] = real_type
-            column_schema["SIZE"] = metadata & 0x00ff
-            self.__read_enum_metadata(column_schema, real_type)
-        else:
-            column_schema["MAX_LENGTH"] = (((metadata >> 4) & 0x300) ^ 0x300) + (metadata & 0x00ff)
-        return (head, None)
-    
-    def __parse_enum_metadata(self, column_schema, column_type):
-        enums = column_schema["TYPE_ID"]
-        if column_type == FieldType.ENUM:
-            column_schema["ENUM_VALUES"] = enums.replace('enum(', '').replace(')', '').replace('\'', '').split(',')
-        else:
-            column_schema["SET_VALUES"] = enums.replace('set(', '').replace(')', '').replace('\'', '').split(',')   
-
-    @property
-    def table_map(self):
-        table_map = {"table_id":self.table_id, \
-                     "schema":self.schema, \
-                     "table":self.table, \
-                     "column_cnt":self.columns_cnt, \
-                     "column_types":self.columns_type
-                     }
-        return table_map
-    
-    def __str__(self):
-        return json.dumps(self.table_map)
-        
-
-class RowsEvent(BinlogEvent):
-    
-    def __init__(self, packet, table_map, table_subscribed):
-        super(RowsEvent, self).__init__(packet)
-        self._payload = packet[23:]
-        self._table_map = table_map
-        self._table_subscribed = table_subscribed
-        
-        head = self._payload
-        # header
-        head, self.table_id = utils.read_int(head, 6)
-        head, self.flags = utils.read_int(head, 2)
-        # with MySQL 5.6.x there will be other data following.
-        
-        # body
-        head, self.number_of_columns = utils.read_lc_int(head)
-        columns_present_bitmap_len = (self.number_of_columns + 7) / 8
-        head, columns_present_bitmap1 = utils.read_int(head, 
-                                        columns_present_bitmap_len)
-        if self.header.event_type == EventType.UPDATE_ROWS_EVENT:
-            head, columns_present_bitmap2 = utils.read_int(head, 
-                                            columns_present_bitmap_len)
-        # read rows.
-        null_bitmap_len = (self.number_of_columns + 7) / 8;
-        head, null_bitmap = utils.read_int(head, null_bitmap_len)
-        row = {}
-        for i in range(self.number_of_columns):
-            is_null = True if ((null_bitmap[i/8] >> (i%8)) & 0x01) else False
-            
-        
-        #self.columns = self.table_map[self.table_id].columns
-
-        #Aditionnal informations
-        #self.schema = self.table_map[self.table_id].schema
-        #self.table = self.table_map[self.table_id].table
-        
-    def __read_columns(self, head, null_bitmap, column_schemas):
-        columns = []
-        for i in xrange(0, len(columns)):
-            schema = column_schemas[i]
-            type = schema["REAL_TYPE"]
-            column = {"type":type, "value":None}
-            null = True if (null_bitmap[i/8]>>(i%8))&0x01 else False
-            unsigned = column_schemas[i]["IS_UNSIGNED"]
-            if null:
-                column["value"] = None
-            elif type == FieldType.TINY:
-                if unsigned:
-                    head, columns["value"] = utils.read_unsigned_int(head, 1, False)
-                else:
-                    head, columns["value"] = utils.read_signed_int(head, 1, False)
-            elif type == FieldType.SHORT:
-                if unsigned:
-                    head, columns["value"] = utils.read_unsigned_int(head, 2, False)
-                else:
-                    head, columns["value"] = utils.read_signed_int(head, 2, False)
-            elif type == FieldType.LONG:
-                if unsigned:
-                    head, columns["value"] = utils.read_unsigned_int(head, 4, False)
-                else:
-                    head, columns["value"] = utils.read_signed_int(head, 4, False)
-            elif type == FieldType.INT24:
-                if unsigned:
-                    head, columns["value"] = utils.read_unsigned_int(head, 3, False)
-                else:
-                    head, columns["value"] = utils.read_signed_int(head, 3, False)
-            elif type == FieldType.FLOAT:
-                head, columns["value"] = utils.read_float(head)
-            elif type == FieldType.DOUBLE:
-                head, columns["value"] = utils.read_double(head)
-            elif type == FieldType.VARCHAR or column.type == FieldType.STRING:
-                if schema["MAX_LENGTH"] > 255:
-                    head, columns["value"] = utils.read_lc_pascal_string(head, 2)
-                else:
-                    head, columns["value"] = utils.read_lc_pascal_string(head, 1)
-            elif type == FieldType.NEWDECIMAL:
-                head, columns["value"] = self.__read_new_decimal(column)
-            elif type == FieldType.BLOB:
-                length_size = schema["LENGTH_SIZE"]
-                charset = schema["CHARACTER_SET_NAME"]
-                head, columns["value"] = utils.read_lc_pascal_string(head, length_size, charset)
-            elif type == FieldType.DATETIME:
-                head, columns["value"] = utils.read_datetime(head)
-            elif type == FieldType.TIME:
-                head, columns["value"] = utils.read_time(head)
-            elif type == FieldType.DATE:
-                head, columns["value"] = utils.read_date(head)
-            elif type == FieldType.TIMESTAMP:
-                head, timestamp = utils.read_unsigned_int(head, 4)
-                columns["value"] = datetime.datetime.fromtimestamp(timestamp)
-            elif type == FieldType.LONGLONG:
-                if unsigned:
-                    head, columns["value"] = utils.read_unsigned_int(head, 8, False)
-                else:
-                    head, columns["value"] = utils.read_signed_int(head, 8, False)
-            elif type == FieldType.YEAR:
-                head, year = utils.read_unsigned_int(head, 1, False)
-                columns["value"] = year + 1900
-            elif type == FieldType.ENUM:
-                size = schema["SIZE"]
-                head, index = utils.read_unsigned_int(head, size, False) - 1
-                columns["value"] = schema["ENUM_VALUES"][index]
-            elif type == FieldType.SET:
-                size = schema["SIZE"]
-                head, index = utils.read_unsigned_int(head, size, False) - 1
-                columns["value"] = schema["SET_VALUES"][index]
-            elif type == FieldType.BIT:
-                bytes = schema["BYTES"]
-                bits = schema["BITS"]
-                head, columns["value"] = utils.read_bits(head, bytes, bits)
-            elif type == FieldType.GEOMETRY:
-                length_size = schema["LENGTH_SIZE"]
-                head, columns["value"] = utils.read_lc_pascal_string(head, length_size)
-            else:
-                raise NotImplementedError("Unknown MySQL column type: %d" % (type))
-            columns.append(column)
-        return columns
-
-"""  
-class RotateEvent(BinLogEvent):
-    pass
-
-
-class FormatDescriptionEvent(BinLogEvent):
-    pass
-
-
-class XidEvent(BinLogEvent):
-
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(XidEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
-        self.xid = struct.unpack('<Q', self.packet.read(8))[0]
-
-    def _dump(self):
-        super(XidEvent, self)._dump()
-        print("Transaction ID: %d" % (self.xid))
-
-
-class QueryEvent(BinLogEvent):
-    def __init__(self, from_packet, event_size, table_map, ctl_connection):
-        super(QueryEvent, self).__init__(from_packet, event_size, table_map, ctl_connection)
-
-        # Post-header
-        self.slave_proxy_id = self.packet.read_uint32()
-        self.execution_time = self.packet.read_uint32()
-        self.schema_length =  byte2int(self.packet.read(1))
-        self.error_code = self.packet.read_uint16()
-        self.status_vars_length = self.packet.read_uint16()
-
-        # Payload
-        self.status_vars = self.packet.read(self.status_vars_length)
-        self.schema =  self.packet.read(self.schema_length)
-        self.packet.advance(1)
-
-        self.query = self.packet.read(event_size - 13 - self.status_vars_length - self.schema_length - 1).decode()
-        #string[EOF]    query
-
-    def _dump(self):
-        super(QueryEvent, self)._dump()
-        print("Schema: %s" % (self.schema))
-        print("Execution time: %d" % (self.execution_time)) 
-        print("Query: %s" % (self.query))
-"""
-
-
-class EventMap:
-    map = {
-    EventType.TABLE_MAP_EVENT : TableMapEvent
-    }
-    
-    def get_event_type(self, t):
-        if t in self.__class__.map:
-            return self.__class__.map[t]
-        else:
-            return None
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from constants import EventType, ChecksumAlg, ColumnType
+from mysql.connector.constants import FieldType
+from decoder import get_decoder
+from columnar import ColumnBatch
+import utils 
+import json
+import re
+import time
+import struct
+
+
+"""
+Binlog::EventHeader.
++============================================+
+| event_header     |  timestamp         0 : 4 |
+|                  +------------------------―+
+|                  |  event_type        4 : 1 |
+|                  +-------------------------+
+|                  |  server_id         5 : 4 |
+|                  |  event_size        9 : 4 |
+|                  |  log_pos          13 : 4 |
+|                  |  flags            17 : 2 |
++============================================+
+more details refer to 
+http://dev.mysql.com/doc/internals/en/replication-protocol.html#binlog-event-header
+"""
+
+_EVENT_HEADER = struct.Struct('<IBIIIH')
+
+class EventHeader(object):
+    """
+    checksum_size is the size of the checksum ending the event, counted
+    in event_size but not part of the body.
+    """
+    __slots__ = ("timestamp", "event_type", "server_id", "event_size",
+                 "log_pos", "flags", "checksum_size")
+    
+    def __init__(self, buf, offset=0, checksum_size=0):
+        (self.timestamp, self.event_type, self.server_id, self.event_size,
+         self.log_pos, self.flags) = _EVENT_HEADER.unpack_from(buf, offset)
+        self.checksum_size = checksum_size
+        
+    def __str__(self):
+        res = {}
+        res["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S", \
+                                         time.localtime(self.timestamp))
+        res["event_type"] = "0x%.2x"%self.event_type
+        res["server_id"] = self.server_id
+        res["event_size"] = self.event_size
+        res["log_pos"] = self.log_pos
+        res["flags"] = "0x%.4x"%self.flags
+        return json.dumps(res)
+
+"""
+Binlog packet.
++=============================================+
+| packet header    |  packet length     0 : 3 |   
+|                  +-------------------------+   
+|                  |  sequence number   3 : 1 |
++============================================+
+| OK/ERR/EOF       |                    4 : 1 |
+| event_header     |                    5 : X |
++============================================+
+"""
+
+# offsets of the event header and the event body in a binlog packet.
+EVENT_HEADER_OFFSET = 5
+EVENT_BODY_OFFSET = 24
+EVENT_HEADER_SIZE = 19
+
+ROWS_EVENT_TYPES = frozenset([EventType.PRE_GA_WRITE_ROWS_EVENT, 
+                              EventType.PRE_GA_UPDATE_ROWS_EVENT, 
+                              EventType.PRE_GA_DELETE_ROWS_EVENT, 
+                              EventType.WRITE_ROWS_EVENT, 
+                              EventType.UPDATE_ROWS_EVENT, 
+                              EventType.DELETE_ROWS_EVENT, 
+                              EventType.WRITE_ROWS_EVENT_V2, 
+                              EventType.UPDATE_ROWS_EVENT_V2, 
+                              EventType.DELETE_ROWS_EVENT_V2])
+
+_ROWS_EVENT_V2_TYPES = frozenset([EventType.WRITE_ROWS_EVENT_V2, 
+                                  EventType.UPDATE_ROWS_EVENT_V2, 
+                                  EventType.DELETE_ROWS_EVENT_V2])
+
+_TABLE_ID = struct.Struct('<IH')
+
+# events end with a checksum from this server version on.
+CHECKSUM_VERSION = (5, 6, 1)
+CHECKSUM_SIZE = 4
+_SERVER_VERSION = re.compile(r'^(\d+)\.(\d+)\.(\d+)')
+
+def _version(server_version):
+    match = _SERVER_VERSION.match(server_version)
+    if match is None:
+        return (0, 0, 0)
+    return tuple([int(v) for v in match.groups()])
+
+def peek_table_id(packet, offset=EVENT_BODY_OFFSET):
+    """
+    Read the table_id of a TABLE_MAP or rows event without decoding it.
+    """
+    low, high = _TABLE_ID.unpack_from(packet, offset)
+    return low | (high << 32)
+
+def peek_table_name(packet, offset=EVENT_BODY_OFFSET):
+    """
+    Read the (schema, table) of a TABLE_MAP event without decoding it.
+    """
+    reader = utils.BufferReader(packet, offset + 8)
+    schema = str(reader.read(reader.read_uint8()))
+    reader.skip(1)
+    table = str(reader.read(reader.read_uint8()))
+    return schema, table
+
+class BinlogEvent(object):
+    """
+    A binlog event decoded in two phases: the header is decoded when the
+    event is built, the body only when one of its fields is first read or
+    decode() is called.
+    
+    packet holds the event from offset on, a network packet by default.
+    It may as well be a whole binlog file mapped in memory, the event is
+    then read in place.
+    """
+    # Stats the decode time is recorded to, set by the source, and the
+    # decode time so far, from the making of the event on.
+    _stats = None
+    _decode_seconds = 0.0
+    
+    def __init__(self, packet, header=None, offset=EVENT_HEADER_OFFSET):
+        self._packet = packet
+        self._offset = offset
+        self._decoded = False
+        self.header = header
+        if header is not None or len(packet) < offset + EVENT_HEADER_SIZE:
+            return
+        try:
+            self.header = EventHeader(packet, offset)
+        except:
+            log.warning("bad event header.", exc_info=True)
+    
+    def _body_reader(self):
+        """
+        Get a reader over the event body, bounded by the event size less
+        the checksum.
+        """
+        return utils.BufferReader(self._packet, 
+                                  self._offset + EVENT_HEADER_SIZE, 
+                                  self._offset + self.header.event_size - 
+                                  self.header.checksum_size)
+    
+    def __getattr__(self, name):
+        # only called for missing attributes: decode the body and retry.
+        if name.startswith("_") or self._decoded:
+            raise AttributeError(name)
+        self.decode()
+        return getattr(self, name)
+    
+    def decode(self):
+        """
+        decode the event body, once.
+        """
+        if not self._decoded:
+            self._decoded = True
+            if self._stats is None:
+                self._decode()
+            else:
+                start = time.time()
+                self._decode()
+                self._decode_seconds += time.time() - start
+                self._record_decode()
+        return self
+    
+    def _decode(self):
+        pass
+    
+    def _record_decode(self):
+        # once decoded, the whole decode time makes one observation.
+        self._stats.record_decode(self.header.event_type, 
+                                  self._decode_seconds)
+        self._decode_seconds = 0.0
+        
+    
+    def is_eof(self):
+        if '\xfe' == self._packet[4]:
+            log.debug("received eof packet.")
+            return True
+        else:
+            return False
+    
+    def is_error(self):
+        if '\xff' == self._packet[4]:
+            log.debug("received err packet.")
+            return True
+        else:
+            return False
+     
+    def type(self):
+        return self.header.event_type
+    
+    def __str__(self):
+        return self.header.__str__()
+
+
+class TableMapEvent(BinlogEvent):
+    
+    def __init__(self, packet, table_map, table_subscribed, schema_cache, 
+                 header=None, offset=EVENT_HEADER_OFFSET, 
+                 decimal_mode="decimal"):
+        super(TableMapEvent, self).__init__(packet, header, offset)
+        self._table_map = table_map
+        self._table_subscribed = table_subscribed
+        self._schema_cache = schema_cache
+        # for the tables without a decimal mode of their own.
+        self._decimal_mode = decimal_mode
+    
+    def _decode(self):
+        table_map = self._table_map
+        table_subscribed = self._table_subscribed
+        reader = self._body_reader()
+        
+        self.table_id = reader.read_uint48()
+        self.flags = reader.read_uint16()
+        self.schema = str(reader.read(reader.read_uint8()))
+        reader.skip(1) #filler
+        self.table = str(reader.read(reader.read_uint8()))
+        reader.skip(1) #filler
+        self.columns_cnt = reader.read_lc_int()
+        columns_type = reader.read(self.columns_cnt)
+        self.columns_type = list(bytearray(columns_type))
+        metadata = reader.read(reader.read_lc_int())
+        subscribed = self.schema in table_subscribed and \
+                     self.table in table_subscribed[self.schema]
+        do_columns = None
+        decimal_mode = self._decimal_mode
+        if subscribed and table_subscribed[self.schema][self.table].get("do_columns"):
+            do_columns = frozenset(table_subscribed[self.schema][self.table]["do_columns"])
+        if subscribed:
+            decimal_mode = table_subscribed[self.schema][self.table].get(
+                "decimal_mode", decimal_mode)
+        
+        # a table map repeated before every rows event is kept as is.
+        columns_def = columns_type + metadata
+        entry = table_map.get(self.table_id)
+        if entry is not None and entry["schema"] == self.schema and \
+           entry["table"] == self.table and \
+           entry["subscribed"] == subscribed and \
+           entry["do_columns"] == do_columns and \
+           entry["decimal_mode"] == decimal_mode and \
+           entry["columns_def"] == columns_def:
+            return
+        
+        # add or modify table map.
+        column_schemas = []
+        if subscribed:
+            column_schemas = self.__get_table_informations()
+        reader = utils.BufferReader(metadata)
+        for i in range(0, self.columns_cnt):
+            if i >= len(column_schemas):
+                column_schemas.append({})
+            schema = column_schemas[i]
+            t = self.columns_type[i]
+            schema["TYPE_ID"] = t
+            self.__read_metadata(t, schema, reader)
+        table_map[self.table_id] = {"schema":self.schema, 
+                                    "table":self.table, 
+                                    "subscribed":subscribed, 
+                                    "do_columns":do_columns, 
+                                    "decimal_mode":decimal_mode, 
+                                    "columns_def":columns_def, 
+                                    "column_schemas":column_schemas}
+            
+    def __get_table_informations(self):
+        columns = self._schema_cache.get(self.schema, self.table)
+        if len(columns) != self.columns_cnt:
+            # the cached definition missed a schema change.
+            self._schema_cache.invalidate(self.schema, self.table)
+            columns = self._schema_cache.get(self.schema, self.table)
+        return [dict(c) for c in columns]
+    
+    def __read_metadata(self, column_type, column_schema, reader):
+        column_schema["REAL_TYPE"] = column_schema["TYPE_ID"]
+        if column_schema.get("COLUMN_TYPE", "").find("unsigned") != -1:
+            column_schema["IS_UNSIGNED"] = True
+        else:
+            column_schema["IS_UNSIGNED"] = False
+        if column_type == FieldType.VAR_STRING or column_type == FieldType.STRING:
+            self.__read_string_metadata(column_schema, reader)
+        elif column_type == FieldType.VARCHAR:
+            column_schema["MAX_LENGTH"] = reader.read_uint16()
+        elif column_type == FieldType.BLOB:
+            column_schema["LENGTH_SIZE"] = reader.read_uint8()
+        elif column_type == FieldType.GEOMETRY:
+            column_schema["LENGTH_SIZE"] = reader.read_uint8()
+        elif column_type == FieldType.NEWDECIMAL:
+            column_schema["PRECISION"] = reader.read_uint8()
+            column_schema["DECIMALS"] = reader.read_uint8()
+        elif column_type == FieldType.DOUBLE:
+            column_schema["SIZE"] = reader.read_uint8()
+        elif column_type == FieldType.FLOAT:
+            column_schema["SIZE"] = reader.read_uint8()
+        elif column_type == ColumnType.TIMESTAMP2 or \
+             column_type == ColumnType.DATETIME2 or \
+             column_type == ColumnType.TIME2:
+            column_schema["FSP"] = reader.read_uint8()
+        elif column_type == FieldType.BIT:
+            bit = reader.read_uint8()
+            byte = reader.read_uint8()
+            column_schema["BITS"] = (byte * 8) + bit
+            column_schema["BYTES"] = int((column_schema["BITS"] + 7) / 8)
+ 
+    def __read_string_metadata(self, column_schema, reader):
+        byte0 = reader.read_uint8()
+        byte1 = reader.read_uint8()
+        metadata  = (byte0 << 8) + byte1
+        real_type = metadata >> 8
+        if real_type == FieldType.SET or real_type == FieldType.ENUM:
+            column_schema["REAL_TYPE"] = real_type
+            column_schema["SIZE"] = metadata & 0x00ff
+            self.__parse_enum_metadata(column_schema, real_type)
+        else:
+            column_schema["MAX_LENGTH"] = (((metadata >> 4) & 0x300) ^ 0x300) + (metadata & 0x00ff)
+    
+    def __parse_enum_metadata(self, column_schema, column_type):
+        enums = column_schema.get("COLUMN_TYPE", "")
+        if column_type == FieldType.ENUM:
+            column_schema["ENUM_VALUES"] = enums.replace('enum(', '').replace(')', '').replace('\'', '').split(',')
+        else:
+            column_schema["SET_VALUES"] = enums.replace('set(', '').replace(')', '').replace('\'', '').split(',')   
+
+    @property
+    def table_map(self):
+        table_map = {"table_id":self.table_id, \
+                     "schema":self.schema, \
+                     "table":self.table, \
+                     "column_cnt":self.columns_cnt, \
+                     "column_types":self.columns_type
+                     }
+        return table_map
+    
+    def __str__(self):
+        return json.dumps(self.table_map)
+        
+
+class RowsEvent(BinlogEvent):
+    """
+    Base of the rows events, rows() decodes the row images one at a time.
+    """
+    
+    def __init__(self, packet, table_map, table_subscribed, header=None, 
+                 offset=EVENT_HEADER_OFFSET):
+        super(RowsEvent, self).__init__(packet, header, offset)
+        self._table_map = table_map
+        self._table_subscribed = table_subscribed
+        self._decoder = None
+        self._decoder2 = None
+        self._rows_offset = None
+        self._rows_end = None
+        # rows decoded ahead of time, by a worker process for instance.
+        self._decoded_rows = None
+    
+    def _decode(self):
+        reader = self._body_reader()
+        # header
+        self.table_id = reader.read_uint48()
+        self.flags = reader.read_uint16()
+        if self.header.event_type in _ROWS_EVENT_V2_TYPES:
+            # with MySQL 5.6.x there will be other data following.
+            reader.skip(reader.read_uint16() - 2)
+        
+        # body
+        self.number_of_columns = reader.read_lc_int()
+        columns_present_bitmap_len = (self.number_of_columns + 7) / 8
+        self.columns_present_bitmap1 = reader.read_bitmap(columns_present_bitmap_len)
+        if isinstance(self, UpdateRowsEvent):
+            self.columns_present_bitmap2 = reader.read_bitmap(columns_present_bitmap_len)
+        # rows follow, each one starting with its null bitmap.
+        self._rows_offset = reader.offset
+        self._rows_end = reader.end
+        
+        #Aditionnal informations
+        self.schema = None
+        self.table = None
+        table = self._table_map.get(self.table_id)
+        if table is None:
+            log.warning("no table map for table_id %d.", self.table_id)
+            return
+        self.schema = table["schema"]
+        self.table = table["table"]
+        self._decoder = get_decoder(table, self.columns_present_bitmap1)
+        if isinstance(self, UpdateRowsEvent):
+            self._decoder2 = get_decoder(table, self.columns_present_bitmap2)
+        
+    def _read_row(self, reader, decoder):
+        """
+        Read one row image with the compiled decoder of the table.
+        """
+        return dict(zip(decoder.names, decoder.decode(reader)))
+    
+    def _row_reader(self):
+        self.decode()
+        if self._decoder is None:
+            return None
+        return utils.BufferReader(self._packet, self._rows_offset, 
+                                  self._rows_end)
+    
+    def rows(self):
+        """
+        Iterate over the rows of the event, each one a dict of column 
+        values. Rows are decoded as they are consumed, never kept in a 
+        list, unless they were decoded ahead of time with set_rows().
+        """
+        if self._decoded_rows is not None:
+            return iter(self._decoded_rows)
+        return self._iter_rows()
+    
+    def _record_decode(self):
+        # observed with the rows, once they are all decoded.
+        pass
+    
+    def set_rows(self, rows):
+        """
+        Give the rows of the event decoded elsewhere.
+        """
+        self._decoded_rows = rows
+    
+    def _iter_rows(self):
+        reader = self._row_reader()
+        if reader is None:
+            return
+        decoder = self._decoder
+        if self._stats is None:
+            while reader.remaining() > 0:
+                yield self._read_row(reader, decoder)
+            return
+        # only the time spent decoding counts, not the consumer's.
+        while reader.remaining() > 0:
+            start = time.time()
+            row = self._read_row(reader, decoder)
+            self._decode_seconds += time.time() - start
+            yield row
+        BinlogEvent._record_decode(self)
+    
+    def row_values(self, before=False):
+        """
+        Get (names, typecodes, rows) of the rows of the event, rows being
+        lists of values in the order of names, typecodes their
+        array.array typecodes. The after images of an update unless
+        before is true.
+        """
+        self.decode()
+        decoder = self._decoder
+        if decoder is None:
+            return ((), (), [])
+        if self._decoder2 is not None and not before:
+            decoder = self._decoder2
+        if self._decoded_rows is not None:
+            rows = self._decoded_rows
+            if self._decoder2 is not None:
+                rows = [r[0 if before else 1] for r in rows]
+            return (decoder.names, decoder.typecodes,
+                    [[r.get(n) for n in decoder.names] for r in rows])
+        start = time.time()
+        reader = self._row_reader()
+        rows = []
+        if self._decoder2 is None:
+            while reader.remaining() > 0:
+                rows.append(decoder.decode(reader))
+        else:
+            first = self._decoder
+            second = self._decoder2
+            while reader.remaining() > 0:
+                row = first.decode(reader)
+                after = second.decode(reader)
+                rows.append(row if before else after)
+        if self._stats is not None:
+            self._decode_seconds += time.time() - start
+            BinlogEvent._record_decode(self)
+        return (decoder.names, decoder.typecodes, rows)
+    
+    def to_columns(self, before=False, use_numpy=None):
+        """
+        Get the rows of the event column by column, a dict of column name
+        to (values, null mask), see ColumnBatch.columns(). The after
+        images of an update unless before is true.
+        """
+        batch = ColumnBatch()
+        batch.add(self, before)
+        return batch.columns(use_numpy)
+    
+    def __iter__(self):
+        return self.rows()
+    
+    def __str__(self):
+        return json.dumps({"table_id":self.table_id, 
+                           "schema":self.schema, 
+                           "table":self.table})
+
+
+class WriteRowsEvent(RowsEvent):
+    pass
+
+
+class DeleteRowsEvent(RowsEvent):
+    pass
+
+
+class UpdateRowsEvent(RowsEvent):
+    """
+    rows() gives the (before, after) images of the updated rows.
+    """
+    
+    def _iter_rows(self):
+        reader = self._row_reader()
+        if reader is None:
+            return
+        before = self._decoder
+        after = self._decoder2
+        while reader.remaining() > 0:
+            yield (self._read_row(reader, before), 
+                   self._read_row(reader, after))
+
+
+class QueryEvent(BinlogEvent):
+    
+    def _decode(self):
+        reader = self._body_reader()
+        
+        # Post-header
+        self.slave_proxy_id = reader.read_uint32()
+        self.execution_time = reader.read_uint32()
+        schema_length = reader.read_uint8()
+        self.error_code = reader.read_uint16()
+        status_vars_length = reader.read_uint16()
+        
+        # Payload
+        self.status_vars = reader.read(status_vars_length)
+        self.schema = str(reader.read(schema_length))
+        reader.skip(1)
+        #string[EOF]    query
+        self.query = str(reader.read(reader.remaining()))
+    
+    def __str__(self):
+        return json.dumps({"schema":self.schema, 
+                           "execution_time":self.execution_time, 
+                           "query":self.query})
+
+
+class RotateEvent(BinlogEvent):
+    """
+    Switch of the binlog to next_log_file, dumped from position on.
+    """
+    
+    def _decode(self):
+        reader = self._body_reader()
+        self.position = reader.read_uint64()
+        self.next_log_file = str(reader.read(reader.remaining()))
+    
+    def __str__(self):
+        return json.dumps({"position":self.position, 
+                           "next_log_file":self.next_log_file})
+
+
+class FormatDescriptionEvent(BinlogEvent):
+    """
+    First event of a binlog file, describes the format of the others.
+    From MySQL 5.6.1 on it ends with the checksum algorithm of the
+    events and its own checksum, whatever the algorithm.
+    """
+    
+    def _decode(self):
+        reader = utils.BufferReader(self._packet, 
+                                    self._offset + EVENT_HEADER_SIZE, 
+                                    self._offset + self.header.event_size)
+        self.binlog_version = reader.read_uint16()
+        self.server_version = str(reader.read(50)).split('\x00', 1)[0]
+        self.create_timestamp = reader.read_uint32()
+        self.header_length = reader.read_uint8()
+        self.checksum_alg = ChecksumAlg.UNDEF
+        end = reader.end
+        if _version(self.server_version) >= CHECKSUM_VERSION:
+            end -= 1 + CHECKSUM_SIZE
+            self.checksum_alg = utils.BufferReader(self._packet, 
+                                                   end).read_uint8()
+        self.post_header_lengths = list(bytearray(
+            reader.read(end - reader.offset)))
+    
+    @property
+    def checksum_size(self):
+        """
+        Size of the checksum ending the events described.
+        """
+        if self.checksum_alg == ChecksumAlg.CRC32:
+            return CHECKSUM_SIZE
+        return 0
+    
+    def __str__(self):
+        return json.dumps({"binlog_version":self.binlog_version, 
+                           "server_version":self.server_version, 
+                           "checksum_alg":self.checksum_alg})
+
+
+class XidEvent(BinlogEvent):
+    """
+    Commit of a transaction on a transactional engine.
+    """
+    
+    def _decode(self):
+        reader = self._body_reader()
+        self.xid = reader.read_uint64()
+    
+    def __str__(self):
+        return json.dumps({"xid":self.xid})
+
+
+class EventMap:
+    map = {
+    EventType.TABLE_MAP_EVENT : TableMapEvent, 
+    EventType.QUERY_EVENT : QueryEvent, 
+    EventType.XID_EVENT : XidEvent, 
+    EventType.ROTATE_EVENT : RotateEvent, 
+    EventType.FORMAT_DESCRIPTION_EVENT : FormatDescriptionEvent, 
+    EventType.WRITE_ROWS_EVENT : WriteRowsEvent, 
+    EventType.UPDATE_ROWS_EVENT : UpdateRowsEvent, 
+    EventType.DELETE_ROWS_EVENT : DeleteRowsEvent, 
+    EventType.WRITE_ROWS_EVENT_V2 : WriteRowsEvent, 
+    EventType.UPDATE_ROWS_EVENT_V2 : UpdateRowsEvent, 
+    EventType.DELETE_ROWS_EVENT_V2 : DeleteRowsEvent
+    }
+    
+    @classmethod
+    def get_event_type(cls, t):
+        return cls.map.get(t)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from source import Source
+from constants import EventType
+from event import EVENT_HEADER_SIZE, EventHeader, FormatDescriptionEvent
+import mmap
+import os
+import struct
+
+BINLOG_MAGIC = '\xfebin'
+
+"""
+Binlog file.
++============================================+
+| magic            |  \\xfe 'b' 'i' 'n'  0 : 4 |
++============================================+
+| event            |  event_header     4 : 19 |
+|                  +-------------------------+
+|                  |  event_body             |
++============================================+
+| event            |  ...                     |
++============================================+
+"""
+
+# event_size in the event header.
+_EVENT_SIZE = struct.Struct('<I')
+_EVENT_SIZE_OFFSET = 9
+
+
+class BinlogFileSource(Source):
+    """
+    Source reading the events of a binlog file on disk instead of a
+    master, for replays and benchmarks.
+
+    The file is mapped in memory and the events are decoded in place,
+    nothing is copied but the values read. Events are only valid until
+    disconnect() unmaps the file. The connection options are still used
+    to look the columns of the subscribed tables up.
+    """
+    def __init__(self, path, **kwargs):
+        super(BinlogFileSource, self).__init__(**kwargs)
+        self._path = path
+        self._file = None
+        self._map = None
+        self._size = 0
+        self._offset = len(BINLOG_MAGIC)
+
+    def connect(self):
+        """
+        Map the binlog file.
+        """
+        self._file = open(self._path, "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        if self._size < len(BINLOG_MAGIC):
+            self.disconnect()
+            raise ValueError("%s is not a binlog file." % self._path)
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+        if self._map[0:len(BINLOG_MAGIC)] != BINLOG_MAGIC:
+            self.disconnect()
+            raise ValueError("%s is not a binlog file." % self._path)
+        self._log_file = os.path.basename(self._path)
+        self._log_pos = self._offset
+
+    def disconnect(self):
+        """
+        Unmap the binlog file.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._ctl_conn is not None:
+            self._ctl_conn.close()
+            self._ctl_conn = None
+        if self._checkpoint is not None:
+            self._checkpoint.sync()
+
+    def binlog_dump(self, log_file=None, offset=None):
+        """
+        Read from offset on. Without offset the reading resumes from the
+        checkpoint when it is in this file, or starts with the file.
+        Reading from past the format description event still reads it for
+        the checksums.
+        """
+        if offset is None:
+            position = None
+            if self._checkpoint is not None:
+                position = self._checkpoint.load()
+            if position is not None and \
+               position[0] == os.path.basename(self._path):
+                offset = position[1]
+            else:
+                offset = len(BINLOG_MAGIC)
+        self._offset = offset
+        self._log_pos = offset
+        self._boundary = None
+        self._checksum_size = 0
+        start = len(BINLOG_MAGIC)
+        if offset > start and start + EVENT_HEADER_SIZE <= self._size:
+            # the events are described by the first one of the file, a
+            # master sends it first too.
+            header = EventHeader(self._map, start)
+            if header.event_type == EventType.FORMAT_DESCRIPTION_EVENT:
+                event = FormatDescriptionEvent(self._map, header, start)
+                self._checksum_size = event.checksum_size
+
+    def _read_event(self, reconnect=True):
+        offset = self._offset
+        if offset + EVENT_HEADER_SIZE > self._size:
+            raise StopIteration
+        size = _EVENT_SIZE.unpack_from(self._map,
+                                       offset + _EVENT_SIZE_OFFSET)[0]
+        if size < EVENT_HEADER_SIZE or offset + size > self._size:
+            log.warning("truncated event at %s:%d.", self._path, offset)
+            raise StopIteration
+        self._offset = offset + size
+        return self._map, offset
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from constants import EventType
+from event import *
+from filesource import BinlogFileSource
+import utils
+import bisect
+import os
+import struct
+
+INDEX_MAGIC = 'MSIX'
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx'
+
+"""
+Binlog index file.
++============================================+
+| header           |  magic             0 : 4 |
+|                  +-------------------------+
+|                  |  version           4 : 1 |
+|                  |  bucket seconds    5 : 4 |
+|                  |  bucket count      9 : 4 |
+|                  |  table count      13 : 4 |
+|                  |  log file         17 : x |  length prefixed (1 byte)
++============================================+
+| buckets          |  bucket start time   : 4 |  bucket count times
+|                  |  first offset        : 4 |
++============================================+
+| tables           |  schema.table        : x |  length prefixed (2 bytes)
+|                  |  offset count        : 4 |
+|                  |  offsets             : 4 |  offset count times
++============================================+
+Offsets are those of the first event of transactions, in file order.
+"""
+
+_HEADER = struct.Struct('<4sBIII')
+_BUCKET = struct.Struct('<II')
+_COUNT = struct.Struct('<I')
+_NAME_LENGTH = struct.Struct('<H')
+
+_TRANSACTION_START_TYPES = frozenset([EventType.GTID_LOG_EVENT,
+                                      EventType.ANONYMOUS_GTID_LOG_EVENT])
+
+
+def index_path(binlog_path):
+    """
+    Path of the sidecar index of a binlog file.
+    """
+    return binlog_path + INDEX_SUFFIX
+
+
+class BinlogIndex(object):
+    """
+    Offsets where the transactions of a binlog file start, by time and
+    by table, to seek to instead of reading the file from its start.
+
+    buckets is a sorted list of (bucket start time, offset) where offset
+    is the first transaction starting within the bucket. tables maps
+    "schema.table" to the sorted offsets of the transactions writing
+    the table.
+    """
+    def __init__(self, log_file, bucket_seconds=60, buckets=None, tables=None):
+        self.log_file = log_file
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets or []
+        self.tables = tables or {}
+        self._prepare()
+
+    def _prepare(self):
+        # transactions are not strictly ordered by time in a binlog, the
+        # first one at or after a time is the lowest offset of all the
+        # later buckets.
+        self._times = [t for (t, _) in self.buckets]
+        self._first_offsets = []
+        first = None
+        for (_, offset) in reversed(self.buckets):
+            if first is None or offset < first:
+                first = offset
+            self._first_offsets.append(first)
+        self._first_offsets.reverse()
+
+    def offset_at(self, timestamp):
+        """
+        Offset to read from for the transactions started at or after
+        timestamp, None when there is none in the file.
+        """
+        bucket = timestamp - timestamp % self.bucket_seconds
+        i = bisect.bisect_left(self._times, bucket)
+        if i == len(self._times):
+            return None
+        return self._first_offsets[i]
+
+    def table_offsets(self, schema, table):
+        """
+        Offsets of the transactions writing a table.
+        """
+        return self.tables.get("%s.%s" % (schema, table), [])
+
+    def seek(self, timestamp=None, schema=None, table=None):
+        """
+        Offset to read from for the transactions started at or after
+        timestamp and, when table is given, writing schema.table.
+        Returns None when there is none in the file.
+        """
+        offset = self._first_offsets[0] if self._first_offsets else None
+        if timestamp is not None:
+            offset = self.offset_at(timestamp)
+        if offset is None or table is None:
+            return offset
+        offsets = self.table_offsets(schema, table)
+        i = bisect.bisect_left(offsets, offset)
+        if i == len(offsets):
+            return None
+        return offsets[i]
+
+    def save(self, path):
+        tables = sorted(self.tables.items())
+        data = [_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.bucket_seconds,
+                             len(self.buckets), len(tables)),
+                chr(len(self.log_file)), self.log_file]
+        for bucket in self.buckets:
+            data.append(_BUCKET.pack(*bucket))
+        for name, offsets in tables:
+            data.append(_NAME_LENGTH.pack(len(name)))
+            data.append(name)
+            data.append(_COUNT.pack(len(offsets)))
+            data.append(struct.pack('<%dI' % len(offsets), *offsets))
+        tmp = path + ".tmp"
+        f = open(tmp, "wb")
+        try:
+            f.write(''.join(data))
+        finally:
+            f.close()
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        f = open(path, "rb")
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        reader = utils.BufferReader(data)
+        magic, version, bucket_seconds, bucket_count, table_count = \
+            _HEADER.unpack_from(data, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError("%s is not a binlog index." % path)
+        reader.skip(_HEADER.size)
+        log_file = reader.read(reader.read_uint8())
+        buckets = []
+        for i in xrange(bucket_count):
+            buckets.append(_BUCKET.unpack_from(data, reader.offset))
+            reader.skip(_BUCKET.size)
+        tables = {}
+        for i in xrange(table_count):
+            name = reader.read(reader.read_uint16())
+            count = reader.read_uint32()
+            tables[name] = list(struct.unpack_from('<%dI' % count, data,
+                                                   reader.offset))
+            reader.skip(count * 4)
+        return cls(log_file, bucket_seconds, buckets, tables)
+
+
+def build_index(path, bucket_seconds=60):
+    """
+    Scan a binlog file and index the start of its transactions.
+
+    Only the event headers are read, but for the queries, to find the
+    BEGIN of transactions, and the table names of table map events.
+    """
+    source = BinlogFileSource(path)
+    source.connect()
+    buckets = {}
+    tables = {}
+    start = None
+    pending = None
+    trans_tables = None
+    checksum_size = 0
+    try:
+        while True:
+            try:
+                packet, offset = source._read_event()
+            except StopIteration:
+                break
+            header = EventHeader(packet, offset, checksum_size)
+            body = offset + EVENT_HEADER_SIZE
+            event_type = header.event_type
+            if event_type == EventType.FORMAT_DESCRIPTION_EVENT:
+                checksum_size = FormatDescriptionEvent(
+                    packet, header, offset).checksum_size
+                continue
+            if event_type in _TRANSACTION_START_TYPES:
+                pending = offset
+                continue
+            if event_type == EventType.QUERY_EVENT:
+                query = QueryEvent(packet, header, offset).query.strip().upper()
+                if query == "BEGIN":
+                    start = offset if pending is None else pending
+                    trans_tables = set()
+                    bucket = header.timestamp - header.timestamp % bucket_seconds
+                    if bucket not in buckets:
+                        buckets[bucket] = start
+                elif query not in ("COMMIT", "ROLLBACK") and start is None:
+                    # a statement on its own, DDL for instance.
+                    bucket = header.timestamp - header.timestamp % bucket_seconds
+                    if bucket not in buckets:
+                        buckets[bucket] = offset if pending is None else pending
+                pending = None
+                if query not in ("COMMIT", "ROLLBACK"):
+                    continue
+            elif event_type == EventType.TABLE_MAP_EVENT:
+                if trans_tables is not None:
+                    trans_tables.add("%s.%s" % peek_table_name(packet, body))
+                continue
+            elif event_type != EventType.XID_EVENT:
+                continue
+            # end of a transaction.
+            if start is not None:
+                for name in trans_tables:
+                    tables.setdefault(name, []).append(start)
+            start = None
+            trans_tables = None
+    finally:
+        source.disconnect()
+    index = BinlogIndex(os.path.basename(path), bucket_seconds,
+                        sorted(buckets.items()), tables)
+    log.debug("indexed %s: %d buckets, %d tables.",
+              path, len(index.buckets), len(tables))
+    return index
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from constants import EventType
+from event import EVENT_HEADER_OFFSET
+from mysql.connector import errors
+import collections
+import itertools
+import select
+
+
+class _Poller(object):
+    """
+    Readiness of a set of sockets, with epoll where there is one and
+    select elsewhere.
+    """
+    def __init__(self):
+        self._epoll = None
+        self._fds = set()
+        if hasattr(select, "epoll"):
+            self._epoll = select.epoll()
+
+    def register(self, fd):
+        self._fds.add(fd)
+        if self._epoll is not None:
+            self._epoll.register(fd, select.EPOLLIN)
+
+    def unregister(self, fd):
+        self._fds.discard(fd)
+        if self._epoll is not None:
+            self._epoll.unregister(fd)
+
+    def poll(self, timeout=None):
+        """
+        Wait for readable sockets, returns their fds.
+        """
+        if self._epoll is not None:
+            if timeout is None:
+                timeout = -1
+            return [fd for (fd, _) in self._epoll.poll(timeout)]
+        return select.select(list(self._fds), [], [], timeout)[0]
+
+    def close(self):
+        if self._epoll is not None:
+            self._epoll.close()
+
+
+class Multiplexer(object):
+    """
+    Events of several sources, dumped from several masters, read by a
+    single loop waiting on all their sockets at once.
+
+    sources is a dict of sources by name, or a list of sources named by
+    their index, each one already connected and dumping. Iterating
+    gives (name, event) tuples. Events of a source keep their order.
+    Without watermark, sources are interleaved as their events arrive.
+    With watermark, a number of seconds, events are merged by header
+    timestamp: an event is held until every source still dumping has
+    sent an event as recent, or until another source has sent one
+    watermark seconds more recent. Time is the time of the events
+    alone, whatever the lag of the consumer. A heartbeat tells its
+    master is idle, its source has then sent everything up to the time
+    it came.
+
+    Sources are read through their receive buffer, none may be made
+    with a recv_buffer_size of 0.
+    """
+    def __init__(self, sources, watermark=None):
+        if isinstance(sources, dict):
+            self._sources = dict(sources)
+        else:
+            self._sources = dict(enumerate(sources))
+        for name, source in self._sources.items():
+            if not source._recv_buffer_size:
+                raise ValueError("source %s: the multiplexer reads through "
+                                 "the receive buffer, recv_buffer_size "
+                                 "cannot be 0." % (name,))
+        self._watermark = watermark
+        self._queues = dict([(name, collections.deque())
+                             for name in self._sources])
+        self._latest = dict([(name, 0) for name in self._sources])
+        self._active = set(self._sources)
+        self._fds = {}
+        self._seq = itertools.count()
+        self._poller = None
+
+    def __iter__(self):
+        return self.events()
+
+    def events(self):
+        self._poller = _Poller()
+        try:
+            for name, source in self._sources.items():
+                sock = source._socket.sock
+                sock.setblocking(0)
+                self._fds[sock.fileno()] = name
+                self._poller.register(sock.fileno())
+                # events may have come in with the dump response.
+                self._read(name)
+            while True:
+                item = self._pop()
+                if item is not None:
+                    name, event, boundary = item
+                    yield name, event
+                    # the consumer is done with the events up to the
+                    # boundary.
+                    checkpoint = self._sources[name]._checkpoint
+                    if boundary is not None and checkpoint is not None:
+                        checkpoint.save(*boundary)
+                    continue
+                if not self._active:
+                    break
+                for fd in self._poller.poll():
+                    self._read(self._fds[fd])
+        finally:
+            self._poller.close()
+            self._poller = None
+
+    def _read(self, name):
+        source = self._sources[name]
+        if name not in self._active:
+            return
+        try:
+            packets = source._socket.recv_available()
+        except errors.Error:
+            log.warning("source %s: read failed.", name, exc_info=True)
+            self._end(name)
+            return
+        queue = self._queues[name]
+        for packet in packets:
+            if packet[4] == '\xfe' or packet[4] == '\xff':
+                log.debug("source %s: received eof or err packet.", name)
+                self._end(name)
+                return
+            event = source._make_event(packet, EVENT_HEADER_OFFSET)
+            if event is None:
+                if source._header.event_type == \
+                   EventType.HEARTBEAT_LOG_EVENT:
+                    # heartbeats carry no timestamp, they come when the
+                    # master has nothing more to send.
+                    self._latest[name] = max(self._latest[name],
+                                             int(source._last_heartbeat))
+                continue
+            boundary = source._boundary
+            source._boundary = None
+            if event.header.timestamp > self._latest[name]:
+                self._latest[name] = event.header.timestamp
+            queue.append((self._seq.next(), event, boundary))
+
+    def _end(self, name):
+        self._active.discard(name)
+        fd = self._sources[name]._socket.sock.fileno()
+        self._poller.unregister(fd)
+
+    def _head(self):
+        """
+        The source of the next event in the merge order, or None.
+        """
+        best = None
+        best_key = None
+        for name, queue in self._queues.iteritems():
+            if not queue:
+                continue
+            seq, event, _ = queue[0]
+            if self._watermark is None:
+                key = seq
+            else:
+                key = (event.header.timestamp, seq)
+            if best is None or key < best_key:
+                best = name
+                best_key = key
+        return best
+
+    def _limit(self):
+        """
+        Timestamp up to which the events are released.
+        """
+        return max(min([self._latest[n] for n in self._active]),
+                   max(self._latest.values()) - self._watermark)
+
+    def _pop(self):
+        name = self._head()
+        if name is None:
+            return None
+        queue = self._queues[name]
+        if self._watermark is not None and self._active and \
+           queue[0][1].header.timestamp > self._limit():
+            return None
+        _, event, boundary = queue.popleft()
+        return name, event, boundary
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from constants import EventType
+from event import EventHeader, FormatDescriptionEvent, QueryEvent
+from filesource import BinlogFileSource, BINLOG_MAGIC
+from index import BinlogIndex, index_path
+import collections
+import multiprocessing
+import os
+import re
+
+_FILE_RANGE = re.compile(r'^(.*?)(\d+)\.\.(?:\1)?(\d+)$')
+
+
+def expand_files(files, directory=None):
+    """
+    Expand a range of binlog files like "mysql-bin.000299..000400" to the
+    list of their paths, a list of files is returned as is. directory is
+    joined to the names when given.
+    """
+    if isinstance(files, basestring):
+        match = _FILE_RANGE.match(files)
+        if match is None:
+            files = [files]
+        else:
+            prefix, first, last = match.groups()
+            width = len(first)
+            files = ["%s%0*d" % (prefix, width, i)
+                     for i in range(int(first), int(last) + 1)]
+    if directory is not None:
+        files = [os.path.join(directory, f) for f in files]
+    return files
+
+
+def _commit_ends(path):
+    """
+    Generate the offsets following the commits of a binlog file, reading
+    the event headers alone but for the queries.
+    """
+    source = BinlogFileSource(path, stats=False)
+    source.connect()
+    checksum_size = 0
+    try:
+        while True:
+            try:
+                packet, offset = source._read_event()
+            except StopIteration:
+                break
+            header = EventHeader(packet, offset, checksum_size)
+            event_type = header.event_type
+            if event_type == EventType.XID_EVENT:
+                yield offset + header.event_size
+            elif event_type == EventType.QUERY_EVENT:
+                query = QueryEvent(packet, header, offset).query
+                if query.strip().upper() in ("COMMIT", "ROLLBACK"):
+                    yield offset + header.event_size
+            elif event_type == EventType.FORMAT_DESCRIPTION_EVENT:
+                checksum_size = FormatDescriptionEvent(
+                    packet, header, offset).checksum_size
+    finally:
+        source.disconnect()
+
+
+def _chunks(path, chunk_size):
+    """
+    Split a binlog file in (path, start, end) chunks of about chunk_size
+    bytes, end None being the end of the file. They are cut at the
+    transaction starts of its index, or after commits found by a scan of
+    the headers when it has no index.
+    """
+    if chunk_size is None or os.path.getsize(path) <= chunk_size:
+        return [(path, len(BINLOG_MAGIC), None)]
+    if os.path.exists(index_path(path)):
+        index = BinlogIndex.load(index_path(path))
+        offsets = sorted(set([o for (_, o) in index.buckets]))
+    else:
+        offsets = _commit_ends(path)
+    chunks = []
+    start = len(BINLOG_MAGIC)
+    for offset in offsets:
+        if offset - start >= chunk_size:
+            chunks.append((path, start, offset))
+            start = offset
+    chunks.append((path, start, None))
+    return chunks
+
+
+def _scan_chunk(task):
+    """
+    Decode the transactions of a chunk, in a worker process. Returns a
+    list of (log_file, log_pos, xid, rows), rows being the list of
+    (event_type, schema, table, row) of the transaction.
+    """
+    path, start, end, tables, conf = task
+    source = BinlogFileSource(path, **conf)
+    for db, table, columns in tables:
+        source.add_table(db, table, columns)
+    source.connect()
+    res = []
+    try:
+        source.binlog_dump(offset=start)
+        for trans in source.transactions():
+            # the transaction starting at end is the next chunk's.
+            if end is not None and trans.log_pos > end:
+                break
+            res.append((trans.log_file, trans.log_pos, trans.xid,
+                        list(trans.rows())))
+            if end is not None and trans.log_pos == end:
+                break
+    finally:
+        source.disconnect()
+    log.debug("scanned %s from %d: %d transactions.",
+              path, start, len(res))
+    return res
+
+
+def scan(files, tables=(), processes=None, chunk_size=64 * 1024 * 1024,
+         directory=None, **kwargs):
+    """
+    Decode binlog files in a pool of processes and generate their
+    transactions in binlog order, as (log_file, log_pos, xid, rows).
+
+    files is a list of binlog files or a range of them (see
+    expand_files). tables is a list of (db, table, columns) as given to
+    Source.add_table, all the tables are decoded when it is empty.
+    Files are split in chunks of about chunk_size bytes, at the
+    transaction starts of their sidecar index (see index.build_index)
+    when they have one. At most twice as many chunks as processes are
+    decoded or waiting to be consumed at a time. The other arguments are
+    the connection options used to look the columns of the subscribed
+    tables up.
+    """
+    # files are only split as their chunks come up.
+    tasks = ((path, start, end, list(tables), kwargs)
+             for name in expand_files(files, directory)
+             for (path, start, end) in _chunks(name, chunk_size))
+    if processes == 1:
+        for task in tasks:
+            for trans in _scan_chunk(task):
+                yield trans
+        return
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        # results are handed back in the order of the tasks, the next
+        # ones submitted as the oldest are consumed.
+        pending = collections.deque()
+        while True:
+            for task in tasks:
+                pending.append(pool.apply_async(_scan_chunk, (task,)))
+                if len(pending) >= 2 * processes:
+                    break
+            if not pending:
+                break
+            for trans in pending.popleft().get():
+                yield trans
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+import re
+
+_NAME = r'(?:`([^`]+)`|(\w+))'
+_QUALIFIED_NAME = re.compile(r'\s*' + _NAME + r'(?:\s*\.\s*' + _NAME + r')?')
+_SEPARATOR = re.compile(r'\s*(?:,|TO\b)', re.I)
+_COMMENTS = re.compile(r'^(?:\s+|/\*.*?\*/|#[^\n]*\n|--[^\n]*\n)*', re.S)
+_ALTER_TABLE = re.compile(r'ALTER\s+(?:ONLINE\s+|OFFLINE\s+)?(?:IGNORE\s+)?'
+                          r'TABLE\s', re.I)
+_CREATE_TABLE = re.compile(r'CREATE\s+(?:TEMPORARY\s+)?TABLE\s+'
+                           r'(?:IF\s+NOT\s+EXISTS\s)?', re.I)
+_DROP_TABLE = re.compile(r'DROP\s+(?:TEMPORARY\s+)?TABLES?\s+'
+                         r'(?:IF\s+EXISTS\s)?', re.I)
+_RENAME_TABLE = re.compile(r'RENAME\s+TABLES?\s', re.I)
+_DATABASE = re.compile(r'(?:ALTER|CREATE|DROP)\s+(?:DATABASE|SCHEMA)\s+'
+                       r'(?:IF\s+(?:NOT\s+)?EXISTS\s)?', re.I)
+
+
+def _read_names(query, pos, schema):
+    """
+    Read a comma separated list of table names, RENAME's "a TO b" pairs
+    included, starting at pos.
+    """
+    tables = []
+    while True:
+        match = _QUALIFIED_NAME.match(query, pos)
+        if not match:
+            break
+        first = match.group(1) or match.group(2)
+        second = match.group(3) or match.group(4)
+        if second:
+            tables.append((first, second))
+        else:
+            tables.append((schema, first))
+        match = _SEPARATOR.match(query, match.end())
+        if not match:
+            break
+        pos = match.end()
+    return tables
+
+
+def ddl_tables(schema, query):
+    """
+    Get the tables whose columns a statement may change.
+
+    schema is the default database of the statement. Returns a list of
+    (schema, table) tuples, table is None when a whole database is
+    changed. Statements other than DDL give an empty list.
+    """
+    pos = _COMMENTS.match(query).end()
+    for ddl in (_ALTER_TABLE, _CREATE_TABLE, _DROP_TABLE, _RENAME_TABLE):
+        match = ddl.match(query, pos)
+        if match:
+            return _read_names(query, match.end(), schema)
+    match = _DATABASE.match(query, pos)
+    if match:
+        return [(name, None) for (_, name) in
+                _read_names(query, match.end(), None)]
+    return []
+
+
+class SchemaCache(object):
+    """
+    Column definitions of tables from information_schema, keyed by
+    (schema, table) and shared by all the table_ids of a table.
+
+    query is a callable running a statement and returning (rows,
+    description) like Connection.query. Entries stay until invalidate()
+    is called for their table, typically on a DDL seen in the binlog.
+    """
+    def __init__(self, query):
+        self._query = query
+        self._columns = {}
+
+    def get(self, schema, table):
+        key = (schema, table)
+        columns = self._columns.get(key)
+        if columns is None:
+            sql = '''SELECT * FROM information_schema.columns ''' \
+                  '''WHERE table_schema="%s" AND table_name="%s" ''' \
+                  '''ORDER BY ORDINAL_POSITION;''' % (schema, table)
+            columns, _ = self._query(sql)
+            self._columns[key] = columns
+        return columns
+
+    def invalidate(self, schema, table=None):
+        """
+        Drop a table, or all the tables of a schema when table is None.
+        """
+        if table is not None:
+            self._columns.pop((schema, table), None)
+            return
+        for key in self._columns.keys():
+            if key[0] == schema:
+                del self._columns[key]
+
+    def invalidate_ddl(self, schema, query):
+        """
+        Drop the tables changed by a statement.
+
+        Returns the list of (schema, table) tuples it touched.
+        """
+        tables = ddl_tables(schema, query)
+        for schema, table in tables:
+            self.invalidate(schema, table)
+        return tables
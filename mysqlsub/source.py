@@ -1,167 +1,742 @@
-#!/usr/bin/env python
-#coding:utf-8
-
-from connection import Connection
-from tools import log
-from tools import open_cursor
-from tools import get_trace_info
-from mysql.connector import utils
-from mysql.connector.protocol import MySQLProtocol
-from mysql.connector.constants import ServerCmd
-from event import *
-import json
-
-class Source(object):
-    def __init__(self, **kwargs):
-        self._socket = None
-        self._conf = kwargs
-        self._conn = None
-        self._tables = {}
-
-    def _query(self, sql):
-        """
-        Query mysql with reconnecting once on failure.
-        """
-        try:
-            res = []
-            with open_cursor(self._conn) as cursor:
-                cursor.execute(sql)
-                columns_desc = cursor.description
-                columns = tuple([d[0] for d in columns_desc])
-                for row in cursor:
-                    res.append(dict(zip(columns, row)))
-            return res, columns_desc
-        except:
-            self.disconnect()
-            self.connect()
-            res = []
-            with open_cursor(self._conn) as cursor:
-                cursor.execute(sql)
-                columns_desc = cursor.description
-                columns = tuple([d[0] for d in columns_desc])
-                print cursor.description
-                for row in cursor:
-                    res.append(dict(zip(columns, row)))
-            return res, columns_desc
-        
-    def connect(self):
-        """
-        build connection to mysql server.
-        """
-        self._conn = Connection(**(self._conf))
-        self._conn.connect()
-        self._socket = self._conn.socket
-    
-    def disconnect(self):
-        """
-        disconnect mysql server.
-        """
-        self._conn.close()
-        self._socket = None
-
-    def show_master_status(self):
-        res, _ = self._query("show master status;")
-        print res
-        return res[0]
-    
-    def get_server_id(self):
-        return 123456
-    
-    def binlog_dump(self, log_file, offset):
-        """
-        COM_BINLOG_DUMP
-        +=============================================+
-        | packet header    |  packet length    0 : 3 |   
-        |                  +-------------------------+   
-        |                  |  sequence number  3 : 1 |
-        +============================================+
-        | command packet   |  command code     4 : 1 |    COM_BINLOG_DUMP
-        |                  +------------------------―+
-        |                  |  offset           5 : 4 |
-        |                  +-------------------------+
-        |                  |  flags            9 : 2 |
-        |                  +-------------------------+
-        |                  |  server id        11 : 4|
-        |                  +-------------------------+
-        |                  |  log name         15 : x|
-        +============================================+
-        """
-        
-        payload = ''
-        payload += utils.int1store(ServerCmd.BINLOG_DUMP)
-        payload += utils.int4store(offset)
-        payload += utils.int2store(0)
-        payload += utils.int4store(self.get_server_id()) 
-        payload += log_file
-        payload += '\x00'
-        log.debug("len(payload) = %d" % len(payload))
-        
-        # send BIGLOGDUMP command and parse ok packet response.
-        self._socket.send(payload, 0)
-        ok_packet = self._socket.recv()
-        parser = MySQLProtocol()
-        ok_packet = parser.parse_ok(ok_packet)
-        print ok_packet
-    
-    def __iter__(self):
-        return self  
-        
-    def next(self):
-        packet = self._socket.recv()
-        event = BinlogEvent(packet)
-        log.debug(str(event))
-        if event.is_eof() or event.is_error():
-            raise StopIteration
-        event_type = EventMap().get_event_type(event.header.event_type)
-        if event_type:
-            event = event_type(packet)
-            log.debug(str(event))
-        return event
-    
-    def add_table(self, db, table, col):
-        if db not in self._tables:
-            self._tables[db] = {}
-        if table not in self._tables[db]:
-            self._tables[db][table] = {"columns_info":{}, "do_columns":{}, 
-                                       "pos_map":{}}
-        for i in col:
-            if not isinstance(i, str):
-                log.warning("non-string col name.")
-                continue
-            if i not in self._tables[db][table]["do_columns"]:
-                self._tables[db][table]["do_columns"][i] = None
-        log.debug(json.dumps(self._tables))
-    
-    def get_full_columns(self):
-        for db, tables in self._tables.items():
-            for table, desc in tables.items():
-                try:
-                    sql = "show full columns from %s.%s" % (db, table)
-                    res, _ = self._query(sql)
-                    for idx, field in enumerate(res):
-                        if field["Field"] in desc["do_columns"]:
-                            desc["columns_info"][idx] = \
-                            {"name":field["Field"], \
-                             "type":field["Type"], \
-                             "Default":field["Default"]}
-                except:
-                    log.warning(get_trace_info())
-                    continue
-                log.debug(json.dumps(self._tables))
-    
-    def get_columns_info(self):
-        for db, tables in self._tables.items():
-            for table, desc in tables.items():
-                try:
-                    sql = "select * from %s.%s limit 0,0" % (db, table)
-                    res, columns_desc = self._query(sql)
-                    for idx, field in enumerate(columns_desc):
-                        if field[0] in desc["do_columns"]:
-                            desc["columns_info"][field[0]] = field
-                            desc["pos_map"][idx] = field[0]
-                except:
-                    log.warning(get_trace_info())
-                    continue
-                log.debug(json.dumps(self._tables))
-            
-            
+#!/usr/bin/env python
+#coding:utf-8
+
+from connection import Connection
+from tools import log
+from mysql.connector import utils
+from mysql.connector import errors
+from mysql.connector.protocol import MySQLProtocol
+from mysql.connector.constants import ServerCmd
+from event import *
+from schema import SchemaCache
+from transaction import Transaction
+from stats import Stats, StatsServer
+from utils import DECIMAL_MODES
+import collections
+import json
+import multiprocessing
+import Queue
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+
+# queued by the reader thread of pipelined() when the dump stalled.
+_STALLED = object()
+
+
+class _StoppedDump(object):
+    """
+    Dump socket of a source whose pipelined() stopped early, the packets
+    taken by its reader are lost.
+    """
+    def recv(self):
+        raise errors.InterfaceError("the dump was stopped with pipelined() "
+                                    "and has to be reopened")
+
+# table map entries known to a worker process of pipelined(), by
+# _table_key(), their compiled decoders kept with them.
+_worker_tables = {}
+_WORKER_TABLES_MAX = 1024
+
+
+def _table_key(table_id, table):
+    return (table_id, table["columns_def"], table["do_columns"],
+            table.get("decimal_mode", "decimal"))
+
+
+def _decode_rows(task):
+    """
+    Decode the rows of a rows event in a worker process of pipelined(),
+    returns them as a list. The table map entry comes with the task the
+    first times, the key alone afterwards. Returns None when the worker
+    does not know the key yet.
+    """
+    packet, offset, checksum_size, key, table = task
+    if table is None:
+        table = _worker_tables.get(key)
+        if table is None:
+            return None
+    elif key not in _worker_tables:
+        if len(_worker_tables) >= _WORKER_TABLES_MAX:
+            _worker_tables.clear()
+        _worker_tables[key] = table
+    else:
+        table = _worker_tables[key]
+    header = EventHeader(packet, offset, checksum_size)
+    event_type = EventMap.get_event_type(header.event_type)
+    event = event_type(packet, {key[0]:table}, {}, header, offset)
+    return list(event.rows())
+
+
+class Source(object):
+    def __init__(self, **kwargs):
+        self._socket = None
+        # options of the dump socket, the rest goes to the connection.
+        self._recv_buffer_size = kwargs.pop("recv_buffer_size", 65536)
+        self._so_rcvbuf = kwargs.pop("so_rcvbuf", None)
+        # rows of a transaction kept in memory before spilling to disk.
+        self._transaction_memory_limit = \
+            kwargs.pop("transaction_memory_limit", 64 * 1024 * 1024)
+        # a Checkpoint saved at transaction boundaries.
+        self._checkpoint = kwargs.pop("checkpoint", None)
+        # seconds without any packet, heartbeats included, before the dump
+        # connection is taken for dead and reopened.
+        self._stall_timeout = kwargs.pop("stall_timeout", None)
+        self._heartbeat_period = kwargs.pop("heartbeat_period", None)
+        if self._heartbeat_period is None:
+            # often enough to notice a stall, and to sync the checkpoint
+            # in time while the stream is idle.
+            periods = []
+            if self._stall_timeout:
+                periods.append(self._stall_timeout / 3.0)
+            if self._checkpoint is not None and \
+               self._checkpoint._sync_interval:
+                periods.append(self._checkpoint._sync_interval)
+            if periods:
+                self._heartbeat_period = min(periods)
+        # events whose checksum is verified: 0 for none, 1 for all, n
+        # for one in n.
+        self._verify_checksums = int(kwargs.pop("verify_checksums", 0))
+        # what DECIMAL columns decode to, one of DECIMAL_MODES, for
+        # the tables added without a mode of their own.
+        self._decimal_mode = kwargs.pop("decimal_mode", "decimal")
+        if self._decimal_mode not in DECIMAL_MODES:
+            raise ValueError("unknown decimal mode: %s" % self._decimal_mode)
+        # live counters, see stats(), off unless asked for.
+        self._stats = None
+        if kwargs.pop("stats", False):
+            self._stats = Stats()
+        self._conf = kwargs
+        self._conn = None
+        self._ctl_conn = None
+        self._tables = {}
+        self._table_map = {}
+        self._skipped_tables = set()
+        self._schema_cache = SchemaCache(self._query)
+        # position of the last event read, and of the last transaction
+        # boundary not saved to the checkpoint yet.
+        self._log_file = None
+        self._log_pos = None
+        self._boundary = None
+        # position to dump from again after a stall.
+        self._resume = None
+        self._last_heartbeat = None
+        # size of the checksum ending the events, told by the format
+        # description event.
+        self._checksum_size = 0
+        self._checksummed = 0
+        # header of the last event built, dropped or not.
+        self._header = None
+
+    def _query(self, sql):
+        """
+        Query mysql on the control connection, the dump connection is 
+        busy with the binlog stream once binlog_dump has been sent.
+        """
+        return self._control_connection().query(sql)
+    
+    def _control_connection(self):
+        if self._ctl_conn is None:
+            self._ctl_conn = Connection(**(self._conf))
+            self._ctl_conn.connect()
+        return self._ctl_conn
+        
+    def connect(self):
+        """
+        build connection to mysql server.
+        """
+        self._conn = Connection(**(self._conf))
+        self._conn.connect()
+        self._socket = self._conn.socket
+    
+    def disconnect(self):
+        """
+        disconnect mysql server.
+        """
+        self._conn.close()
+        self._socket = None
+        if self._checkpoint is not None:
+            self._checkpoint.sync()
+        if self._ctl_conn is not None:
+            self._ctl_conn.close()
+            self._ctl_conn = None
+
+    def show_master_status(self):
+        res, _ = self._query("show master status;")
+        return res[0]
+    
+    def get_server_id(self):
+        return 123456
+    
+    def position(self):
+        """
+        (log_file, log_pos) of the last event read.
+        """
+        return (self._log_file, self._log_pos)
+    
+    def binlog_dump(self, log_file=None, offset=None):
+        """
+        Start dumping from log_file at offset. When they are not given
+        the dump resumes from the checkpoint, or from the current master
+        position without one.
+        
+
+        COM_BINLOG_DUMP
+        +=============================================+
+        | packet header    |  packet length    0 : 3 |   
+        |                  +-------------------------+   
+        |                  |  sequence number  3 : 1 |
+        +============================================+
+        | command packet   |  command code     4 : 1 |    COM_BINLOG_DUMP
+        |                  +------------------------―+
+        |                  |  offset           5 : 4 |
+        |                  +-------------------------+
+        |                  |  flags            9 : 2 |
+        |                  +-------------------------+
+        |                  |  server id        11 : 4|
+        |                  +-------------------------+
+        |                  |  log name         15 : x|
+        +============================================+
+        """
+        if log_file is None or offset is None:
+            position = None
+            if self._checkpoint is not None:
+                position = self._checkpoint.load()
+            if position is None:
+                status = self.show_master_status()
+                position = (status["File"], status["Position"])
+            log_file, offset = position
+            log.info("dump from %s:%d.", log_file, offset)
+        # names read back from the master or the checkpoint are unicode.
+        log_file = str(log_file)
+        self._log_file = log_file
+        self._log_pos = offset
+        self._boundary = None
+        self._resume = (log_file, offset)
+        self._checksum_size = 0
+        
+        # masters logging checksums only dump to the clients saying they
+        # handle them, the format description event then tells.
+        res, _ = self._conn.query("SHOW GLOBAL VARIABLES LIKE "
+                                  "'binlog_checksum'")
+        if res and res[0]["Value"].upper() != "NONE":
+            self._conn.query("SET @master_binlog_checksum = "
+                             "@@global.binlog_checksum")
+        
+        if self._heartbeat_period:
+            # the master takes the period in nanoseconds.
+            self._conn.query("SET @master_heartbeat_period = %d" % 
+                             int(self._heartbeat_period * 1000000000))
+        
+        payload = ''
+        payload += utils.int1store(ServerCmd.BINLOG_DUMP)
+        payload += utils.int4store(offset)
+        payload += utils.int2store(0)
+        payload += utils.int4store(self.get_server_id()) 
+        payload += log_file
+        payload += '\x00'
+        
+        # events are read through the receive buffer from now on.
+        if self._recv_buffer_size:
+            self._socket.set_buffered(self._recv_buffer_size, self._so_rcvbuf)
+        if self._stall_timeout:
+            self._socket.sock.settimeout(self._stall_timeout)
+        
+        # send BIGLOGDUMP command and parse ok packet response.
+        self._socket.send(payload, 0)
+        ok_packet = self._socket.recv()
+        parser = MySQLProtocol()
+        parser.parse_ok(ok_packet)
+    
+    def seek(self, index, timestamp=None, schema=None, table=None):
+        """
+        Start dumping the file of a BinlogIndex from the first transaction
+        started at or after timestamp and writing schema.table when they
+        are given. Returns the offset, or None without dumping when the
+        file has no such transaction.
+        """
+        offset = index.seek(timestamp, schema, table)
+        if offset is not None:
+            self.binlog_dump(index.log_file, offset)
+        return offset
+    
+    def __iter__(self):
+        return self  
+        
+    def next(self):
+        # the consumer is done with the events up to the boundary.
+        if self._boundary is not None:
+            if self._checkpoint is not None:
+                self._checkpoint.save(*self._boundary)
+            self._boundary = None
+        while True:
+            packet, offset = self._read_event()
+            event = self._make_event(packet, offset)
+            if event is not None:
+                return event
+    
+    def _read_event(self, reconnect=True):
+        """
+        Read the next event, returns the buffer holding it and the offset
+        of its header in there. Raises StopIteration at the end.
+        
+        When a stall timeout is set, a dump connection silent for that 
+        long or lost is reopened, dumping again from the last transaction
+        boundary, unless reconnect is false and the error is raised.
+        """
+        while True:
+            try:
+                packet = self._socket.recv()
+                break
+            except errors.InterfaceError, err:
+                if not self._stall_timeout or not reconnect:
+                    raise
+                log.warning("dump connection stalled: %s", err)
+                self._reconnect()
+        if packet[4] == '\xfe':
+            log.debug("received eof packet.")
+            raise StopIteration
+        if packet[4] == '\xff':
+            log.debug("received err packet.")
+            raise StopIteration
+        return packet, EVENT_HEADER_OFFSET
+    
+    def _reconnect(self):
+        log_file, log_pos = self._resume
+        log.warning("reconnect and dump from %s:%d.", log_file, log_pos)
+        try:
+            self._conn.close()
+        except:
+            log.warning("close failed.", exc_info=True)
+        self.connect()
+        self.binlog_dump(log_file, log_pos)
+    
+    def pipelined(self, processes=None, min_size=1024, depth=256):
+        """
+        Generate the events like iterating the source does, with the 
+        packets received by a dedicated thread and the rows of the rows
+        events of min_size bytes or more decoded by a pool of processes.
+        Up to depth events are in flight, they are handed out in binlog
+        order whatever the order their decoding finishes in.
+        
+        The reader thread only receives. A stall is queued behind the
+        packets received before it, the connection is reopened once they
+        are made into events, dropping those following the last
+        transaction boundary, sent again by the new dump. Like when
+        iterating, the events of that transaction handed out already
+        come again.
+        
+        When the generator is not run to the end, the reader is stopped
+        and the dump connection left unusable: iterating the source 
+        again raises InterfaceError, or with a stall timeout dumps again
+        from the last transaction boundary the consumer was done with, 
+        like a checkpoint would.
+        """
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        # fork the workers before the thread is started.
+        pool = multiprocessing.Pool(processes)
+        # table map entries sent, and tasks left to send with the entry,
+        # by key.
+        entries = {}
+        full = collections.defaultdict(lambda: processes)
+        packets = Queue.Queue(depth)
+        stop = threading.Event()
+        reader = self._start_reader(packets, stop)
+        pending = collections.deque()
+        failure = None
+        done = False
+        finished = False
+        # the last transaction boundary the consumer was done with.
+        resume = self._resume
+        try:
+            while not done or pending:
+                # read ahead while the oldest event may still be decoding.
+                if not done and len(pending) < depth and \
+                   (not pending or not packets.empty()):
+                    packet, offset, failure = packets.get()
+                    if failure is _STALLED:
+                        failure = None
+                        # the events past the resume position come again.
+                        while pending and not pending[-1][4]:
+                            pending.pop()
+                        self._reconnect()
+                        reader = self._start_reader(packets, stop)
+                        continue
+                    if packet is None:
+                        done = True
+                        continue
+                    previous = self._resume
+                    event = self._make_event(packet, offset)
+                    if event is None:
+                        continue
+                    boundary = self._boundary
+                    self._boundary = None
+                    task = None
+                    result = None
+                    if isinstance(event, RowsEvent) and \
+                       event.header.event_size >= min_size:
+                        task = self._decode_task(packet, offset, 
+                                                 event.header, entries, 
+                                                 full)
+                    if task is not None:
+                        result = pool.apply_async(_decode_rows, (task,))
+                    pending.append((event, task, result, boundary, 
+                                    self._resume is not previous))
+                    continue
+                event, task, result, boundary, _ = pending.popleft()
+                if result is not None:
+                    rows = result.get()
+                    if rows is None:
+                        # the worker missed the entry, send it again.
+                        key = task[3]
+                        full[key] += 1
+                        # a copy, the decoders compiled here stay here.
+                        rows = _decode_rows(task[:4] + 
+                                            (dict(entries[key]),))
+                    event.set_rows(rows)
+                yield event
+                if boundary is not None:
+                    resume = boundary
+                    if self._checkpoint is not None:
+                        self._checkpoint.save(*boundary)
+            finished = failure is None
+            if failure is not None:
+                raise failure[0], failure[1], failure[2]
+        finally:
+            stop.set()
+            if not finished:
+                self._stop_dump(reader, resume)
+            pool.terminate()
+            pool.join()
+    
+    def _stop_dump(self, reader, resume):
+        """
+        Stop the reader of a pipelined() stopped early and leave the dump
+        connection unusable, to be reopened from resume.
+        """
+        # the reader notices stop unless it is blocked receiving.
+        reader.join(0.1)
+        if reader.is_alive():
+            try:
+                self._socket.sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                log.warning("shutdown failed.", exc_info=True)
+            reader.join()
+        self._socket = _StoppedDump()
+        self._resume = resume
+        self._boundary = None
+    
+    def _decode_task(self, packet, offset, header, entries, full):
+        """
+        Task of _decode_rows for a rows event, None without its table
+        map. The entry goes with the task while full has sends left for
+        its key, workers keep it with the decoders they compile. entries
+        holds the entries sent by key.
+        """
+        table_id = peek_table_id(packet, offset + EVENT_HEADER_SIZE)
+        table = self._table_map.get(table_id)
+        if table is None:
+            return None
+        key = _table_key(table_id, table)
+        if key not in entries:
+            # compiled decoders do not pickle, workers compile their own.
+            entries[key] = dict([(k, v) for (k, v) in table.items()
+                                 if k != "decoders"])
+        sent = None
+        if full[key] > 0:
+            full[key] -= 1
+            sent = entries[key]
+        if not isinstance(packet, str):
+            packet = packet[offset:offset + header.event_size]
+            offset = 0
+        return (packet, offset, header.checksum_size, key, sent)
+    
+    def _start_reader(self, packets, stop):
+        reader = threading.Thread(target=self._receive, args=(packets, stop))
+        reader.daemon = True
+        reader.start()
+        return reader
+    
+    def _receive(self, packets, stop):
+        """
+        Body of the reader thread of pipelined(), queues (packet, offset,
+        None) until the end of the stream, then (None, None, exc_info)
+        with exc_info None on a normal end, or _STALLED when the dump
+        stalled and is to be reopened.
+        """
+        error = None
+        try:
+            while not stop.is_set():
+                packet, offset = self._read_event(False)
+                self._put(packets, stop, (packet, offset, None))
+        except StopIteration:
+            pass
+        except errors.InterfaceError, err:
+            if not self._stall_timeout:
+                log.warning("receive failed.", exc_info=True)
+                error = sys.exc_info()
+            else:
+                log.warning("dump connection stalled: %s", err)
+                error = _STALLED
+        except:
+            log.warning("receive failed.", exc_info=True)
+            error = sys.exc_info()
+        self._put(packets, stop, (None, None, error))
+    
+    def _put(self, packets, stop, item):
+        while not stop.is_set():
+            try:
+                packets.put(item, True, 0.1)
+                return
+            except Queue.Full:
+                continue
+    
+    def transactions(self):
+        """
+        Generate the transactions of the binlog stream instead of its
+        events. A transaction is only valid until the next one is asked
+        for, its spill file is removed then. Events outside of any 
+        transaction, DDL for instance, are skipped.
+        """
+        trans = None
+        for event in self:
+            if isinstance(event, RowsEvent):
+                if trans is not None:
+                    trans.add(event)
+                continue
+            if isinstance(event, XidEvent):
+                if trans is not None:
+                    trans.commit(event.header, event.xid, self._log_file)
+                    yield trans
+                    trans.close()
+                    trans = None
+                continue
+            if not isinstance(event, QueryEvent):
+                continue
+            query = event.query.strip().upper()
+            if query == "BEGIN":
+                if trans is not None:
+                    trans.close()
+                trans = Transaction(self._transaction_memory_limit, 
+                                    event.header)
+            elif query in ("COMMIT", "ROLLBACK") and trans is not None:
+                trans.commit(event.header, None, self._log_file)
+                yield trans
+                trans.close()
+                trans = None
+    
+    def stats(self):
+        """
+        Snapshot of the statistics of the source, see Stats.snapshot(), 
+        None unless the source was made with stats=True.
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+    
+    def serve_stats(self, port, host="127.0.0.1"):
+        """
+        Serve the statistics in the Prometheus text format from a daemon
+        thread, returns the StatsServer.
+        """
+        if self._stats is None:
+            raise ValueError("stats are disabled, make the source with "
+                             "stats=True")
+        server = StatsServer(self._stats, port, host)
+        server.start()
+        return server
+    
+    def _make_event(self, packet, offset=EVENT_HEADER_OFFSET):
+        """
+        Build the event at offset in packet, or return None when it 
+        belongs to a table nobody subscribed to.
+        """
+        if self._stats is None:
+            return self._build_event(packet, offset)
+        start = time.time()
+        event = self._build_event(packet, offset)
+        elapsed = time.time() - start
+        # the header parsed by _build_event, dropped events included.
+        header = self._header
+        table = None
+        if event is not None:
+            event._stats = self._stats
+            if event._decoded:
+                # decoded while made, a table map or a rotate.
+                self._stats.record_decode(header.event_type, elapsed)
+            else:
+                event._decode_seconds = elapsed
+            if header.event_type in ROWS_EVENT_TYPES or \
+               header.event_type == EventType.TABLE_MAP_EVENT:
+                entry = self._table_map.get(
+                    peek_table_id(packet, offset + EVENT_HEADER_SIZE))
+                if entry is not None:
+                    table = "%s.%s" % (entry["schema"], entry["table"])
+        self._stats.record(header.event_type, table, header.event_size, 
+                           header.timestamp)
+        return event
+    
+    def _build_event(self, packet, offset):
+        # only the header is decoded here, bodies are decoded on demand.
+        header = self._header = EventHeader(packet, offset, 
+                                            self._checksum_size)
+        body = offset + EVENT_HEADER_SIZE
+        if self._checksum_size and self._verify_checksums and \
+           header.event_type != EventType.FORMAT_DESCRIPTION_EVENT:
+            self._verify_checksum(packet, offset, header)
+        if header.event_type == EventType.ROTATE_EVENT:
+            event = RotateEvent(packet, header, offset).decode()
+            self._log_file = event.next_log_file
+            self._log_pos = event.position
+            self._resume = (self._log_file, self._log_pos)
+            return event
+        if header.event_type == EventType.HEARTBEAT_LOG_EVENT:
+            # only tells the connection is alive while the master is idle.
+            self._last_heartbeat = time.time()
+            if self._checkpoint is not None:
+                self._checkpoint.tick()
+            return None
+        # log_pos is 0 in the events made up by the master for the dump.
+        if header.log_pos:
+            self._log_pos = header.log_pos
+        if header.event_type == EventType.FORMAT_DESCRIPTION_EVENT:
+            event = FormatDescriptionEvent(packet, header, offset).decode()
+            self._checksum_size = event.checksum_size
+            return event
+        if header.event_type in ROWS_EVENT_TYPES and self._tables and \
+           peek_table_id(packet, body) in self._skipped_tables:
+            return None
+        event_type = EventMap.get_event_type(header.event_type)
+        if event_type is None:
+            return BinlogEvent(packet, header, offset)
+        if event_type is TableMapEvent:
+            if self._tables and not self._filter_table_map(packet, body):
+                return None
+            # later rows events need the table map, decode it right away.
+            event = TableMapEvent(packet, self._table_map, self._tables, 
+                                  self._schema_cache, header, offset, 
+                                  self._decimal_mode)
+            return event.decode()
+        if event_type is QueryEvent:
+            event = QueryEvent(packet, header, offset)
+            query = event.query.strip().upper()
+            if self._invalidate_schemas(event) or \
+               query == "COMMIT" or query == "ROLLBACK":
+                self._mark_boundary()
+            return event
+        if event_type is XidEvent:
+            self._mark_boundary()
+        if issubclass(event_type, RowsEvent):
+            return event_type(packet, self._table_map, self._tables, header, 
+                              offset)
+        return event_type(packet, header, offset)
+    
+    def _verify_checksum(self, packet, offset, header):
+        """
+        Check the CRC32 ending an event, of one event in every
+        verify_checksums. Raises ValueError on a mismatch.
+        """
+        self._checksummed += 1
+        if self._checksummed % self._verify_checksums:
+            return
+        end = offset + header.event_size - CHECKSUM_SIZE
+        crc = zlib.crc32(buffer(packet, offset, end - offset)) & 0xffffffff
+        if crc != struct.unpack_from('<I', packet, end)[0]:
+            raise ValueError("checksum mismatch of the event ending at "
+                             "%s:%d." % (self._log_file, header.log_pos))
+    
+    def _mark_boundary(self):
+        self._boundary = (self._log_file, self._log_pos)
+        self._resume = self._boundary
+    
+    def _filter_table_map(self, packet, body=EVENT_BODY_OFFSET):
+        """
+        Check the table of a table map event against the subscriptions.
+        The table_ids of unsubscribed tables are remembered so that their
+        rows events are dropped after reading the table_id alone.
+        """
+        table_id = peek_table_id(packet, body)
+        schema, table = peek_table_name(packet, body)
+        if schema in self._tables and table in self._tables[schema]:
+            self._skipped_tables.discard(table_id)
+            return True
+        self._skipped_tables.add(table_id)
+        self._table_map.pop(table_id, None)
+        return False
+    
+    def _invalidate_schemas(self, event):
+        """
+        Forget the cached columns and table maps of tables changed by DDL.
+        Returns the list of (schema, table) changed.
+        """
+        tables = self._schema_cache.invalidate_ddl(event.schema, event.query)
+        for schema, table in tables:
+            log.debug("schema changed: %s.%s", schema, table)
+            for table_id, entry in self._table_map.items():
+                if entry["schema"] == schema and \
+                   (table is None or entry["table"] == table):
+                    del self._table_map[table_id]
+        return tables
+    
+    def add_table(self, db, table, col, decimal_mode=None):
+        if decimal_mode is None:
+            decimal_mode = self._decimal_mode
+        elif decimal_mode not in DECIMAL_MODES:
+            raise ValueError("unknown decimal mode: %s" % decimal_mode)
+        if db not in self._tables:
+            self._tables[db] = {}
+        if table not in self._tables[db]:
+            self._tables[db][table] = {"columns_info":{}, "do_columns":{}, 
+                                       "pos_map":{}}
+        self._tables[db][table]["decimal_mode"] = decimal_mode
+        for i in col:
+            if not isinstance(i, str):
+                log.warning("non-string col name.")
+                continue
+            if i not in self._tables[db][table]["do_columns"]:
+                self._tables[db][table]["do_columns"][i] = None
+        if log.enabled():
+            log.debug(json.dumps(self._tables))
+    
+    def get_full_columns(self):
+        for db, tables in self._tables.items():
+            for table, desc in tables.items():
+                try:
+                    sql = "show full columns from %s.%s" % (db, table)
+                    res, _ = self._query(sql)
+                    for idx, field in enumerate(res):
+                        if field["Field"] in desc["do_columns"]:
+                            desc["columns_info"][idx] = \
+                            {"name":field["Field"], \
+                             "type":field["Type"], \
+                             "Default":field["Default"]}
+                except:
+                    log.warning("columns of %s.%s not found.", db, table,
+                                exc_info=True)
+                    continue
+                if log.enabled():
+                    log.debug(json.dumps(self._tables))
+    
+    def get_columns_info(self):
+        for db, tables in self._tables.items():
+            for table, desc in tables.items():
+                try:
+                    sql = "select * from %s.%s limit 0,0" % (db, table)
+                    res, columns_desc = self._query(sql)
+                    for idx, field in enumerate(columns_desc):
+                        if field[0] in desc["do_columns"]:
+                            desc["columns_info"][field[0]] = field
+                            desc["pos_map"][idx] = field[0]
+                except:
+                    log.warning("columns of %s.%s not found.", db, table,
+                                exc_info=True)
+                    continue
+                if log.enabled():
+                    log.debug(json.dumps(self._tables))
+            
+            
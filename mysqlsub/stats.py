@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from constants import EventType
+import BaseHTTPServer
+import bisect
+import collections
+import threading
+import time
+
+# upper bounds in seconds of the decode time histogram buckets.
+DECODE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01,
+                  0.05, 0.1, 0.5, 1.0)
+
+
+def _type_name(event_type):
+    name = EventType.get_info(event_type)
+    if name is None:
+        return "0x%.2x" % event_type
+    return name
+
+
+class Stats(object):
+    """
+    Live counters of a source: events and bytes by event type and by
+    table, lag behind the master, time since the last event and decode
+    time histograms by event type.
+
+    record() is called for every event received, it only adds to a few
+    dicts. record_decode() observes the whole decode time of an event
+    once it is decoded, from its making to its last row. Rates are
+    computed by snapshot() over the last window seconds from totals
+    sampled once a second.
+    """
+    def __init__(self, window=10, buckets=DECODE_BUCKETS):
+        self._window = window
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._events = collections.defaultdict(int)
+        self._bytes = collections.defaultdict(int)
+        self._table_events = collections.defaultdict(int)
+        self._table_bytes = collections.defaultdict(int)
+        self._decode = {}
+        self._samples = collections.deque()
+        self._next_sample = self._start
+        self._last_event = None
+        self._last_timestamp = None
+
+    def record(self, event_type, table, size, timestamp):
+        """
+        Count an event of size bytes, table is "schema.table" for the
+        events of a table, None for the others. timestamp is the header
+        timestamp.
+        """
+        now = time.time()
+        self._lock.acquire()
+        try:
+            self._events[event_type] += 1
+            self._bytes[event_type] += size
+            if table is not None:
+                self._table_events[table] += 1
+                self._table_bytes[table] += size
+            self._last_event = now
+            # events made up by the master have no timestamp.
+            if timestamp:
+                self._last_timestamp = timestamp
+            if now >= self._next_sample:
+                self._sample(now)
+        finally:
+            self._lock.release()
+
+    def record_decode(self, event_type, seconds):
+        """
+        Observe the decode time of an event, its header, body and rows.
+        """
+        self._lock.acquire()
+        try:
+            self._observe(event_type, seconds)
+        finally:
+            self._lock.release()
+
+    def _observe(self, event_type, seconds):
+        histogram = self._decode.get(event_type)
+        if histogram is None:
+            # one count per bucket, the last one for the overflow, and the
+            # sum of the observations.
+            histogram = self._decode[event_type] = \
+                [[0] * (len(self._buckets) + 1), 0.0]
+        histogram[0][bisect.bisect_left(self._buckets, seconds)] += 1
+        histogram[1] += seconds
+
+    def _sample(self, now):
+        self._samples.append((now, dict(self._events), dict(self._bytes),
+                              dict(self._table_events),
+                              dict(self._table_bytes)))
+        while len(self._samples) > 1 and \
+              now - self._samples[1][0] >= self._window:
+            self._samples.popleft()
+        self._next_sample = now + 1
+
+    def snapshot(self):
+        """
+        Get the current statistics as a dict of plain values.
+        """
+        now = time.time()
+        self._lock.acquire()
+        try:
+            events = dict(self._events)
+            sizes = dict(self._bytes)
+            table_events = dict(self._table_events)
+            table_bytes = dict(self._table_bytes)
+            decode = dict([(t, (list(h[0]), h[1]))
+                           for (t, h) in self._decode.items()])
+            if self._samples:
+                sample = self._samples[0]
+            else:
+                sample = (self._start, {}, {}, {}, {})
+            last_event = self._last_event
+            last_timestamp = self._last_timestamp
+        finally:
+            self._lock.release()
+        elapsed = max(now - sample[0], 0.001)
+
+        def rate(totals, previous, key):
+            return (totals[key] - previous.get(key, 0)) / elapsed
+
+        res = {"uptime":now - self._start, "lag":None,
+               "since_last_event":None, "event_types":{}, "tables":{}}
+        if last_timestamp is not None:
+            res["lag"] = now - last_timestamp
+        if last_event is not None:
+            res["since_last_event"] = now - last_event
+        for t in events:
+            name = _type_name(t)
+            counts, total = decode.get(t, ([], 0.0))
+            res["event_types"][name] = {
+                "events":events[t], "bytes":sizes[t],
+                "events_per_sec":rate(events, sample[1], t),
+                "bytes_per_sec":rate(sizes, sample[2], t),
+                "decode_buckets":zip(self._buckets + (float("inf"),), counts),
+                "decode_seconds":total}
+        for table in table_events:
+            res["tables"][table] = {
+                "events":table_events[table], "bytes":table_bytes[table],
+                "events_per_sec":rate(table_events, sample[3], table),
+                "bytes_per_sec":rate(table_bytes, sample[4], table)}
+        return res
+
+    def prometheus(self):
+        """
+        Format a snapshot in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append("# HELP mysqlsub_%s %s" % (name, help))
+            lines.append("# TYPE mysqlsub_%s %s" % (name, kind))
+            for labels, value in samples:
+                if labels:
+                    labels = "{%s}" % ",".join(['%s="%s"' % l for l in labels])
+                lines.append("mysqlsub_%s%s %s" % (name, labels or "",
+                                                   repr(float(value))))
+
+        types = sorted(snapshot["event_types"].items())
+        tables = sorted(snapshot["tables"].items())
+        metric("events_total", "counter", "Binlog events received.",
+               [((("type", t),), s["events"]) for (t, s) in types])
+        metric("bytes_total", "counter", "Binlog event bytes received.",
+               [((("type", t),), s["bytes"]) for (t, s) in types])
+        metric("table_events_total", "counter", "Binlog events by table.",
+               [((("table", t),), s["events"]) for (t, s) in tables])
+        metric("table_bytes_total", "counter", "Binlog bytes by table.",
+               [((("table", t),), s["bytes"]) for (t, s) in tables])
+        for name, key in (("lag_seconds", "lag"),
+                          ("since_last_event_seconds", "since_last_event")):
+            if snapshot[key] is not None:
+                metric(name, "gauge", key.replace("_", " ") + ".",
+                       [((), snapshot[key])])
+        lines.append("# HELP mysqlsub_decode_seconds Event decode time.")
+        lines.append("# TYPE mysqlsub_decode_seconds histogram")
+        for t, s in types:
+            count = 0
+            for bound, n in s["decode_buckets"]:
+                count += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('mysqlsub_decode_seconds_bucket{type="%s",'
+                             'le="%s"} %d' % (t, le, count))
+            lines.append('mysqlsub_decode_seconds_sum{type="%s"} %r'
+                         % (t, s["decode_seconds"]))
+            lines.append('mysqlsub_decode_seconds_count{type="%s"} %d'
+                         % (t, count))
+        return "\n".join(lines) + "\n"
+
+
+class _StatsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = self.server.stats.prometheus()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+class StatsServer(threading.Thread):
+    """
+    Daemon thread serving the statistics in the Prometheus text format
+    over HTTP, on any path.
+    """
+    def __init__(self, stats, port, host="127.0.0.1"):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._server = BaseHTTPServer.HTTPServer((host, port), _StatsHandler)
+        self._server.stats = stats
+        self.port = self._server.server_address[1]
+
+    def run(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from constants import EventType, ChecksumAlg, ColumnType
+from decoder import DATETIMEF_INT_OFS, TIMEF_INT_OFS, TIMEF_OFS
+from filesource import BINLOG_MAGIC
+from schema import SchemaCache
+from mysql.connector.constants import FieldType
+import datetime
+import random
+import re
+import string
+import struct
+import zlib
+
+"""
+Synthetic binlog, for tests and benchmarks. A format description
+event starts the file, then come transactions of
++============================================+
+| BEGIN            |  query event             |
++============================================+
+| table map        |  one per rows event      |
+|                  +-------------------------+
+| rows event       |  rows_per_event rows     |
++============================================+
+| ...              |  events_per_transaction  |
++============================================+
+| COMMIT           |  xid event               |
++============================================+
+"""
+
+_TABLE_NAME = re.compile(r'table_schema="(.*?)" AND table_name="(.*?)"')
+_COMPRESSED_BYTES = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
+_LETTERS = string.ascii_letters + string.digits
+SERVER_VERSION = "5.6.10-log"
+
+# post-header lengths of the event types 0x01 to 0x23 of a 5.6 server.
+_POST_HEADER_LENGTHS = [56, 13, 0, 8, 0, 18, 0, 4, 4, 4, 4, 18, 0, 0, 92, 0,
+                        4, 26, 8, 0, 0, 0, 8, 8, 8, 2, 0, 0, 0, 10, 10, 10,
+                        42, 42, 0]
+
+# column kinds of the mixes, precision and scale of the decimals, fsp
+# of the fractional temporal types.
+DECIMAL_PRECISION = 10
+DECIMAL_SCALE = 2
+TEMPORAL_FSP = 3
+
+MIXES = {
+    "ints":["int", "bigint", "int", "smallint", "tinyint", "mediumint"],
+    "strings":["int", "varchar", "varchar", "varchar", "blob"],
+    "mixed":["int", "bigint", "varchar", "double", "datetime", "decimal",
+             "date", "timestamp", "float", "blob"],
+    "temporal":["int", "datetime2", "timestamp2", "time2", "datetime", "date",
+                "timestamp"],
+}
+
+
+def pack_new_decimal(value, precision, scale):
+    """
+    Pack a NEWDECIMAL(precision, scale) the way read_new_decimal reads
+    it, value being the decimal times 10 ** scale, an int.
+    """
+    digits = "%0*d" % (precision, abs(value))
+    integral = precision - scale
+    groups = []
+    head = integral % 9
+    if head:
+        groups.append((digits[:head], _COMPRESSED_BYTES[head]))
+    for i in range(head, integral, 9):
+        groups.append((digits[i:i + 9], 4))
+    for i in range(integral, precision - scale % 9, 9):
+        groups.append((digits[i:i + 9], 4))
+    if scale % 9:
+        groups.append((digits[precision - scale % 9:],
+                       _COMPRESSED_BYTES[scale % 9]))
+    data = bytearray(''.join([struct.pack('>I', int(d))[4 - n:]
+                              for (d, n) in groups]))
+    if value < 0:
+        data = bytearray([b ^ 0xff for b in data])
+    data[0] ^= 0x80
+    return str(data)
+
+
+def _pack_fraction(usec, fsp):
+    size = (fsp + 1) / 2
+    if not size:
+        return ''
+    # truncated as C does for the negative fractions of TIME2.
+    value = abs(usec) / 10 ** (6 - 2 * size)
+    if usec < 0:
+        value = -value
+    return struct.pack('>i', value)[4 - size:]
+
+
+def pack_datetime2(value, fsp):
+    """
+    Pack a datetime as a DATETIME2(fsp) the way the decoder reads it.
+    """
+    ym = value.year * 13 + value.month
+    intpart = (((ym << 5) | value.day) << 17) | (value.hour << 12) | \
+              (value.minute << 6) | value.second
+    return struct.pack('>Q', intpart + DATETIMEF_INT_OFS)[3:] + \
+           _pack_fraction(value.microsecond, fsp)
+
+
+def pack_time2(value, fsp):
+    """
+    Pack a timedelta as a TIME2(fsp) the way the decoder reads it.
+    """
+    total = (value.days * 86400 + value.seconds) * 1000000 + \
+            value.microseconds
+    seconds, usec = divmod(abs(total), 1000000)
+    packed = ((((seconds / 3600) << 12) | (((seconds / 60) % 60) << 6) |
+               (seconds % 60)) << 24) | usec
+    if total < 0:
+        packed = -packed
+        usec = -usec
+    if fsp >= 5:
+        return struct.pack('>Q', packed + TIMEF_OFS)[2:]
+    return struct.pack('>I', (packed >> 24) + TIMEF_INT_OFS)[1:] + \
+           _pack_fraction(usec, fsp)
+
+
+def pack_timestamp2(seconds, usec, fsp):
+    """
+    Pack a TIMESTAMP2(fsp) the way the decoder reads it.
+    """
+    return struct.pack('>I', seconds) + _pack_fraction(usec, fsp)
+
+
+def _random_usec(rng, fsp):
+    return rng.randint(0, 10 ** fsp - 1) * 10 ** (6 - fsp)
+
+
+def _pack_random_datetime2(rng):
+    return pack_datetime2(datetime.datetime(
+        rng.randint(1970, 2037), rng.randint(1, 12), rng.randint(1, 28),
+        rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59),
+        _random_usec(rng, TEMPORAL_FSP)), TEMPORAL_FSP)
+
+
+def _pack_random_time2(rng):
+    bound = 839 * 3600 - 1
+    return pack_time2(datetime.timedelta(
+        0, rng.randint(-bound, bound), _random_usec(rng, TEMPORAL_FSP)),
+        TEMPORAL_FSP)
+
+
+def _pack_string(rng, length, length_size):
+    value = ''.join([rng.choice(_LETTERS)
+                     for i in range(rng.randint(0, length))])
+    if length_size == 1:
+        return chr(len(value)) + value
+    return struct.pack('<H', len(value)) + value
+
+
+def _pack_date(rng):
+    return struct.pack('<I', rng.randint(1, 28) | (rng.randint(1, 12) << 5) |
+                       (rng.randint(1970, 2037) << 9))[:3]
+
+
+def _pack_datetime(rng):
+    value = (rng.randint(1970, 2037) * 10000 + rng.randint(1, 12) * 100 +
+             rng.randint(1, 28)) * 1000000 + \
+            rng.randint(0, 23) * 10000 + rng.randint(0, 59) * 100 + \
+            rng.randint(0, 59)
+    return struct.pack('<Q', value)
+
+
+def _column(kind, string_length):
+    """
+    (type, table map metadata, COLUMN_TYPE, packer) of a column kind,
+    packer(rng) giving a random value packed as in a row image.
+    """
+    if kind == "tinyint":
+        return (FieldType.TINY, '', "tinyint(4)",
+                lambda rng: struct.pack('<b', rng.randint(-128, 127)))
+    elif kind == "smallint":
+        return (FieldType.SHORT, '', "smallint(6)",
+                lambda rng: struct.pack('<h', rng.randint(-32768, 32767)))
+    elif kind == "mediumint":
+        return (FieldType.INT24, '', "mediumint(9)",
+                lambda rng: struct.pack('<i', rng.randint(-2 ** 23,
+                                                          2 ** 23 - 1))[:3])
+    elif kind == "int":
+        return (FieldType.LONG, '', "int(11)",
+                lambda rng: struct.pack('<i', rng.randint(-2 ** 31,
+                                                          2 ** 31 - 1)))
+    elif kind == "bigint":
+        return (FieldType.LONGLONG, '', "bigint(20)",
+                lambda rng: struct.pack('<q', rng.randint(-2 ** 63,
+                                                          2 ** 63 - 1)))
+    elif kind == "float":
+        return (FieldType.FLOAT, '\x04', "float",
+                lambda rng: struct.pack('<f', rng.uniform(-1e6, 1e6)))
+    elif kind == "double":
+        return (FieldType.DOUBLE, '\x08', "double",
+                lambda rng: struct.pack('<d', rng.uniform(-1e12, 1e12)))
+    elif kind == "decimal":
+        bound = 10 ** DECIMAL_PRECISION - 1
+        return (FieldType.NEWDECIMAL,
+                chr(DECIMAL_PRECISION) + chr(DECIMAL_SCALE),
+                "decimal(%d,%d)" % (DECIMAL_PRECISION, DECIMAL_SCALE),
+                lambda rng: pack_new_decimal(rng.randint(-bound, bound),
+                                             DECIMAL_PRECISION,
+                                             DECIMAL_SCALE))
+    elif kind == "varchar":
+        length_size = 1 if string_length <= 255 else 2
+        return (FieldType.VARCHAR, struct.pack('<H', string_length),
+                "varchar(%d)" % string_length,
+                lambda rng: _pack_string(rng, string_length, length_size))
+    elif kind == "blob":
+        return (FieldType.BLOB, '\x02', "blob",
+                lambda rng: _pack_string(rng, string_length * 4, 2))
+    elif kind == "date":
+        return (FieldType.DATE, '', "date", _pack_date)
+    elif kind == "datetime":
+        return (FieldType.DATETIME, '', "datetime", _pack_datetime)
+    elif kind == "timestamp":
+        return (FieldType.TIMESTAMP, '', "timestamp",
+                lambda rng: struct.pack('<I', rng.randint(0, 2 ** 31 - 1)))
+    elif kind == "datetime2":
+        return (ColumnType.DATETIME2, chr(TEMPORAL_FSP),
+                "datetime(%d)" % TEMPORAL_FSP, _pack_random_datetime2)
+    elif kind == "time2":
+        return (ColumnType.TIME2, chr(TEMPORAL_FSP),
+                "time(%d)" % TEMPORAL_FSP, _pack_random_time2)
+    elif kind == "timestamp2":
+        return (ColumnType.TIMESTAMP2, chr(TEMPORAL_FSP),
+                "timestamp(%d)" % TEMPORAL_FSP,
+                lambda rng: pack_timestamp2(rng.randint(0, 2 ** 31 - 1),
+                                            _random_usec(rng, TEMPORAL_FSP),
+                                            TEMPORAL_FSP))
+    raise ValueError("unknown column kind: %s" % kind)
+
+
+class SyntheticTable(object):
+    """
+    A table of generated rows, columns named c0, c1, ... of the given
+    kinds, or of one of the MIXES by name.
+    """
+    def __init__(self, table_id, schema, table, kinds="mixed",
+                 string_length=16):
+        if isinstance(kinds, basestring):
+            kinds = MIXES[kinds]
+        self.table_id = table_id
+        self.schema = schema
+        self.table = table
+        self.kinds = list(kinds)
+        self._columns = [_column(k, string_length) for k in self.kinds]
+
+    def columns(self):
+        """
+        Rows of information_schema.columns of the table, as a schema
+        cache looks them up.
+        """
+        return [{"COLUMN_NAME":"c%d" % i, "COLUMN_TYPE":column_type}
+                for (i, (_, _, column_type, _)) in enumerate(self._columns)]
+
+    def table_map_body(self):
+        types = ''.join([chr(t) for (t, _, _, _) in self._columns])
+        metadata = ''.join([m for (_, m, _, _) in self._columns])
+        count = len(self._columns)
+        return struct.pack('<IH', self.table_id & 0xffffffff,
+                           self.table_id >> 32) + '\x00\x00' + \
+               chr(len(self.schema)) + self.schema + '\x00' + \
+               chr(len(self.table)) + self.table + '\x00' + \
+               chr(count) + types + chr(len(metadata)) + metadata + \
+               '\xff' * ((count + 7) / 8)
+
+    def rows_header(self, update=False):
+        count = len(self._columns)
+        bitmap = '\xff' * ((count + 7) / 8)
+        return struct.pack('<IH', self.table_id & 0xffffffff,
+                           self.table_id >> 32) + '\x00\x00' + \
+               chr(count) + bitmap + (bitmap if update else '')
+
+    def row(self, rng, null_density=0.0):
+        """
+        A random row image, each column NULL with probability
+        null_density.
+        """
+        nulls = 0
+        values = []
+        for i, (_, _, _, pack) in enumerate(self._columns):
+            if null_density and rng.random() < null_density:
+                nulls |= 1 << i
+            else:
+                values.append(pack(rng))
+        size = (len(self._columns) + 7) / 8
+        bitmap = ''.join([chr((nulls >> (8 * i)) & 0xff)
+                          for i in range(size)])
+        return bitmap + ''.join(values)
+
+
+def schema_cache(tables):
+    """
+    SchemaCache answering with the columns of synthetic tables instead
+    of querying a master.
+    """
+    columns = dict([((t.schema, t.table), t.columns()) for t in tables])
+
+    def query(sql):
+        key = _TABLE_NAME.search(sql).groups()
+        return [dict(c) for c in columns.get(key, [])], None
+    return SchemaCache(query)
+
+
+class BinlogGenerator(object):
+    """
+    Valid binlog events of random rows of tables, a stream of network
+    packets or a binlog file.
+
+    Every rows event writes rows_per_event rows of a table picked at
+    random, with an event type picked from rows_event_types.
+    Event sizes follow from the number of rows, the column kinds and
+    the string length of the tables. The same seed generates the same
+    events. With checksum the events end with their CRC32.
+    """
+    def __init__(self, tables, rows_per_event=10, events_per_transaction=1,
+                 null_density=0.0,
+                 rows_event_types=(EventType.WRITE_ROWS_EVENT,),
+                 seed=0, timestamp=1362100000, server_id=1, checksum=False):
+        self.tables = list(tables)
+        self.rows_per_event = rows_per_event
+        self.events_per_transaction = events_per_transaction
+        self.null_density = null_density
+        self.rows_event_types = tuple(rows_event_types)
+        self.seed = seed
+        self.timestamp = timestamp
+        self.server_id = server_id
+        self.checksum = checksum
+
+    def _event(self, event_type, body, timestamp, log_pos, checksum=None):
+        if checksum is None:
+            checksum = self.checksum
+        size = 19 + len(body) + (4 if checksum else 0)
+        event = struct.pack('<IBIIIH', timestamp, event_type, self.server_id,
+                            size, log_pos + size, 0) + body
+        if checksum:
+            event += struct.pack('<I', zlib.crc32(event) & 0xffffffff)
+        return event
+
+    def format_description(self, log_pos=len(BINLOG_MAGIC)):
+        """
+        The format description event starting the binlog.
+        """
+        alg = ChecksumAlg.CRC32 if self.checksum else ChecksumAlg.OFF
+        body = struct.pack('<H50sIB', 4, SERVER_VERSION, self.timestamp, 19) + \
+               ''.join([chr(n) for n in _POST_HEADER_LENGTHS]) + chr(alg)
+        # checksummed whatever the algorithm, zeros when off.
+        event = self._event(EventType.FORMAT_DESCRIPTION_EVENT, body,
+                            self.timestamp, log_pos, True)
+        if not self.checksum:
+            event = event[:-4] + '\x00' * 4
+        return event
+
+    def _rows_body(self, rng, table, event_type):
+        update = event_type in (EventType.UPDATE_ROWS_EVENT,
+                                EventType.UPDATE_ROWS_EVENT_V2)
+        body = [table.rows_header(update)]
+        if event_type in (EventType.WRITE_ROWS_EVENT_V2,
+                          EventType.UPDATE_ROWS_EVENT_V2,
+                          EventType.DELETE_ROWS_EVENT_V2):
+            # empty extra data, its length counts itself.
+            body[0] = body[0][:8] + '\x02\x00' + body[0][8:]
+        for i in range(self.rows_per_event):
+            body.append(table.row(rng, self.null_density))
+            if update:
+                body.append(table.row(rng, self.null_density))
+        return ''.join(body)
+
+    def events(self, transactions, log_pos=len(BINLOG_MAGIC)):
+        """
+        Generate the events of a number of transactions, each one a
+        string of its header and body, log_pos being the offset of the
+        first one in the binlog. The format description goes first at
+        the start of the binlog.
+        """
+        rng = random.Random(self.seed)
+        if log_pos == len(BINLOG_MAGIC):
+            event = self.format_description()
+            log_pos += len(event)
+            yield event
+        begin = struct.pack('<IIBHH', 0, 0, 2, 0, 0) + 'db\x00BEGIN'
+        for xid in xrange(1, transactions + 1):
+            timestamp = self.timestamp + xid
+            event = self._event(EventType.QUERY_EVENT, begin, timestamp,
+                                log_pos)
+            log_pos += len(event)
+            yield event
+            for i in range(self.events_per_transaction):
+                table = rng.choice(self.tables)
+                event_type = rng.choice(self.rows_event_types)
+                for event in (
+                    self._event(EventType.TABLE_MAP_EVENT,
+                                table.table_map_body(), timestamp, log_pos),
+                    self._event(event_type,
+                                self._rows_body(rng, table, event_type),
+                                timestamp, log_pos)):
+                    log_pos += len(event)
+                    yield event
+            event = self._event(EventType.XID_EVENT, struct.pack('<Q', xid),
+                                timestamp, log_pos)
+            log_pos += len(event)
+            yield event
+
+    def packets(self, transactions):
+        """
+        Generate the events as the packets of a binlog dump.
+        """
+        for event in self.events(transactions):
+            payload = '\x00' + event
+            yield struct.pack('<I', len(payload))[0:3] + '\x01' + payload
+
+    def write(self, path, transactions):
+        """
+        Write the events as a binlog file, returns its size.
+        """
+        f = open(path, "wb")
+        try:
+            f.write(BINLOG_MAGIC)
+            for event in self.events(transactions):
+                f.write(event)
+            return f.tell()
+        finally:
+            f.close()
@@ -6,36 +6,38 @@ import sys
 import logging
 import traceback
 
-# config log
-if not os.path.exists("./log"):
-    os.makedirs("./log")
-logger = logging.getLogger()
-hdlr = logging.StreamHandler(sys.stderr)
-formatter = logging.Formatter('%(levelname)s: %(asctime)s:  %(message)s')
-hdlr.setFormatter(formatter)
-logger.addHandler(hdlr)
-logger.setLevel(logging.DEBUG)
+# the library logs to the "mysqlsub" logger and leaves the handlers and
+# the level to the application, see setup_logging.
+logger = logging.getLogger("mysqlsub")
+logger.addHandler(logging.NullHandler())
 
-class log: 
-    @staticmethod
-    def debug(msg):
-        global logger
-        logger.debug(msg)
-      
-    @staticmethod
-    def info(msg):
-        global logger
-        logger.info(msg)
+class log:
+    # the logger methods themselves: messages are formatted with their
+    # arguments only when their level is enabled.
+    debug = staticmethod(logger.debug)
+    info = staticmethod(logger.info)
+    warning = staticmethod(logger.warning)
+    fatal = staticmethod(logger.critical)
 
     @staticmethod
-    def warning(msg):
-        global logger
-        logger.warning(msg)
-    
-    @staticmethod
-    def fatal(msg):
-        global logger
-        logger.critical(msg)
+    def enabled(level=logging.DEBUG):
+        """
+        Whether messages of level are logged, to skip computing costly
+        arguments otherwise.
+        """
+        return logger.isEnabledFor(level)
+
+def setup_logging(level=logging.DEBUG, stream=None):
+    """
+    Log the messages of mysqlsub from level to stream, stderr by default.
+    Returns the handler added.
+    """
+    hdlr = logging.StreamHandler(stream or sys.stderr)
+    formatter = logging.Formatter('%(levelname)s: %(asctime)s:  %(message)s')
+    hdlr.setFormatter(formatter)
+    logger.addHandler(hdlr)
+    logger.setLevel(level)
+    return hdlr
 
 class chdir_temp:
     def __init__(self, dst):  
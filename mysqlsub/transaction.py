@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#coding:utf-8
+
+from tools import log
+from event import RowsEvent
+import cPickle
+import sys
+import tempfile
+
+_getsizeof = sys.getsizeof
+# the (event_type, schema, table, row) tuple buffered for every row.
+_ENTRY_SIZE = _getsizeof((0, 0, 0, 0))
+
+
+def _row_size(row):
+    """
+    Estimate of the bytes held by a decoded row, its dict and values, or
+    both images of an update. Strings shared between rows are counted
+    again, the estimate errs on the large side.
+    """
+    if isinstance(row, tuple):
+        return _getsizeof(row) + _row_size(row[0]) + _row_size(row[1])
+    return _getsizeof(row) + sum(map(_getsizeof, row.itervalues()))
+
+
+class Transaction(object):
+    """
+    The rows of one transaction, from its BEGIN to its XID_EVENT (or
+    COMMIT query for non transactional engines).
+
+    Rows are kept in memory as (event_type, schema, table, row) tuples,
+    row being a (before, after) pair for updates. Once the estimated
+    size of the decoded rows buffered exceeds memory_limit bytes, they
+    are pickled to a temporary file and so are the next ones, by
+    batches, so a transaction of millions of rows holds at most one
+    batch in memory, whatever the size of its events. rows() reads them
+    back in order.
+
+    (log_file, log_pos) is the position following the commit event,
+    where a dump resumes from once the transaction is done with.
+    """
+    def __init__(self, memory_limit, begin_header=None):
+        self._memory_limit = memory_limit
+        self._rows = []
+        self._size = 0
+        self._file = None
+        self.row_count = 0
+        self.xid = None
+        self.log_file = None
+        self.log_pos = None
+        self.timestamp = None
+        if begin_header is not None:
+            self.timestamp = begin_header.timestamp
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def add(self, event):
+        """
+        Add the rows of a rows event, other events are ignored.
+        """
+        if not isinstance(event, RowsEvent):
+            return
+        event_type = event.header.event_type
+        schema = event.schema
+        table = event.table
+        limit = self._memory_limit
+        for row in event.rows():
+            self._rows.append((event_type, schema, table, row))
+            self.row_count += 1
+            # checked row by row, a large event must not overshoot.
+            self._size += _ENTRY_SIZE + _row_size(row)
+            if self._size > limit:
+                self._spill()
+
+    def _spill(self):
+        if self._file is None:
+            log.debug("transaction rows over %d bytes, spilled to disk.",
+                      self._memory_limit)
+            self._file = tempfile.TemporaryFile(prefix="mysqlsub")
+        cPickle.dump(self._rows, self._file, cPickle.HIGHEST_PROTOCOL)
+        self._rows = []
+        self._size = 0
+
+    def commit(self, header, xid=None, log_file=None):
+        """
+        Record the commit event of the transaction.
+        """
+        self.xid = xid
+        self.log_file = log_file
+        self.log_pos = header.log_pos
+        if self.timestamp is None:
+            self.timestamp = header.timestamp
+        if self._file is not None:
+            self._file.flush()
+
+    def rows(self):
+        """
+        Generate the rows of the transaction in binlog order, from the
+        spill file first when there is one.
+        """
+        if self._file is not None:
+            self._file.seek(0)
+            while True:
+                try:
+                    batch = cPickle.load(self._file)
+                except EOFError:
+                    break
+                for row in batch:
+                    yield row
+        for row in self._rows:
+            yield row
+
+    def __iter__(self):
+        return self.rows()
+
+    def __len__(self):
+        return self.row_count
+
+    def close(self):
+        """
+        Release the rows and remove the spill file.
+        """
+        self._rows = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
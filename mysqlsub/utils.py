@@ -1,190 +1,313 @@
-'''
-Created on 2013-3-1
-
-@author: yelu01
-'''
-
-from mysql.connector.utils import *
-import datetime
-import decimal
-
-def read_signed_int(buf, size, big_endian = True):
-    """Read a big endian integer values based on byte number
-    
-    Returns a tuple (truncated buffer, int)
-    '''''
-    """
-    if big_endian:
-        endian = '>'
-    else:
-        endian = '<'
-    if size == 1:
-        res = struct.unpack(endian+'b', buf)[0]
-        return (buf[1:], res)
-    elif size == 2:
-        res = struct.unpack(endian+'h', buf)[0]
-        return (buf[2:], res)
-    elif size == 3:
-        a, b, c = struct.unpack("BBB", buf)
-        #TODO:may be wrong.
-        if a & 128:
-            res =  a + (b << 8) + (c << 16)
-        else:
-            res =  (a + (b << 8) + (c << 16)) * -1
-        return (buf[3:], res)
-    elif size == 4:
-        res = struct.unpack(endian+'i', buf)[0]
-        return (buf[4:], res)
-    elif size == 8:
-        res = struct.unpack(endian+'q', buf)[0]
-        return (buf[8:], res)
-    else:
-        raise
-
-
-def read_unsigned_int(buf, size, big_endian = False):
-    """Read a little endian integer values based on byte number
-    
-    Returns a tuple (truncated buffer, int)
-    """
-    if big_endian:
-        endian = '>'
-    else:
-        endian = '<'
-    if size == 1:
-        res = struct.unpack(endian+'B', buf)[0]
-        return (buf[1:], res)
-    elif size == 2:
-        res = struct.unpack(endian+'H', buf)[0]
-        return (buf[2:], res)
-    elif size == 3:
-        a, b, c = struct.unpack("BBB", buf)
-        res =  a + (b << 8) + (c << 16)
-        return (buf[3:], res)
-    elif size == 4:
-        res = struct.unpack(endian+'I', buf)[0]
-        return (buf[4:], res)
-    elif size == 8:
-        res = struct.unpack(endian+'Q', buf)[0]
-        return (buf[8:], res)
-    else:
-        raise
-
-def read_float(buf):
-    res = struct.unpack("<f", buf)[0]
-    return (buf[4:], res)
-
-def read_double(buf):
-    res = struct.unpack("<d", buf)[0]
-    return (buf[8:], res)
-
-def read_lc_pascal_string(buf, size):
-    '''Read a string with length coded using pascal style. The string start by the size of the string'''
-    head, length = read_unsigned_int(buf, size)
-    head, res = read_bytes(head, length)
-    return (head, res)
-
-def read_lc_pascal_string_decoded(buf, size, charset):
-    '''Read a string with length coded using pascal style. The string start by the size of the string'''
-    head, res = read_lc_pascal_string(buf, size)
-    res = res.decode(charset)
-    return (head, res)
-
-def read_bits(head, bytes, bits):
-    """Read MySQL BIT type"""
-    resp = ""
-    for byte in range(0, bytes):
-        current_byte = ""
-        head, data = read_unsigned_int(head, 1)
-        if byte == 0:
-            if bytes == 1:
-                end = bits
-            else:
-                end = bits % 8
-                if end == 0:
-                    end = 8
-        else:
-            end = 8
-        for bit in range(0, end):
-            if data & (1 << bit):
-                current_byte += "1"
-            else:
-                current_byte += "0"
-        resp += current_byte[::-1]
-    return (head, resp)
-
-def read_datetime(head):
-    head, value = read_unsigned_int(head, 8)
-    date = value / 1000000
-    time = value % 1000000
-    date = datetime.datetime(
-        year = int(date / 10000),
-        month = int((date % 10000) / 100),
-        day = int(date % 100),
-        hour = int(time / 10000),
-        minute = int((time % 10000) / 100),
-        second = int(time % 100))
-    return (head, date)
-
-def read_time(head):
-    head, time = read_unsigned_int(head, 3)
-    date = datetime.time(
-        hour = int(time / 10000),
-        minute = int((time % 10000) / 100),
-        second = int(time % 100))
-    return (head, date)
-
-def read_date(head):
-    head, time = read_unsigned_int(head, 3)
-    date = datetime.date(
-        year = (time & ((1 << 15) - 1) << 9) >> 9,
-        month = (time & ((1 << 4) - 1) << 5) >> 5,
-        day = (time & ((1 << 5) - 1))
-    )
-    return (head, date)
-
-def read_new_decimal(head, precision, decimals):
-    '''Read MySQL's new decimal format introduced in MySQL 5'''
-    
-    # https://github.com/jeremycole/mysql_binlog/blob/master/lib/mysql_binlog/binlog_field_parser.rb
-
-    digits_per_integer = 9
-    compressed_bytes = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
-    integral = (precision - decimals)
-    uncomp_integral = int(integral / digits_per_integer)
-    uncomp_fractional = int(decimals / digits_per_integer)
-    comp_integral = integral - (uncomp_integral * digits_per_integer)
-    comp_fractional = decimals - (uncomp_fractional * digits_per_integer)
-
-    # Support negative
-    # The sign is encoded in the high bit of the the byte
-    # But this bit can also be used in the value
-    value = struct.pack('B', head)[0]
-    res, mask = ["", 0] if (value & 0x80 != 0) else ["-", -1]
-    head[0] = value ^ 0x80
-
-    size = compressed_bytes[comp_integral]
-
-    if size > 0:
-        head, value = read_unsigned_int(head, size, True) ^ mask
-        res += str(value)
-
-    for i in range(0, uncomp_integral):
-        head, value = read_signed_int(head, 4, True)
-        value = value ^ mask
-        res += str(value)
-
-    res += "."
-
-    for i in range(0, uncomp_fractional):
-        head, value = read_signed_int(head, 4, True)
-        value = value ^ mask
-        res += str(value)
-
-    size = compressed_bytes[comp_fractional]
-    if size > 0:
-        head, value = read_signed_int(head, size, True)
-        value = value ^ mask
-        res += str(value)
-
-    return decimal.Decimal(res)
\ No newline at end of file
+'''
+Created on 2013-3-1
+
+@author: yelu01
+'''
+
+from mysql.connector.utils import *
+import binascii
+import datetime
+import decimal
+import operator
+
+_INT8 = struct.Struct('<b')
+_UINT8 = struct.Struct('<B')
+_INT16 = struct.Struct('<h')
+_UINT16 = struct.Struct('<H')
+_UINT24 = struct.Struct('<HB')
+_INT32 = struct.Struct('<i')
+_UINT32 = struct.Struct('<I')
+_UINT48 = struct.Struct('<IH')
+_INT64 = struct.Struct('<q')
+_UINT64 = struct.Struct('<Q')
+_FLOAT = struct.Struct('<f')
+_DOUBLE = struct.Struct('<d')
+
+
+class BufferReader(object):
+    """Read binlog fields from a buffer by moving an offset over it.
+
+    The buffer may be a str, buffer, bytearray or mmap. Fixed width fields
+    are unpacked in place with precompiled structs and nothing is copied
+    but the bytes of the fields actually read, so decoding an event is
+    linear in its size.
+    """
+    __slots__ = ("data", "offset", "end")
+
+    def __init__(self, data, offset=0, end=None):
+        self.data = data
+        self.offset = offset
+        self.end = len(data) if end is None else end
+
+    def remaining(self):
+        return self.end - self.offset
+
+    def skip(self, size):
+        self.offset += size
+
+    def read(self, size):
+        offset = self.offset
+        self.offset = offset + size
+        return self.data[offset:offset + size]
+
+    def view(self, size):
+        """Return the next size bytes as a buffer, without copying them."""
+        offset = self.offset
+        self.offset = offset + size
+        return buffer(self.data, offset, size)
+
+    def read_int8(self):
+        res = _INT8.unpack_from(self.data, self.offset)[0]
+        self.offset += 1
+        return res
+
+    def read_uint8(self):
+        res = _UINT8.unpack_from(self.data, self.offset)[0]
+        self.offset += 1
+        return res
+
+    def read_int16(self):
+        res = _INT16.unpack_from(self.data, self.offset)[0]
+        self.offset += 2
+        return res
+
+    def read_uint16(self):
+        res = _UINT16.unpack_from(self.data, self.offset)[0]
+        self.offset += 2
+        return res
+
+    def read_int24(self):
+        res = self.read_uint24()
+        if res & 0x800000:
+            res -= 0x1000000
+        return res
+
+    def read_uint24(self):
+        low, high = _UINT24.unpack_from(self.data, self.offset)
+        self.offset += 3
+        return low | (high << 16)
+
+    def read_int32(self):
+        res = _INT32.unpack_from(self.data, self.offset)[0]
+        self.offset += 4
+        return res
+
+    def read_uint32(self):
+        res = _UINT32.unpack_from(self.data, self.offset)[0]
+        self.offset += 4
+        return res
+
+    def read_uint48(self):
+        low, high = _UINT48.unpack_from(self.data, self.offset)
+        self.offset += 6
+        return low | (high << 32)
+
+    def read_int64(self):
+        res = _INT64.unpack_from(self.data, self.offset)[0]
+        self.offset += 8
+        return res
+
+    def read_uint64(self):
+        res = _UINT64.unpack_from(self.data, self.offset)[0]
+        self.offset += 8
+        return res
+
+    def read_float(self):
+        res = _FLOAT.unpack_from(self.data, self.offset)[0]
+        self.offset += 4
+        return res
+
+    def read_double(self):
+        res = _DOUBLE.unpack_from(self.data, self.offset)[0]
+        self.offset += 8
+        return res
+
+    def read_uint(self, size):
+        """Read a little endian unsigned integer of size bytes."""
+        if size == 1:
+            return self.read_uint8()
+        elif size == 2:
+            return self.read_uint16()
+        elif size == 3:
+            return self.read_uint24()
+        elif size == 4:
+            return self.read_uint32()
+        elif size == 8:
+            return self.read_uint64()
+        return self.read_bitmap(size)
+
+    def read_lc_int(self):
+        """Read a length coded integer, None stands for NULL."""
+        first = self.read_uint8()
+        if first < 251:
+            return first
+        elif first == 251:
+            return None
+        elif first == 252:
+            return self.read_uint16()
+        elif first == 253:
+            return self.read_uint24()
+        return self.read_uint64()
+
+    def read_bitmap(self, size):
+        """Read size bytes as a little endian bitmap, bit i is column i."""
+        if not size:
+            return 0
+        return int(binascii.hexlify(self.read(size)[::-1]), 16)
+
+    def read_pascal_string(self, size):
+        """Read a string prefixed by its length on size bytes."""
+        return self.read(self.read_uint(size))
+
+
+def to_bits(data, bits):
+    """Convert the bytes of a MySQL BIT value to a string of 0/1"""
+    resp = ""
+    bytes = len(data)
+    for byte in range(0, bytes):
+        current_byte = ""
+        value = ord(data[byte])
+        if byte == 0:
+            if bytes == 1:
+                end = bits
+            else:
+                end = bits % 8
+                if end == 0:
+                    end = 8
+        else:
+            end = 8
+        for bit in range(0, end):
+            if value & (1 << bit):
+                current_byte += "1"
+            else:
+                current_byte += "0"
+        resp += current_byte[::-1]
+    return resp
+
+def to_datetime(value):
+    date = value / 1000000
+    time = value % 1000000
+    date = datetime.datetime(
+        year = int(date / 10000),
+        month = int((date % 10000) / 100),
+        day = int(date % 100),
+        hour = int(time / 10000),
+        minute = int((time % 10000) / 100),
+        second = int(time % 100))
+    return date
+
+def to_time(time):
+    date = datetime.time(
+        hour = int(time / 10000),
+        minute = int((time % 10000) / 100),
+        second = int(time % 100))
+    return date
+
+def to_date(time):
+    date = datetime.date(
+        year = (time & ((1 << 15) - 1) << 9) >> 9,
+        month = (time & ((1 << 4) - 1) << 5) >> 5,
+        day = (time & ((1 << 5) - 1))
+    )
+    return date
+
+def read_bits(reader, bytes, bits):
+    """Read MySQL BIT type"""
+    return to_bits(str(reader.read(bytes)), bits)
+
+def read_datetime(reader):
+    return to_datetime(reader.read_uint64())
+
+def read_time(reader):
+    return to_time(reader.read_uint24())
+
+def read_date(reader):
+    return to_date(reader.read_uint24())
+
+# NEWDECIMAL stores its digits in groups of 9 in 4 bytes, big-endian, the
+# first integral and the last fractional groups in as many bytes as their
+# digits need. The values of a decimal converter by mode.
+_COMPRESSED_BYTES = [0, 1, 1, 2, 2, 3, 3, 4, 4, 4]
+DECIMAL_MODES = ("decimal", "int", "float")
+_new_decimal_layouts = {}
+
+def new_decimal_size(precision, decimals):
+    """Size in bytes of a NEWDECIMAL(precision, decimals) value"""
+    integral = precision - decimals
+    return (integral / 9) * 4 + _COMPRESSED_BYTES[integral % 9] + \
+           (decimals / 9) * 4 + _COMPRESSED_BYTES[decimals % 9]
+
+def _new_decimal_layout(precision, decimals):
+    """
+    (unpack, weights, top, positive, negative) of NEWDECIMAL(precision,
+    decimals), computed once and kept by (precision, decimals).
+
+    unpack splits the value into unsigned big-endian fields, a 3 bytes
+    group into 1 and 2 bytes. The sum of the fields times their weights
+    is the scaled value plus positive when the first field is at least
+    top, the sign bit set. Negative values are stored complemented, the
+    sum is then the scaled value plus negative.
+    """
+    layout = _new_decimal_layouts.get((precision, decimals))
+    if layout is not None:
+        return layout
+    integral = precision - decimals
+    groups = [(integral % 9, _COMPRESSED_BYTES[integral % 9])] + \
+             [(9, 4)] * (integral / 9) + [(9, 4)] * (decimals / 9) + \
+             [(decimals % 9, _COMPRESSED_BYTES[decimals % 9])]
+    fields = []
+    digits = precision
+    for (n, size) in groups:
+        if not size:
+            continue
+        digits -= n
+        weight = 10 ** digits
+        if size == 3:
+            fields += [('B', 1, weight << 16), ('H', 2, weight)]
+        else:
+            fields.append(({1:'B', 2:'H', 4:'I'}[size], size, weight))
+    weights = tuple([w for (_, _, w) in fields])
+    top = 0x80 << (8 * (fields[0][1] - 1))
+    positive = top * weights[0]
+    # all the bits of the fields set, the sign bit clear.
+    ones = sum([((1 << (8 * size)) - 1) * w for (_, size, w) in fields])
+    layout = (struct.Struct('>' + ''.join([f for (f, _, _) in fields])).unpack,
+              weights, top, positive, ones - positive)
+    _new_decimal_layouts[(precision, decimals)] = layout
+    return layout
+
+def new_decimal_converter(precision, decimals, mode="decimal"):
+    """
+    Get a function converting the raw bytes of a NEWDECIMAL(precision,
+    decimals) to a Decimal, to an int scaled by 10 ** decimals or to a
+    float, by mode, one of DECIMAL_MODES. The digit groups are folded
+    with integer arithmetic over a layout computed once.
+    """
+    if mode not in DECIMAL_MODES:
+        raise ValueError("unknown decimal mode: %s" % mode)
+    unpack, weights, top, positive, negative = \
+        _new_decimal_layout(precision, decimals)
+    mul = operator.mul
+
+    def scaled(raw):
+        fields = unpack(raw)
+        if fields[0] >= top:
+            return sum(map(mul, fields, weights)) - positive
+        return sum(map(mul, fields, weights)) - negative
+
+    if mode == "int":
+        return scaled
+    if mode == "float":
+        divisor = float(10 ** decimals)
+        return lambda raw: scaled(raw) / divisor
+    if not decimals:
+        return lambda raw: decimal.Decimal(scaled(raw))
+    # the exponent form keeps the decimals of the column, trailing zeros
+    # included.
+    form = "%%de-%d" % decimals
+    return lambda raw: decimal.Decimal(form % scaled(raw))
+
+def read_new_decimal(reader, precision, decimals):
+    """Read MySQL's new decimal format introduced in MySQL 5"""
+    return new_decimal_converter(precision, decimals)(
+        reader.read(new_decimal_size(precision, decimals)))
@@ -0,0 +1,250 @@
+'''
+Parser throughput benchmarks over synthetic binlogs.
+
+    python test/benchmark.py --mix mixed --rows 10 --save before.json
+    python test/benchmark.py --mix mixed --rows 10 --compare before.json
+    python test/benchmark.py --end-to-end --pace 5000
+    python test/benchmark.py --end-to-end --checksum --verify 10
+
+Every benchmark runs --repeat times over the same events and keeps the
+best run, reported as events, rows for RowsEvent, or calls per second
+and MB per second. --end-to-end also streams the events through a Source
+from the fake master, once, and reports the latency from the master
+sending a commit to the source returning it.
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub import utils
+from mysqlsub.constants import EventType
+from mysqlsub.event import *
+from mysqlsub.source import Source
+from mysqlsub.synthetic import *
+from fake_master import FakeMaster
+
+
+def bench_header(packets, checksum_size):
+    for packet in packets:
+        EventHeader(packet, EVENT_HEADER_OFFSET, checksum_size)
+    return len(packets), sum([len(p) for p in packets])
+
+
+def bench_table_map(packets, cache, subscribed, checksum_size):
+    # a table map of its own for every event, so none is skipped as a
+    # repeat of the previous one.
+    for packet in packets:
+        header = EventHeader(packet, EVENT_HEADER_OFFSET, checksum_size)
+        TableMapEvent(packet, {}, subscribed, cache, header).decode()
+    return len(packets), sum([len(p) for p in packets])
+
+
+def bench_rows(packets, table_map, subscribed, checksum_size):
+    count = 0
+    for packet in packets:
+        header = EventHeader(packet, EVENT_HEADER_OFFSET, checksum_size)
+        event = EventMap.get_event_type(header.event_type)(
+            packet, table_map, subscribed, header)
+        for row in event.rows():
+            count += 1
+    return count, sum([len(p) for p in packets])
+
+
+def bench_columns(packets, table_map, subscribed, checksum_size):
+    count = 0
+    for packet in packets:
+        header = EventHeader(packet, EVENT_HEADER_OFFSET, checksum_size)
+        event = EventMap.get_event_type(header.event_type)(
+            packet, table_map, subscribed, header)
+        columns = event.to_columns(use_numpy=False)
+        count += len(columns.values()[0][1])
+    return count, sum([len(p) for p in packets])
+
+
+def bench_reads(data, method, size):
+    reader = utils.BufferReader(data)
+    read = getattr(reader, method)
+    calls = len(data) / size
+    for i in xrange(calls):
+        read()
+    return calls, calls * size
+
+
+def end_to_end(tables, events, pace, checksum=False, verify=0):
+    """
+    Stream the events from a fake master through a Source, decoding all
+    the rows. Returns the throughput and the commit to callback latency,
+    from the master sending an xid event to the source returning it.
+    """
+    master = FakeMaster(events_per_sec=pace,
+                        binlog_checksum=checksum and "CRC32" or "NONE")
+    master.add_events("mysql-bin.000001", events)
+    for t in tables:
+        master.add_table(t.schema, t.table, t.columns())
+    master.start()
+    source = Source(verify_checksums=verify, **master.conf())
+    for t in tables:
+        source.add_table(t.schema, t.table,
+                         [c["COLUMN_NAME"] for c in t.columns()])
+    latencies = []
+    count = 0
+    try:
+        source.connect()
+        source.binlog_dump("mysql-bin.000001", 4)
+        start = time.time()
+        for event in source:
+            count += 1
+            if isinstance(event, RowsEvent):
+                for row in event.rows():
+                    pass
+            elif isinstance(event, XidEvent):
+                latencies.append(time.time() -
+                                 master.commits[event.header.log_pos])
+        elapsed = max(time.time() - start, 1e-9)
+    finally:
+        source.disconnect()
+        master.stop()
+    size = len(master.binlogs[0][1])
+    latencies.sort()
+    res = {"Source end-to-end":{"count":count, "seconds":elapsed,
+                                "per_sec":count / elapsed,
+                                "mb_per_sec":size / elapsed / (1024 * 1024)}}
+    latency = {"count":len(latencies)}
+    for name, q in (("p50", 0.5), ("p99", 0.99), ("max", 1.0)):
+        i = min(int(len(latencies) * q), len(latencies) - 1)
+        latency[name + "_ms"] = latencies[i] * 1000
+    res["commit latency"] = latency
+    return res
+
+
+def run(name, repeat, bench, *args):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        count, size = bench(*args)
+        elapsed = max(time.time() - start, 1e-9)
+        if best is None or elapsed < best:
+            best = elapsed
+    return name, {"count":count, "seconds":best,
+                  "per_sec":count / best,
+                  "mb_per_sec":size / best / (1024 * 1024)}
+
+
+def benchmarks(options):
+    tables = [SyntheticTable(i + 1, "db", "t%d" % i, options.mix,
+                             options.string_length)
+              for i in range(options.tables)]
+    generator = BinlogGenerator(tables, rows_per_event=options.rows,
+                                null_density=options.null_density,
+                                checksum=options.checksum,
+                                seed=options.seed)
+    packets = list(generator.packets(options.transactions))
+    table_maps = []
+    rows = []
+    for packet in packets:
+        event_type = ord(packet[EVENT_HEADER_OFFSET + 4])
+        if event_type == EventType.TABLE_MAP_EVENT:
+            table_maps.append(packet)
+        elif event_type in ROWS_EVENT_TYPES:
+            rows.append(packet)
+
+    cache = schema_cache(tables)
+    subscribed = dict([(t.schema, {}) for t in tables])
+    for t in tables:
+        subscribed[t.schema][t.table] = {"do_columns":{}}
+    table_map = {}
+    checksum_size = options.checksum and CHECKSUM_SIZE or 0
+    for packet in table_maps:
+        header = EventHeader(packet, EVENT_HEADER_OFFSET, checksum_size)
+        TableMapEvent(packet, table_map, subscribed, cache, header).decode()
+
+    repeat = options.repeat
+    res = [run("EventHeader", repeat, bench_header, packets, checksum_size),
+           run("TableMapEvent", repeat, bench_table_map, table_maps, cache,
+               subscribed, checksum_size),
+           run("RowsEvent", repeat, bench_rows, rows, table_map, subscribed,
+               checksum_size),
+           run("RowsEvent.to_columns", repeat, bench_columns, rows,
+               table_map, subscribed, checksum_size)]
+    data = ''.join(rows)
+    for method, size in (("read_uint8", 1), ("read_uint16", 2),
+                         ("read_int24", 3), ("read_uint32", 4),
+                         ("read_uint48", 6), ("read_int64", 8),
+                         ("read_double", 8)):
+        res.append(run("BufferReader." + method, repeat, bench_reads, data,
+                       method, size))
+    # one byte length coded ints, rows data would read past the end.
+    res.append(run("BufferReader.read_lc_int", repeat, bench_reads,
+                   '\x2a' * len(data), "read_lc_int", 1))
+    res = dict(res)
+    if options.end_to_end:
+        res.update(end_to_end(tables, generator.events(options.transactions),
+                              options.pace, options.checksum,
+                              options.verify))
+    return res
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default="mixed", choices=sorted(MIXES))
+    parser.add_argument("--tables", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=10,
+                        help="rows per rows event")
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--null-density", type=float, default=0.1)
+    parser.add_argument("--string-length", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--end-to-end", action="store_true",
+                        help="also stream through Source from a fake master")
+    parser.add_argument("--pace", type=float,
+                        help="events per second sent by the fake master")
+    parser.add_argument("--checksum", action="store_true",
+                        help="crc32 checksums on the events")
+    parser.add_argument("--verify", type=int, default=0,
+                        help="end-to-end, verify the checksum of 1 event in n")
+    parser.add_argument("--save", help="write the results to a json file")
+    parser.add_argument("--compare", help="json file of earlier results")
+    options = parser.parse_args(argv)
+
+    results = benchmarks(options)
+    previous = {}
+    if options.compare:
+        f = open(options.compare)
+        try:
+            previous = json.load(f)["results"]
+        finally:
+            f.close()
+    print "%-28s %14s %10s %8s" % ("benchmark", "per sec", "MB/s", "change")
+    for name in sorted(results):
+        r = results[name]
+        if "per_sec" not in r:
+            continue
+        change = ""
+        if name in previous:
+            change = "%+.1f%%" % ((r["per_sec"] / previous[name]["per_sec"]
+                                   - 1) * 100)
+        print "%-28s %14.0f %10.2f %8s" % (name, r["per_sec"],
+                                           r["mb_per_sec"], change)
+    if "commit latency" in results:
+        r = results["commit latency"]
+        print "commit latency: p50 %.2f ms, p99 %.2f ms, max %.2f ms" % (
+            r["p50_ms"], r["p99_ms"], r["max_ms"])
+    if options.save:
+        f = open(options.save, "w")
+        try:
+            json.dump({"options":vars(options), "time":time.time(),
+                       "python":platform.python_version(),
+                       "machine":platform.machine(),
+                       "results":results}, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
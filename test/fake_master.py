@@ -0,0 +1,430 @@
+'''
+In-process fake MySQL master, enough of the protocol for Source to run
+unchanged against binlog files or synthetic events:
+
+    master = FakeMaster()
+    master.add_events("mysql-bin.000001", generator.events(1000))
+    master.add_table("db", "t", table.columns())
+    master.start()
+    source = Source(**master.conf())
+    ...
+    master.stop()
+
+It answers the handshake and the authentication, SET statements, show
+master status, the information_schema.columns, show full columns and
+"select * ... limit 0,0" lookups of the added tables, and streams the
+binlogs from COM_BINLOG_DUMP. Other statements get an error.
+'''
+
+import os
+import re
+import socket
+import struct
+import threading
+import time
+import zlib
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.constants import EventType
+from mysqlsub.filesource import BINLOG_MAGIC
+from mysql.connector.constants import FieldType, ServerCmd
+from mysql.connector.protocol import MySQLProtocol
+
+SCRAMBLE = "abcdefghijklmnopqrst"
+ARTIFICIAL_FLAG = 0x20
+
+_COLUMNS_QUERY = re.compile(r'information_schema\.columns\s+WHERE\s+'
+                            r'table_schema="(.*?)"\s+AND\s+table_name="(.*?)"',
+                            re.I)
+_SHOW_COLUMNS = re.compile(r'show\s+full\s+columns\s+from\s+(\w+)\.(\w+)',
+                           re.I)
+_SELECT_LIMIT_0 = re.compile(r'select\s+\*\s+from\s+(\w+)\.(\w+)\s+'
+                             r'limit\s+0\s*,\s*0', re.I)
+_CHECKSUM_VARIABLE = re.compile(r"SHOW\s+GLOBAL\s+VARIABLES\s+LIKE\s+"
+                                r"'binlog_checksum'", re.I)
+_CHECKSUM_ANNOUNCE = re.compile(r'SET\s+@master_binlog_checksum\s*=', re.I)
+_HEARTBEAT_PERIOD = re.compile(r'SET\s+@master_heartbeat_period\s*=\s*(\d+)',
+                               re.I)
+
+
+def lc_int(i):
+    if i < 251:
+        return chr(i)
+    elif i < 2 ** 16:
+        return '\xfc' + struct.pack('<H', i)
+    elif i < 2 ** 24:
+        return '\xfd' + struct.pack('<I', i)[:3]
+    return '\xfe' + struct.pack('<Q', i)
+
+
+def lc_str(s):
+    if s is None:
+        return '\xfb'
+    s = str(s)
+    return lc_int(len(s)) + s
+
+
+def ok_payload():
+    return '\x00\x00\x00\x02\x00\x00\x00'
+
+
+def eof_payload():
+    return '\xfe\x00\x00\x02\x00'
+
+
+def err_payload(errno, message, sqlstate="HY000"):
+    return '\xff' + struct.pack('<H', errno) + '#' + sqlstate + message
+
+
+def split_events(data, offset):
+    """
+    Generate the (offset, event) of a binlog file content from offset.
+    """
+    while offset + 19 <= len(data):
+        size = struct.unpack_from('<I', data, offset + 9)[0]
+        yield offset, data[offset:offset + size]
+        offset += size
+
+
+class _Session(threading.Thread):
+    """
+    One client connection of the fake master.
+    """
+    def __init__(self, master, sock):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._master = master
+        self._sock = sock
+        self._seq = 0
+        self._buf = []
+        self._buffered = 0
+        self._heartbeat_period = None
+        self._checksum = False
+
+    def send(self, payload, flush=True):
+        self._buf.append(struct.pack('<I', len(payload))[:3] +
+                         chr(self._seq & 0xff) + payload)
+        self._buffered += len(payload) + 4
+        self._seq += 1
+        if flush or self._buffered >= 65536:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            self._sock.sendall(''.join(self._buf))
+            self._buf = []
+            self._buffered = 0
+
+    def recv(self):
+        header = self._recv_exactly(4)
+        if header is None:
+            return None
+        size = struct.unpack('<I', header[:3] + '\x00')[0]
+        self._seq = ord(header[3]) + 1
+        return self._recv_exactly(size)
+
+    def _recv_exactly(self, size):
+        data = []
+        while size > 0:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                return None
+            data.append(chunk)
+            size -= len(chunk)
+        return ''.join(data)
+
+    def run(self):
+        try:
+            if self.handshake():
+                while self.command():
+                    pass
+        except socket.error:
+            pass
+        finally:
+            self._sock.close()
+
+    def handshake(self):
+        master = self._master
+        self.send('\x0a' + master.server_version + '\x00' +
+                  struct.pack('<I', 1) + SCRAMBLE[:8] + '\x00' +
+                  struct.pack('<HBH', 0xf7ff, 33, 2) + '\x00' * 13 +
+                  SCRAMBLE[8:] + '\x00')
+        auth = self.recv()
+        if auth is None:
+            return False
+        user, rest = auth[32:].split('\x00', 1)
+        token = rest[1:1 + ord(rest[0])]
+        expected = ''
+        if master.password:
+            expected = MySQLProtocol()._scramble_password(master.password,
+                                                          SCRAMBLE)
+        if (master.user is not None and user != master.user) or \
+           token != expected:
+            self.send(err_payload(1045, "Access denied for user '%s'" % user,
+                                  "28000"))
+            return False
+        self.send(ok_payload())
+        return True
+
+    def command(self):
+        packet = self.recv()
+        if packet is None or ord(packet[0]) == ServerCmd.QUIT:
+            return False
+        command = ord(packet[0])
+        if command == ServerCmd.QUERY:
+            self.query(packet[1:])
+        elif command in (ServerCmd.INIT_DB, ServerCmd.PING):
+            self.send(ok_payload())
+        elif command == ServerCmd.BINLOG_DUMP:
+            offset, flags, server_id = struct.unpack_from('<IHI', packet, 1)
+            self.dump(packet[11:].rstrip('\x00'), offset)
+            return False
+        else:
+            self.send(err_payload(1047, "Unknown command"))
+        return True
+
+    def query(self, sql):
+        master = self._master
+        master.queries.append(sql)
+        sql = sql.strip().rstrip(';')
+        match = _HEARTBEAT_PERIOD.match(sql)
+        if match:
+            self._heartbeat_period = int(match.group(1)) / 1e9
+        if _CHECKSUM_ANNOUNCE.match(sql):
+            self._checksum = master.binlog_checksum == "CRC32"
+        if sql.upper().startswith("SET "):
+            self.send(ok_payload())
+            return
+        if sql.lower() == "show master status":
+            log_file, position = master.master_status()
+            self.result_set([("File", FieldType.VAR_STRING),
+                             ("Position", FieldType.LONGLONG),
+                             ("Binlog_Do_DB", FieldType.VAR_STRING),
+                             ("Binlog_Ignore_DB", FieldType.VAR_STRING)],
+                            [(log_file, position, "", "")])
+            return
+        if _CHECKSUM_VARIABLE.match(sql):
+            # masters before 5.6.1 do not have the variable.
+            rows = []
+            if master.binlog_checksum is not None:
+                rows = [("binlog_checksum", master.binlog_checksum)]
+            self.result_set([("Variable_name", FieldType.VAR_STRING),
+                             ("Value", FieldType.VAR_STRING)], rows)
+            return
+        match = _COLUMNS_QUERY.search(sql)
+        if match:
+            columns = master.tables.get(match.groups(), [])
+            names = ["TABLE_SCHEMA", "TABLE_NAME", "COLUMN_NAME",
+                     "ORDINAL_POSITION", "COLUMN_TYPE"]
+            self.result_set([(n, FieldType.VAR_STRING) for n in names],
+                            [match.groups() + (c["COLUMN_NAME"], i + 1,
+                                               c["COLUMN_TYPE"])
+                             for (i, c) in enumerate(columns)])
+            return
+        match = _SHOW_COLUMNS.search(sql)
+        if match:
+            columns = master.tables.get(match.groups(), [])
+            names = ["Field", "Type", "Collation", "Null", "Key", "Default",
+                     "Extra", "Privileges", "Comment"]
+            self.result_set([(n, FieldType.VAR_STRING) for n in names],
+                            [(c["COLUMN_NAME"], c["COLUMN_TYPE"], None,
+                              "YES", "", None, "", "select", "")
+                             for c in columns])
+            return
+        match = _SELECT_LIMIT_0.search(sql)
+        if match and match.groups() in master.tables:
+            columns = master.tables[match.groups()]
+            self.result_set([(c["COLUMN_NAME"], FieldType.VAR_STRING)
+                             for c in columns], [])
+            return
+        self.send(err_payload(1064, "Unsupported statement: %s" % sql,
+                              "42000"))
+
+    def result_set(self, columns, rows):
+        self.send(lc_int(len(columns)), False)
+        for name, field_type in columns:
+            self.send(lc_str("def") + lc_str("") + lc_str("") + lc_str("") +
+                      lc_str(name) + lc_str(name) + '\x0c' +
+                      struct.pack('<HIBHB', 33, 255, field_type, 0, 0) +
+                      '\x00\x00', False)
+        self.send(eof_payload(), False)
+        for row in rows:
+            self.send(''.join([lc_str(v) for v in row]), False)
+        self.send(eof_payload())
+
+    def event(self, event, flush=False):
+        self.send('\x00' + event, flush)
+
+    def artificial(self, event_type, body, log_pos=0):
+        size = 19 + len(body) + (4 if self._checksum else 0)
+        event = struct.pack('<IBIIIH', 0, event_type, self._master.server_id,
+                            size, log_pos, ARTIFICIAL_FLAG) + body
+        if self._checksum:
+            event += struct.pack('<I', zlib.crc32(event) & 0xffffffff)
+        return event
+
+    def dump(self, log_file, offset):
+        master = self._master
+        master.dumps.append((log_file, offset))
+        names = [name for (name, _) in master.binlogs]
+        if log_file not in names:
+            self.send(err_payload(1236, "Could not find first log file name "
+                                  "in binary log index file"))
+            return
+        if master.binlog_checksum == "CRC32" and not self._checksum:
+            self.send(err_payload(1236, "Slave can not handle replication "
+                                  "events with the checksum that master is "
+                                  "configured to log"))
+            return
+        # a rotate to the position first, then the events from there.
+        self.event(self.artificial(EventType.ROTATE_EVENT,
+                                   struct.pack('<Q', offset) + log_file), True)
+        index = names.index(log_file)
+        pace = master.events_per_sec
+        start = time.time()
+        sent = 0
+        while True:
+            name, data = master.binlogs[index]
+            if offset > len(BINLOG_MAGIC):
+                # the format description of the file goes first.
+                for _, event in split_events(data, len(BINLOG_MAGIC)):
+                    if ord(event[4]) == EventType.FORMAT_DESCRIPTION_EVENT:
+                        event = event[:13] + '\x00' * 4 + event[17:-4]
+                        crc = '\x00' * 4
+                        if self._checksum:
+                            crc = struct.pack('<I', zlib.crc32(event) &
+                                              0xffffffff)
+                        self.event(event + crc)
+                    break
+            for position, event in split_events(data, offset):
+                if pace:
+                    delay = start + float(sent) / pace - time.time()
+                    if delay > 0:
+                        self.flush()
+                        time.sleep(delay)
+                self.event(event)
+                sent += 1
+                if ord(event[4]) == EventType.XID_EVENT:
+                    master.commits[position + len(event)] = time.time()
+                if sent == master.stall_after and len(master.dumps) == 1:
+                    # silent from now on, like a stalled master.
+                    self.flush()
+                    master.stopped.wait()
+                    return
+            index += 1
+            if index == len(master.binlogs):
+                break
+            offset = len(BINLOG_MAGIC)
+            self.event(self.artificial(EventType.ROTATE_EVENT,
+                                       struct.pack('<Q', offset) +
+                                       master.binlogs[index][0]))
+        self.flush()
+        if master.eof:
+            self.send(eof_payload())
+            return
+        # keep the connection open like a master waiting for writes.
+        while not master.stopped.is_set():
+            if self._heartbeat_period:
+                master.stopped.wait(self._heartbeat_period)
+                self.event(self.artificial(EventType.HEARTBEAT_LOG_EVENT,
+                                           name, len(data)), True)
+            else:
+                master.stopped.wait(0.1)
+
+
+class FakeMaster(threading.Thread):
+    """
+    The fake master, listening on host:port, any free port by default.
+
+    Binlogs are streamed in the order they were added. With eof the
+    dump ends with an EOF packet after the last event, otherwise the
+    connection is kept open, with heartbeats when the client asked for
+    them. events_per_sec paces the events, they are sent as fast as
+    possible without it. binlog_checksum is the checksum the binlogs
+    are logged with, "NONE" or "CRC32", None for a master older than
+    5.6.1. With stall_after the first dump goes silent after that
+    many events. commits maps the end position of the xid
+    events sent to the time they were sent at.
+    """
+    def __init__(self, host="127.0.0.1", port=0, user=None, password=None,
+                 eof=True, events_per_sec=None, server_id=1,
+                 server_version="5.6.10-fake", binlog_checksum=None,
+                 stall_after=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.user = user
+        self.password = password
+        self.eof = eof
+        self.events_per_sec = events_per_sec
+        self.server_id = server_id
+        self.server_version = server_version
+        self.binlog_checksum = binlog_checksum
+        self.stall_after = stall_after
+        self.binlogs = []
+        self.tables = {}
+        self.queries = []
+        self.dumps = []
+        self.commits = {}
+        self.stopped = threading.Event()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(16)
+        self.host, self.port = self._listener.getsockname()
+
+    def conf(self):
+        """
+        Connection options of a Source to this master.
+        """
+        res = {"host":self.host, "port":self.port}
+        if self.user is not None:
+            res["user"] = self.user
+        if self.password is not None:
+            res["password"] = self.password
+        return res
+
+    def add_file(self, path, log_file=None):
+        """
+        Serve a binlog file, named as the file by default.
+        """
+        f = open(path, "rb")
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        self.binlogs.append((log_file or os.path.basename(path), data))
+
+    def add_events(self, log_file, events):
+        """
+        Serve events, strings of header and body, as a binlog.
+        """
+        self.binlogs.append((log_file, BINLOG_MAGIC + ''.join(events)))
+
+    def add_table(self, schema, table, columns):
+        """
+        Columns of a table, a list of dicts with COLUMN_NAME and
+        COLUMN_TYPE like SyntheticTable.columns() gives.
+        """
+        self.tables[(schema, table)] = list(columns)
+
+    def master_status(self):
+        if not self.binlogs:
+            return ("mysql-bin.000001", len(BINLOG_MAGIC))
+        log_file, data = self.binlogs[-1]
+        return (log_file, len(data))
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except socket.error:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _Session(self, sock).start()
+
+    def stop(self):
+        self.stopped.set()
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._listener.close()
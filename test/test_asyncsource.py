@@ -0,0 +1,86 @@
+'''
+Tests for the asyncore driven source.
+'''
+
+import os
+import asyncore
+import socket
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.asyncsource import AsyncSource
+from mysqlsub.event import *
+from mysql.connector.network import BaseMySQLSocket
+from test_transaction import make_query, make_xid
+
+EOF_PACKET = '\x01\x00\x00\x09\xfe'
+
+
+def make_socket():
+    peer, sock = socket.socketpair()
+    mysql_socket = BaseMySQLSocket()
+    mysql_socket.sock = sock
+    mysql_socket.get_address = lambda: "socketpair"
+    mysql_socket.set_buffered(recvsize=64)
+    return peer, mysql_socket
+
+
+class TestAsyncSource(unittest.TestCase):
+
+    def testRecvAvailable(self):
+        peer, mysql_socket = make_socket()
+        mysql_socket.sock.setblocking(0)
+        self.assertEqual(mysql_socket.recv_available(), [])
+        packet = make_query("BEGIN")
+        peer.sendall(packet + packet[0:7])
+        self.assertEqual(mysql_socket.recv_available(), [packet])
+        peer.sendall(packet[7:])
+        self.assertEqual(mysql_socket.recv_available(), [packet])
+        peer.close()
+        mysql_socket.close_connection()
+
+    def testUnbuffered(self):
+        self.assertRaises(ValueError, AsyncSource, recv_buffer_size=0)
+        AsyncSource(recv_buffer_size=4096)
+
+    def testSharedLoop(self):
+        sources = {}
+        received = {}
+        peers = []
+        for name in ("a", "b"):
+            received[name] = []
+            source = AsyncSource(received[name].append, sources)
+            peer, source._socket = make_socket()
+            peers.append(peer)
+            source._start()
+        for i in range(20):
+            for peer in peers:
+                peer.sendall(make_query("BEGIN") + make_xid(i, 1000 + i))
+        for peer in peers:
+            peer.sendall(EOF_PACKET)
+        asyncore.loop(timeout=0.1, map=sources, count=100)
+        self.assertEqual(sources, {})
+        for name in ("a", "b"):
+            events = received[name]
+            self.assertEqual(events[-1], None)
+            self.assertEqual(len(events), 41)
+            self.assertEqual([e.xid for e in events[1:-1:2]], range(20))
+        for peer in peers:
+            peer.close()
+
+    def testPendingAfterDump(self):
+        received = []
+        source = AsyncSource(received.append, {})
+        peer, source._socket = make_socket()
+        # events received along with the dump response.
+        peer.sendall(make_query("BEGIN") * 2 + EOF_PACKET)
+        # the first packet stands for the dump response.
+        source._socket.recv()
+        source._start()
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[0].query, "BEGIN")
+        self.assertEqual(received[1], None)
+        peer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+'''
+Tests for the checkpoint store and the position tracking of Source.
+'''
+
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.checkpoint import Checkpoint
+from mysqlsub.constants import EventType
+from mysqlsub.source import Source
+from test_event import make_event
+from test_heartbeat import make_heartbeat
+from test_transaction import make_query, make_xid, FakeSocket
+
+
+def make_rotate(log_file, position):
+    return make_event(EventType.ROTATE_EVENT,
+                      struct.pack('<Q', position) + log_file,
+                      timestamp=0, log_pos=0)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, "position")
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def testSyncEvery(self):
+        checkpoint = Checkpoint(self._path, sync_every=3)
+        self.assertEqual(checkpoint.load(), None)
+        checkpoint.save("mysql-bin.000001", 100)
+        checkpoint.save("mysql-bin.000001", 200)
+        self.assertEqual(Checkpoint(self._path).load(), None)
+        checkpoint.save("mysql-bin.000001", 300)
+        self.assertEqual(Checkpoint(self._path).load(),
+                         ("mysql-bin.000001", 300))
+        checkpoint.save("mysql-bin.000002", 4)
+        checkpoint.close()
+        self.assertEqual(Checkpoint(self._path).load(),
+                         ("mysql-bin.000002", 4))
+        self.assertEqual(os.listdir(self._dir), ["position"])
+
+    def testSyncInterval(self):
+        checkpoint = Checkpoint(self._path, sync_every=1000, sync_interval=0)
+        checkpoint.save("mysql-bin.000001", 100)
+        self.assertEqual(Checkpoint(self._path).load(),
+                         ("mysql-bin.000001", 100))
+
+    def testSyncIdle(self):
+        checkpoint = Checkpoint(self._path, sync_every=1000,
+                                sync_interval=0.5)
+        source = Source(checkpoint=checkpoint)
+        self.assertEqual(source._heartbeat_period, 0.5)
+        source._socket = FakeSocket([make_rotate("mysql-bin.000001", 4),
+                                     make_query("BEGIN", log_pos=150),
+                                     make_xid(1, 200),
+                                     make_query("BEGIN", log_pos=250)])
+        events = iter(source)
+        for i in range(4):
+            events.next()
+        self.assertEqual(checkpoint.load(), None)
+        # no transaction since, the heartbeats of the idle master sync.
+        time.sleep(0.5)
+        source._socket.packets[:0] = [make_heartbeat(), make_xid(2, 300)]
+        events.next()
+        self.assertEqual(Checkpoint(self._path).load(), ("mysql-bin.000001", 200))
+
+    def testSourcePosition(self):
+        checkpoint = Checkpoint(self._path)
+        source = Source(checkpoint=checkpoint)
+        source._socket = FakeSocket([
+            make_rotate("mysql-bin.000007", 4),
+            make_query("BEGIN", log_pos=150),
+            make_xid(1, 200),
+            make_query("CREATE TABLE t2 (id int)", log_pos=230),
+            make_query("BEGIN", log_pos=250),
+            make_query("COMMIT", log_pos=300)])
+        events = iter(source)
+        events.next()
+        self.assertEqual(source.position(), ("mysql-bin.000007", 4))
+        events.next()
+        events.next()
+        self.assertEqual(source.position(), ("mysql-bin.000007", 200))
+        # saved once the consumer asks for the event after the commit.
+        self.assertEqual(checkpoint.load(), None)
+        events.next()
+        self.assertEqual(checkpoint.load(), ("mysql-bin.000007", 200))
+        transactions = list(source.transactions())
+        self.assertEqual([(t.log_file, t.log_pos) for t in transactions],
+                         [("mysql-bin.000007", 300)])
+        self.assertEqual(checkpoint.load(), ("mysql-bin.000007", 300))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+'''
+Tests for the columnar output of rows events.
+'''
+
+import os
+import array
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub import columnar
+from mysqlsub.columnar import ColumnBatch
+from mysqlsub.constants import EventType
+from mysqlsub.event import *
+from mysqlsub.source import Source
+from mysqlsub.synthetic import *
+from test_transaction import FakeSocket
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.tables = [SyntheticTable(3, "db", "t", "ints"),
+                       SyntheticTable(4, "db", "u", "mixed")]
+
+    def events(self, tables, null_density=0.0, rows_event_types=None,
+               **kwargs):
+        generator = BinlogGenerator(
+            tables, rows_per_event=6, null_density=null_density, seed=3,
+            rows_event_types=rows_event_types or
+            (EventType.WRITE_ROWS_EVENT,))
+        source = Source(**kwargs)
+        source._schema_cache = schema_cache(tables)
+        for table in tables:
+            source.add_table(table.schema, table.table,
+                             [c["COLUMN_NAME"] for c in table.columns()])
+        source._socket = FakeSocket(generator.packets(4))
+        return [e for e in source if isinstance(e, RowsEvent)]
+
+    def testTypedArrays(self):
+        event = self.events(self.tables[:1], null_density=0.3)[0]
+        rows = list(event.rows())
+        columns = event.to_columns(use_numpy=False)
+        self.assertEqual(sorted(columns), ["c%d" % i for i in range(6)])
+        self.assertEqual([columns["c%d" % i][0].typecode for i in range(6)],
+                         ['i', 'l', 'i', 'h', 'b', 'i'])
+        for name, (values, nulls) in columns.items():
+            self.assertEqual(len(values), 6)
+            self.assertEqual(nulls.tolist(),
+                             [int(r[name] is None) for r in rows])
+            self.assertEqual(values.tolist(),
+                             [r[name] or 0 for r in rows])
+
+    def testMixed(self):
+        event = [e for e in self.events(self.tables, decimal_mode="float")
+                 if e.table == "u"][0]
+        rows = list(event.rows())
+        columns = event.to_columns(use_numpy=False)
+        # double, decimal as float and float are typed, the rest lists.
+        self.assertEqual(columns["c3"][0].typecode, 'd')
+        self.assertEqual(columns["c5"][0].typecode, 'd')
+        self.assertEqual(columns["c8"][0].typecode, 'f')
+        self.assertEqual(columns["c2"][0], [r["c2"] for r in rows])
+        self.assertEqual(columns["c4"][0], [r["c4"] for r in rows])
+
+    def testUpdate(self):
+        event = self.events(self.tables[:1], rows_event_types=(
+            EventType.UPDATE_ROWS_EVENT_V2,))[0]
+        rows = list(event.rows())
+        before = event.to_columns(before=True, use_numpy=False)
+        after = event.to_columns(use_numpy=False)
+        self.assertEqual(before["c0"][0].tolist(), [r[0]["c0"] for r in rows])
+        self.assertEqual(after["c0"][0].tolist(), [r[1]["c0"] for r in rows])
+
+    def testBatch(self):
+        events = self.events(self.tables[:1], null_density=0.2)
+        batch = ColumnBatch()
+        for event in events:
+            batch.add(event)
+        self.assertEqual(len(batch), 4 * 6)
+        self.assertEqual((batch.schema, batch.table), ("db", "t"))
+        values, nulls = batch.columns(use_numpy=False)["c1"]
+        expected = []
+        for event in events:
+            expected += [r["c1"] for r in event.rows()]
+        self.assertEqual(values.tolist(), [v or 0 for v in expected])
+        self.assertEqual(nulls.tolist(), [int(v is None) for v in expected])
+
+        other = [e for e in self.events(self.tables) if e.table == "u"][0]
+        self.assertRaises(ValueError, batch.add, other)
+
+    def testMissingColumns(self):
+        batch = ColumnBatch()
+
+        class Event(object):
+            schema = "db"
+            table = "t"
+
+            def __init__(self, names, rows):
+                self._values = (names, ('i',) * len(names), rows)
+
+            def row_values(self, before=False):
+                return self._values
+
+        batch.add(Event(("a", "b"), [[1, 2], [3, None]]))
+        batch.add(Event(("b", "c"), [[4, 5]]))
+        columns = batch.columns(use_numpy=False)
+        self.assertEqual(columns["a"], (array.array('i', [1, 3, 0]),
+                                        array.array('B', [0, 0, 1])))
+        self.assertEqual(columns["b"], (array.array('i', [2, 0, 4]),
+                                        array.array('B', [0, 1, 0])))
+        self.assertEqual(columns["c"], (array.array('i', [0, 0, 5]),
+                                        array.array('B', [1, 1, 0])))
+
+    def testTypeChange(self):
+        batch = ColumnBatch()
+
+        class Event(object):
+            schema = "db"
+            table = "t"
+
+            def __init__(self, typecode, rows):
+                self._values = (("a",), (typecode,), rows)
+
+            def row_values(self, before=False):
+                return self._values
+
+        batch.add(Event('i', [[1], [None]]))
+        # widened by an ALTER TABLE.
+        batch.add(Event('d', [[2.5]]))
+        batch.add(Event('i', [[3]]))
+        values, nulls = batch.columns(use_numpy=False)["a"]
+        self.assertEqual(values, [1, None, 2.5, 3])
+        self.assertEqual(nulls.tolist(), [0, 1, 0, 0])
+
+    @unittest.skipUnless(columnar.numpy, "NumPy is not installed")
+    def testNumpy(self):
+        event = self.events(self.tables[:1], null_density=0.3)[0]
+        rows = list(event.rows())
+        values, nulls = event.to_columns()["c1"]
+        self.assertEqual(values.dtype, columnar.numpy.dtype('l'))
+        self.assertEqual(nulls.tolist(), [r["c1"] is None for r in rows])
+
+
+if __name__ == "__main__":
+    unittest.main()
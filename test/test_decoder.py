@@ -0,0 +1,141 @@
+'''
+Tests for the compiled row decoders.
+'''
+
+import os
+import struct
+import datetime
+import decimal
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub import utils
+from mysqlsub.constants import ColumnType
+from mysqlsub.decoder import RowDecoder, get_decoder
+from mysql.connector.constants import FieldType
+
+
+def column(name, real_type, unsigned=False, **metadata):
+    schema = {"COLUMN_NAME":name, "REAL_TYPE":real_type,
+              "IS_UNSIGNED":unsigned}
+    schema.update(metadata)
+    return schema
+
+
+COLUMNS = [column("id", FieldType.LONG, True),
+           column("delta", FieldType.INT24),
+           column("score", FieldType.DOUBLE),
+           column("name", FieldType.VARCHAR, MAX_LENGTH=300),
+           column("price", FieldType.NEWDECIMAL, PRECISION=14, DECIMALS=4),
+           column("day", FieldType.DATE),
+           column("state", FieldType.ENUM, SIZE=1, ENUM_VALUES=["on", "off"]),
+           column("body", FieldType.BLOB, LENGTH_SIZE=2)]
+
+
+def make_row(nulls, values):
+    return chr(nulls) + ''.join(values)
+
+
+class TestRowDecoder(unittest.TestCase):
+
+    def testFullRow(self):
+        decoder = RowDecoder(COLUMNS)
+        data = make_row(0, [struct.pack('<I', 4000000000),
+                            '\xff\xff\xff',
+                            struct.pack('<d', 0.5),
+                            struct.pack('<H', 3) + 'abc',
+                            '\x81\x0d\xfb\x38\xd2\x04\xd2',
+                            struct.pack('<I', (2013 << 9) | (3 << 5) | 1)[0:3],
+                            '\x02',
+                            struct.pack('<H', 2) + 'xy'])
+        reader = utils.BufferReader(data + 'next')
+        row = decoder.decode(reader)
+        self.assertEqual(row, [4000000000, -1, 0.5, 'abc',
+                               decimal.Decimal("1234567890.1234"),
+                               datetime.date(2013, 3, 1), "off", "xy"])
+        self.assertEqual(reader.read(4), 'next')
+
+    def testNulls(self):
+        decoder = RowDecoder(COLUMNS)
+        # delta, name and day are NULL.
+        data = make_row((1 << 1) | (1 << 3) | (1 << 5),
+                        [struct.pack('<I', 7),
+                         struct.pack('<d', 1.0),
+                         '\x81\x0d\xfb\x38\xd2\x04\xd2',
+                         '\x01',
+                         struct.pack('<H', 0)])
+        row = decoder.decode(utils.BufferReader(data))
+        self.assertEqual(row, [7, None, 1.0, None,
+                               decimal.Decimal("1234567890.1234"), None,
+                               "on", ""])
+
+    def testPresentBitmap(self):
+        decoder = RowDecoder(COLUMNS, (1 << 0) | (1 << 3))
+        self.assertEqual(decoder.names, ("id", "name"))
+        data = make_row(0, [struct.pack('<I', 7), struct.pack('<H', 1) + 'a'])
+        self.assertEqual(decoder.decode(utils.BufferReader(data)),
+                         [7, 'a'])
+
+    def testProjection(self):
+        decoder = RowDecoder(COLUMNS, projection=["score", "state"])
+        self.assertEqual(decoder.names, ("score", "state"))
+        data = make_row(0, [struct.pack('<I', 7),
+                            '\x00\x00\x01',
+                            struct.pack('<d', 2.5),
+                            struct.pack('<H', 3) + 'abc',
+                            '\x81\x0d\xfb\x38\xd2\x04\xd2',
+                            '\x00\x00\x00',
+                            '\x01',
+                            struct.pack('<H', 1000) + 'z' * 1000])
+        reader = utils.BufferReader(data)
+        self.assertEqual(decoder.decode(reader), [2.5, "on"])
+        self.assertEqual(reader.remaining(), 0)
+        # id and name NULL: the skipped columns move with the nulls.
+        data = make_row((1 << 0) | (1 << 3),
+                        ['\x00\x00\x01',
+                         struct.pack('<d', 2.5),
+                         '\x81\x0d\xfb\x38\xd2\x04\xd2',
+                         '\x00\x00\x00',
+                         '\x02',
+                         struct.pack('<H', 1) + 'z'])
+        reader = utils.BufferReader(data)
+        self.assertEqual(decoder.decode(reader), [2.5, "off"])
+        self.assertEqual(reader.remaining(), 0)
+
+    def testTemporal(self):
+        decoder = RowDecoder([column("at", ColumnType.DATETIME2, FSP=3),
+                              column("took", ColumnType.TIME2, FSP=2),
+                              column("zero", ColumnType.DATETIME2, FSP=0),
+                              column("id", FieldType.LONG)])
+        # 2013-03-01 12:34:56.789, 2013 * 13 + 3 = 26172.
+        at = ((((26172 << 5) | 1) << 17) | (12 << 12) | (34 << 6) | 56) + \
+             0x8000000000
+        # negative times count their fraction down from the next second.
+        for took, expected in (('\x80\x00\x00\x00', (0, 0)),
+                               ('\x7f\xff\xff\xff', (0, -10000)),
+                               ('\x7f\xff\xff\x9d', (0, -990000)),
+                               ('\x7f\xff\xff\x00', (-1, 0)),
+                               ('\x7f\xff\xfe\xf6', (-1, -100000)),
+                               ('\x80\x10\x02\x32', (3602, 500000))):
+            data = make_row(0, [struct.pack('>Q', at)[3:] +
+                                struct.pack('>H', 7890),
+                                took,
+                                '\x80\x00\x00\x00\x00',
+                                struct.pack('<i', 7)])
+            reader = utils.BufferReader(data)
+            seconds, usec = expected
+            self.assertEqual(decoder.decode(reader),
+                             [datetime.datetime(2013, 3, 1, 12, 34, 56,
+                                                789000),
+                              datetime.timedelta(0, seconds, usec),
+                              None, 7])
+            self.assertEqual(reader.remaining(), 0)
+
+    def testDecoderCache(self):
+        table = {"column_schemas":COLUMNS}
+        decoder = get_decoder(table, 0xff)
+        self.assertTrue(get_decoder(table, 0xff) is decoder)
+        self.assertFalse(get_decoder(table, 0x0f) is decoder)
+
+
+if __name__ == "__main__":
+    unittest.main()
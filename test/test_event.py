@@ -0,0 +1,281 @@
+'''
+Tests for binlog event decoding, run against hand built packets.
+'''
+
+import os
+import struct
+import decimal
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub import utils
+from mysqlsub.constants import EventType, ChecksumAlg
+from mysqlsub.event import *
+from mysqlsub.schema import SchemaCache
+from mysqlsub.source import Source
+from mysql.connector.constants import FieldType
+
+
+def make_event(event_type, body, timestamp=1362100000, log_pos=1000):
+    header = struct.pack('<IBIIIH', timestamp, event_type, 1,
+                         19 + len(body), log_pos, 0)
+    payload = '\x00' + header + body
+    return struct.pack('<I', len(payload))[0:3] + '\x01' + payload
+
+
+def make_table_map(table_id, schema, table, types, metadata):
+    body = struct.pack('<IH', table_id & 0xffffffff, table_id >> 32)
+    body += '\x00\x00'
+    body += chr(len(schema)) + schema + '\x00'
+    body += chr(len(table)) + table + '\x00'
+    body += chr(len(types)) + ''.join([chr(t) for t in types])
+    body += chr(len(metadata)) + metadata
+    body += '\x00' * ((len(types) + 7) / 8)
+    return make_event(EventType.TABLE_MAP_EVENT, body)
+
+
+class FakeConnection(object):
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.queries = []
+
+    def query(self, sql):
+        self.queries.append(sql)
+        return [dict(c) for c in self.columns], None
+
+
+class TestBufferReader(unittest.TestCase):
+
+    def testFixedWidth(self):
+        data = 'xx' + struct.pack('<bHiqd', -3, 513, -70000, 2 ** 40, 1.5)
+        reader = utils.BufferReader(data, 2)
+        self.assertEqual(reader.read_int8(), -3)
+        self.assertEqual(reader.read_uint16(), 513)
+        self.assertEqual(reader.read_int32(), -70000)
+        self.assertEqual(reader.read_int64(), 2 ** 40)
+        self.assertEqual(reader.read_double(), 1.5)
+        self.assertEqual(reader.remaining(), 0)
+
+    def testOddWidths(self):
+        reader = utils.BufferReader('\xff\xff\xff\x01\x02\x03\x04\x05\x06')
+        self.assertEqual(reader.read_int24(), -1)
+        self.assertEqual(reader.read_uint48(), 0x060504030201)
+
+    def testLengthCoded(self):
+        reader = utils.BufferReader('\x05\xfb\xfc\x00\x01\x02ab')
+        self.assertEqual(reader.read_lc_int(), 5)
+        self.assertEqual(reader.read_lc_int(), None)
+        self.assertEqual(reader.read_lc_int(), 256)
+        self.assertEqual(reader.read_pascal_string(1), 'ab')
+
+    def testBitmap(self):
+        reader = utils.BufferReader('\x01\x80')
+        self.assertEqual(reader.read_bitmap(2), 0x8001)
+
+    def testNewDecimal(self):
+        reader = utils.BufferReader('\x81\x0d\xfb\x38\xd2\x04\xd2'
+                                    '\x7e\xf2\x04\xc7\x2d\xfb\x2d')
+        self.assertEqual(utils.read_new_decimal(reader, 14, 4),
+                         decimal.Decimal("1234567890.1234"))
+        self.assertEqual(utils.read_new_decimal(reader, 14, 4),
+                         decimal.Decimal("-1234567890.1234"))
+
+
+class TestEvents(unittest.TestCase):
+
+    def testEventHeader(self):
+        event = BinlogEvent(make_event(EventType.XID_EVENT, '\x00' * 8))
+        self.assertEqual(event.header.event_type, EventType.XID_EVENT)
+        self.assertEqual(event.header.timestamp, 1362100000)
+        self.assertEqual(event.header.event_size, 27)
+        self.assertEqual(event.header.log_pos, 1000)
+        self.assertFalse(event.is_eof())
+
+    def testEof(self):
+        event = BinlogEvent('\x05\x00\x00\x02\xfe\x00\x00\x02\x00')
+        self.assertTrue(event.is_eof())
+        self.assertEqual(event.header, None)
+
+    def testFormatDescription(self):
+        body = struct.pack('<H50sIB', 4, "5.6.10-log", 0, 19) + '\x08' * 35
+        event = FormatDescriptionEvent(
+            make_event(EventType.FORMAT_DESCRIPTION_EVENT,
+                       body + chr(ChecksumAlg.CRC32) + '\x00' * 4))
+        self.assertEqual(event.server_version, "5.6.10-log")
+        self.assertEqual(event.checksum_alg, ChecksumAlg.CRC32)
+        self.assertEqual(event.checksum_size, 4)
+        self.assertEqual(len(event.post_header_lengths), 35)
+        # no checksum algorithm before 5.6.1.
+        body = struct.pack('<H50sIB', 4, "5.5.30-log", 0, 19) + '\x08' * 27
+        event = FormatDescriptionEvent(
+            make_event(EventType.FORMAT_DESCRIPTION_EVENT, body))
+        self.assertEqual(event.checksum_alg, ChecksumAlg.UNDEF)
+        self.assertEqual(event.checksum_size, 0)
+        self.assertEqual(len(event.post_header_lengths), 27)
+
+    def testChecksumStripped(self):
+        packet = make_event(EventType.QUERY_EVENT,
+                            struct.pack('<IIBHH', 7, 0, 2, 0, 0) +
+                            'db\x00BEGIN' + 'crc!')
+        header = EventHeader(packet, EVENT_HEADER_OFFSET, 4)
+        self.assertEqual(QueryEvent(packet, header).query, "BEGIN")
+
+    def testTableMap(self):
+        columns = [{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(10) unsigned"},
+                   {"COLUMN_NAME":"name", "COLUMN_TYPE":"varchar(300)"}]
+        conn = FakeConnection(columns)
+        table_map = {}
+        packet = make_table_map(2 ** 33 + 7, "FC_Word", "wordinfo0",
+                                [FieldType.LONG, FieldType.VARCHAR],
+                                struct.pack('<H', 900))
+        event = TableMapEvent(packet, table_map,
+                              {"FC_Word":{"wordinfo0":{}}},
+                              SchemaCache(conn.query))
+        self.assertEqual(table_map, {})
+        self.assertEqual(event.table_id, 2 ** 33 + 7)
+        self.assertEqual(event.schema, "FC_Word")
+        self.assertEqual(event.table, "wordinfo0")
+        self.assertEqual(event.columns_type, [FieldType.LONG, FieldType.VARCHAR])
+        schemas = table_map[event.table_id]["column_schemas"]
+        self.assertTrue(schemas[0]["IS_UNSIGNED"])
+        self.assertEqual(schemas[1]["MAX_LENGTH"], 900)
+        self.assertEqual(len(conn.queries), 1)
+
+    def testSchemaCache(self):
+        columns = [{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(11)"}]
+        conn = FakeConnection(columns)
+        cache = SchemaCache(conn.query)
+        subscribed = {"db":{"t":{}}}
+        table_map = {}
+        for table_id in (1, 1, 2, 1):
+            packet = make_table_map(table_id, "db", "t", [FieldType.LONG], "")
+            TableMapEvent(packet, table_map, subscribed, cache).decode()
+        self.assertEqual(len(conn.queries), 1)
+        entry = table_map[1]
+        packet = make_table_map(1, "db", "t", [FieldType.LONG], "")
+        TableMapEvent(packet, table_map, subscribed, cache).decode()
+        self.assertTrue(table_map[1] is entry)
+        cache.invalidate("db", "t")
+        packet = make_table_map(3, "db", "t", [FieldType.LONG], "")
+        TableMapEvent(packet, table_map, subscribed, cache).decode()
+        self.assertEqual(len(conn.queries), 2)
+
+    def testQueryEvent(self):
+        body = struct.pack('<IIBHH', 7, 0, 2, 0, 0) + 'db\x00' + 'BEGIN'
+        event = QueryEvent(make_event(EventType.QUERY_EVENT, body))
+        self.assertEqual(event.schema, "db")
+        self.assertEqual(event.query, "BEGIN")
+
+    def testLazyDecoding(self):
+        packet = make_table_map(1, "db", "t", [FieldType.LONG], "")
+        header = EventHeader(packet, EVENT_HEADER_OFFSET)
+        event = TableMapEvent(packet, {}, {}, None, header)
+        self.assertTrue(event.header is header)
+        self.assertFalse(event._decoded)
+        self.assertEqual(event.table, "t")
+        self.assertTrue(event._decoded)
+        self.assertRaises(AttributeError, getattr, event, "missing")
+
+
+class TestRowsEvents(unittest.TestCase):
+
+    def setUp(self):
+        columns = [{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(11)"},
+                   {"COLUMN_NAME":"name", "COLUMN_TYPE":"varchar(20)"}]
+        self._table_map = {}
+        packet = make_table_map(5, "db", "t",
+                                [FieldType.LONG, FieldType.VARCHAR],
+                                struct.pack('<H', 20))
+        TableMapEvent(packet, self._table_map, {"db":{"t":{}}},
+                      SchemaCache(FakeConnection(columns).query)).decode()
+
+    def make_rows(self, event_type, images, table_id=5, extra=''):
+        body = struct.pack('<IH', table_id, 0) + '\x00\x00' + extra
+        body += '\x02\x03'
+        if event_type in (EventType.UPDATE_ROWS_EVENT,
+                          EventType.UPDATE_ROWS_EVENT_V2):
+            body += '\x03'
+        for (id, name) in images:
+            if name is None:
+                body += '\x02' + struct.pack('<i', id)
+            else:
+                body += '\x00' + struct.pack('<i', id) + chr(len(name)) + name
+        return make_event(event_type, body)
+
+    def testWriteRows(self):
+        packet = self.make_rows(EventType.WRITE_ROWS_EVENT,
+                                [(1, "a"), (-2, None), (3, "ccc")])
+        event = WriteRowsEvent(packet, self._table_map, {})
+        self.assertEqual(event.schema, "db")
+        self.assertEqual(event.table, "t")
+        self.assertEqual(list(event.rows()),
+                         [{"id":1, "name":"a"}, {"id":-2, "name":None},
+                          {"id":3, "name":"ccc"}])
+        # rows() starts over on every call.
+        self.assertEqual(len(list(event)), 3)
+
+    def testDeleteRows(self):
+        packet = self.make_rows(EventType.DELETE_ROWS_EVENT, [(7, "x")])
+        event = DeleteRowsEvent(packet, self._table_map, {})
+        self.assertEqual(list(event.rows()), [{"id":7, "name":"x"}])
+
+    def testUpdateRows(self):
+        packet = self.make_rows(EventType.UPDATE_ROWS_EVENT,
+                                [(1, "a"), (1, "b"), (2, None), (2, "c")])
+        event = UpdateRowsEvent(packet, self._table_map, {})
+        self.assertEqual(list(event.rows()),
+                         [({"id":1, "name":"a"}, {"id":1, "name":"b"}),
+                          ({"id":2, "name":None}, {"id":2, "name":"c"})])
+
+    def testRowsStreamed(self):
+        packet = self.make_rows(EventType.WRITE_ROWS_EVENT, [(1, "a"), (2, "b")])
+        rows = WriteRowsEvent(packet, self._table_map, {}).rows()
+        self.assertEqual(rows.next(), {"id":1, "name":"a"})
+        self.assertEqual(rows.next(), {"id":2, "name":"b"})
+        self.assertRaises(StopIteration, rows.next)
+
+    def testRowsV2(self):
+        # v2 events carry an extra data block after the flags.
+        packet = self.make_rows(EventType.WRITE_ROWS_EVENT_V2, [(1, "a")],
+                                extra='\x04\x00\xff\xff')
+        event = EventMap.get_event_type(EventType.WRITE_ROWS_EVENT_V2)(
+            packet, self._table_map, {})
+        self.assertEqual(list(event.rows()), [{"id":1, "name":"a"}])
+
+    def testUnknownTable(self):
+        packet = self.make_rows(EventType.WRITE_ROWS_EVENT, [(1, "a")], 6)
+        event = WriteRowsEvent(packet, self._table_map, {})
+        self.assertEqual(event.table, None)
+        self.assertEqual(list(event.rows()), [])
+
+
+class TestSourceFilter(unittest.TestCase):
+
+    def setUp(self):
+        self._source = Source()
+        self._conn = FakeConnection([{"COLUMN_NAME":"id",
+                                      "COLUMN_TYPE":"int(11)"}])
+        self._source._schema_cache = SchemaCache(self._conn.query)
+        self._source.add_table("db", "t", ["id"])
+
+    def testUnsubscribedDropped(self):
+        packet = make_table_map(9, "other", "t", [FieldType.LONG], "")
+        self.assertEqual(self._source._make_event(packet), None)
+        rows = make_event(EventType.WRITE_ROWS_EVENT,
+                          struct.pack('<IH', 9, 0) + '\x00\x00\x01\x01')
+        self.assertEqual(self._source._make_event(rows), None)
+        self.assertEqual(self._conn.queries, [])
+
+    def testSubscribedKept(self):
+        packet = make_table_map(9, "db", "t", [FieldType.LONG], "")
+        event = self._source._make_event(packet)
+        self.assertEqual(event.table, "t")
+        self.assertTrue(9 in self._source._table_map)
+        # the table_id is reused by an unsubscribed table.
+        packet = make_table_map(9, "other", "t", [FieldType.LONG], "")
+        self.assertEqual(self._source._make_event(packet), None)
+        self.assertFalse(9 in self._source._table_map)
+
+
+if __name__ == "__main__":
+    unittest.main()
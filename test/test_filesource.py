@@ -0,0 +1,115 @@
+'''
+Tests for reading binlog files from disk.
+'''
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.event import *
+from mysqlsub.filesource import BinlogFileSource, BINLOG_MAGIC
+from mysqlsub.schema import SchemaCache
+from mysqlsub.synthetic import SyntheticTable, BinlogGenerator, schema_cache
+from mysql.connector.constants import FieldType
+from test_event import make_table_map, FakeConnection
+from test_transaction import make_query, make_write_rows, make_xid
+
+
+def write_binlog(path, packets):
+    """
+    Write network packets as a binlog file, dropping their 5 bytes of
+    packet header and OK byte. log_pos is set to the end of the events.
+    """
+    f = open(path, "wb")
+    f.write(BINLOG_MAGIC)
+    for packet in packets:
+        event = packet[EVENT_HEADER_OFFSET:]
+        log_pos = f.tell() + len(event)
+        f.write(event[:13] + struct.pack('<I', log_pos) + event[17:])
+    f.close()
+
+
+class TestBinlogFileSource(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, "mysql-bin.000001")
+        write_binlog(self._path, [
+            make_query("BEGIN"),
+            make_table_map(3, "db", "t", [FieldType.LONG], ""),
+            make_write_rows(3, [1, 2]),
+            make_xid(42, 2000),
+            make_query("BEGIN"),
+            make_table_map(4, "db", "other", [FieldType.LONG], ""),
+            make_write_rows(4, [3]),
+            make_xid(43, 3000)])
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def open_source(self):
+        source = BinlogFileSource(self._path)
+        conn = FakeConnection([{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(11)"}])
+        source._schema_cache = SchemaCache(conn.query)
+        source.add_table("db", "t", ["id"])
+        source.connect()
+        source.binlog_dump()
+        return source
+
+    def testEvents(self):
+        source = self.open_source()
+        events = list(source)
+        self.assertEqual([e.__class__ for e in events],
+                         [QueryEvent, TableMapEvent, WriteRowsEvent, XidEvent,
+                          QueryEvent, XidEvent])
+        self.assertEqual(list(events[2].rows()), [{"id":1}, {"id":2}])
+        self.assertEqual(events[3].xid, 42)
+        self.assertEqual(source.position(),
+                         ("mysql-bin.000001", os.path.getsize(self._path)))
+        source.disconnect()
+
+    def testTransactions(self):
+        source = self.open_source()
+        res = [(t.xid, [row for (_, _, _, row) in t])
+               for t in source.transactions()]
+        self.assertEqual(res, [(42, [{"id":1}, {"id":2}]), (43, [])])
+        source.disconnect()
+
+    def testTruncated(self):
+        f = open(self._path, "r+b")
+        f.truncate(os.path.getsize(self._path) - 3)
+        f.close()
+        source = self.open_source()
+        self.assertEqual(len(list(source)), 5)
+        source.disconnect()
+
+    def testChecksum(self):
+        table = SyntheticTable(3, "db", "t", "ints")
+        generator = BinlogGenerator([table], checksum=True)
+        generator.write(self._path, 3)
+        source = BinlogFileSource(self._path, verify_checksums=True)
+        source._schema_cache = schema_cache([table])
+        source.add_table("db", "t", ["c0"])
+        source.connect()
+        source.binlog_dump()
+        events = list(source)
+        self.assertEqual(events[0].checksum_size, 4)
+        second = events[4].header.log_pos
+        self.assertEqual(len(list(events[3].rows())), 10)
+        # reading from the second transaction still strips the checksums.
+        source.binlog_dump(offset=second)
+        self.assertEqual([e.query for e in source
+                          if isinstance(e, QueryEvent)], ["BEGIN", "BEGIN"])
+        source.disconnect()
+
+    def testBadMagic(self):
+        f = open(self._path, "r+b")
+        f.write("xbin")
+        f.close()
+        self.assertRaises(ValueError, BinlogFileSource(self._path).connect)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+'''
+Tests for heartbeats and stall detection on the dump connection.
+'''
+
+import os
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.constants import EventType
+from mysqlsub.event import *
+from mysqlsub.source import Source
+from mysql.connector import errors
+from test_asyncsource import make_socket, EOF_PACKET
+from test_event import make_event
+from test_transaction import make_query, make_xid
+
+
+def make_heartbeat(log_file="mysql-bin.000001", log_pos=1000):
+    return make_event(EventType.HEARTBEAT_LOG_EVENT, log_file,
+                      timestamp=0, log_pos=log_pos)
+
+
+class StalledSource(Source):
+    """
+    Source whose reconnections are served by a new socket pair.
+    """
+    def __init__(self, streams, **kwargs):
+        super(StalledSource, self).__init__(**kwargs)
+        self.streams = streams
+        self.peers = []
+        self.dumps = []
+        self.connect()
+
+    def connect(self):
+        peer, self._socket = make_socket()
+        self._socket.sock.settimeout(self._stall_timeout)
+        peer.sendall(self.streams.pop(0))
+        self.peers.append(peer)
+
+    def binlog_dump(self, log_file=None, offset=None):
+        self.dumps.append((log_file, offset))
+        self._log_file = log_file
+        self._log_pos = offset
+
+
+class TestHeartbeat(unittest.TestCase):
+
+    def testHeartbeatConsumed(self):
+        source = StalledSource([make_heartbeat() + make_query("BEGIN") +
+                                make_heartbeat() + EOF_PACKET])
+        events = list(source)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].query, "BEGIN")
+        self.assertTrue(source._last_heartbeat is not None)
+
+    def testHeartbeatPeriod(self):
+        self.assertEqual(Source(stall_timeout=3)._heartbeat_period, 1.0)
+        self.assertEqual(Source(heartbeat_period=5)._heartbeat_period, 5)
+        self.assertEqual(Source()._heartbeat_period, None)
+
+    def testStallReconnect(self):
+        first = make_query("BEGIN") + make_xid(1, 200) + make_query("BEGIN")
+        # the partial transaction is sent again by the new dump.
+        second = make_query("BEGIN") + make_xid(2, 300) + EOF_PACKET
+        source = StalledSource([first, second], stall_timeout=0.2)
+        source._resume = ("mysql-bin.000001", 100)
+        source._log_file, source._log_pos = source._resume
+        res = [event.xid for event in source if isinstance(event, XidEvent)]
+        self.assertEqual(res, [1, 2])
+        self.assertEqual(source.dumps, [("mysql-bin.000001", 200)])
+
+    def testNoStallTimeout(self):
+        source = StalledSource([make_query("BEGIN")])
+        source._socket.sock.settimeout(0.1)
+        events = iter(source)
+        events.next()
+        self.assertRaises(errors.InterfaceError, events.next)
+
+
+if __name__ == "__main__":
+    unittest.main()
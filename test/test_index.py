@@ -0,0 +1,105 @@
+'''
+Tests for the sidecar index of binlog files.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.event import *
+from mysqlsub.filesource import BinlogFileSource, BINLOG_MAGIC
+from mysqlsub.index import BinlogIndex, build_index, index_path
+from mysqlsub.synthetic import SyntheticTable, BinlogGenerator
+from mysql.connector.constants import FieldType
+from test_event import make_table_map
+from test_filesource import write_binlog
+from test_transaction import make_query, make_write_rows, make_xid
+
+T0 = 1362100020
+
+
+def make_transaction(timestamp, table_id, table):
+    return [make_query("BEGIN", timestamp=timestamp),
+            make_table_map(table_id, "db", table, [FieldType.LONG], ""),
+            make_write_rows(table_id, [timestamp]),
+            make_xid(timestamp, 1000)]
+
+
+class TestBinlogIndex(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, "mysql-bin.000001")
+        packets = []
+        packets += make_transaction(T0, 1, "a")
+        packets += make_transaction(T0 + 30, 2, "b")
+        packets.append(make_query("CREATE TABLE c (id int)",
+                                  timestamp=T0 + 70))
+        packets += make_transaction(T0 + 130, 1, "a")
+        # clocks may go backwards a little in a binlog.
+        packets += make_transaction(T0 + 125, 2, "b")
+        write_binlog(self._path, packets)
+        self._sizes = [len(p) - EVENT_HEADER_OFFSET for p in packets]
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def offset(self, event):
+        return len(BINLOG_MAGIC) + sum(self._sizes[:event])
+
+    def testBuild(self):
+        index = build_index(self._path)
+        self.assertEqual(index.log_file, "mysql-bin.000001")
+        self.assertEqual(index.buckets, [(1362100020, self.offset(0)),
+                                         (1362100080, self.offset(8)),
+                                         (1362100140, self.offset(9))])
+        self.assertEqual(index.tables, {"db.a":[self.offset(0), self.offset(9)],
+                                        "db.b":[self.offset(4), self.offset(13)]})
+
+    def testChecksum(self):
+        table = SyntheticTable(1, "db", "t", "ints")
+        generator = BinlogGenerator([table], checksum=True, timestamp=T0)
+        events = list(generator.events(3))
+        generator.write(self._path, 3)
+        starts = [len(BINLOG_MAGIC) + sum([len(e) for e in events[:i]])
+                  for i in (1, 5, 9)]
+        index = build_index(self._path)
+        self.assertEqual(index.buckets, [(T0, starts[0])])
+        self.assertEqual(index.tables, {"db.t":starts})
+
+    def testSeek(self):
+        index = build_index(self._path)
+        self.assertEqual(index.seek(), self.offset(0))
+        # the first transaction of the bucket holding the time.
+        self.assertEqual(index.seek(T0 + 50), self.offset(0))
+        self.assertEqual(index.seek(T0 + 100), self.offset(8))
+        self.assertEqual(index.seek(T0 + 130), self.offset(9))
+        self.assertEqual(index.seek(T0 + 1000), None)
+        self.assertEqual(index.seek(T0 + 10, "db", "b"), self.offset(4))
+        self.assertEqual(index.seek(T0 + 100, "db", "b"), self.offset(13))
+        self.assertEqual(index.seek(T0 + 100, "db", "c"), None)
+
+    def testSaveLoad(self):
+        index = build_index(self._path, bucket_seconds=3600)
+        index.save(index_path(self._path))
+        loaded = BinlogIndex.load(index_path(self._path))
+        self.assertEqual(loaded.log_file, index.log_file)
+        self.assertEqual(loaded.bucket_seconds, 3600)
+        self.assertEqual(loaded.buckets, index.buckets)
+        self.assertEqual(loaded.tables, index.tables)
+
+    def testSourceSeek(self):
+        index = build_index(self._path)
+        source = BinlogFileSource(self._path)
+        source.connect()
+        self.assertEqual(source.seek(index, T0 + 100, "db", "b"),
+                         self.offset(13))
+        events = list(source)
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[0].header.timestamp, T0 + 125)
+        source.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+'''
+Tests for the events of several sources read by one loop.
+'''
+
+import os
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.multiplexer import Multiplexer
+from mysqlsub.source import Source
+from test_asyncsource import make_socket, EOF_PACKET
+from test_heartbeat import make_heartbeat
+from test_transaction import make_query
+
+T0 = 1362100000
+
+
+class TestMultiplexer(unittest.TestCase):
+
+    def setUp(self):
+        self._peers = {}
+        self._sources = {}
+        for name in ("a", "b", "c"):
+            source = Source()
+            self._peers[name], source._socket = make_socket()
+            self._sources[name] = source
+
+    def tearDown(self):
+        for peer in self._peers.values():
+            peer.close()
+        for source in self._sources.values():
+            source._socket.close_connection()
+
+    def send(self, name, timestamps, eof=True):
+        data = ''.join([make_query("BEGIN", timestamp=t) for t in timestamps])
+        if eof:
+            data += EOF_PACKET
+        self._peers[name].sendall(data)
+
+    def testInterleaved(self):
+        self.send("a", [T0 + i for i in range(30)])
+        self.send("b", [T0 + i for i in range(20)])
+        self.send("c", [])
+        res = list(Multiplexer(self._sources))
+        self.assertEqual(len(res), 50)
+        for name, count in (("a", 30), ("b", 20)):
+            timestamps = [e.header.timestamp for (n, e) in res if n == name]
+            self.assertEqual(timestamps, [T0 + i for i in range(count)])
+
+    def testUnbuffered(self):
+        sources = dict(self._sources, d=Source(recv_buffer_size=0))
+        self.assertRaises(ValueError, Multiplexer, sources)
+
+    def testWatermark(self):
+        self.send("a", [T0 + 1, T0 + 4, T0 + 3, T0 + 9])
+        self.send("b", [T0 + 2, T0 + 5], eof=False)
+        self.send("c", [T0 + 0, T0 + 6])
+        # long past timestamps, as when catching up.
+        events = Multiplexer(self._sources, watermark=5).events()
+        res = []
+        # b holds back what is after its latest event.
+        for i in range(5):
+            name, event = events.next()
+            res.append((name, event.header.timestamp - T0))
+        self.assertEqual(res, [("c", 0), ("a", 1), ("b", 2), ("a", 4),
+                               ("a", 3)])
+        self.send("b", [T0 + 7])
+        res = [(n, e.header.timestamp - T0) for (n, e) in events]
+        self.assertEqual(res, [("b", 5), ("c", 6), ("b", 7), ("a", 9)])
+
+    def testWatermarkElapsed(self):
+        self.send("a", [T0 + 1, T0 + 30], eof=False)
+        self.send("b", [], eof=False)
+        self.send("c", [])
+        # nothing from b, a is ahead by more than the watermark.
+        events = Multiplexer(self._sources, watermark=5).events()
+        name, event = events.next()
+        self.assertEqual((name, event.header.timestamp), ("a", T0 + 1))
+        # b is idle, it holds nothing back anymore.
+        self._peers["b"].sendall(make_heartbeat())
+        name, event = events.next()
+        self.assertEqual((name, event.header.timestamp), ("a", T0 + 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+'''
+Tests for the buffered packet reader of the dump socket.
+'''
+
+import os
+import socket
+import struct
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysql.connector import errors
+from mysql.connector.network import BaseMySQLSocket
+
+
+def make_packet(payload, pktnr):
+    return struct.pack('<I', len(payload))[0:3] + chr(pktnr) + payload
+
+
+class TestRecvBuffered(unittest.TestCase):
+
+    def setUp(self):
+        self._peer, sock = socket.socketpair()
+        self._socket = BaseMySQLSocket()
+        self._socket.sock = sock
+        self._socket.get_address = lambda: "socketpair"
+
+    def tearDown(self):
+        self._peer.close()
+        self._socket.close_connection()
+
+    def testManyPacketsPerRead(self):
+        self._socket.set_buffered(recvsize=4096, rcvbuf=65536)
+        packets = [make_packet("event%d" % i, i % 256) for i in range(100)]
+        self._peer.sendall("".join(packets))
+        for packet in packets:
+            self.assertEqual(self._socket.recv(), packet)
+        self.assertEqual(self._socket._packet_number, 99)
+
+    def testPacketLargerThanBuffer(self):
+        self._socket.set_buffered(recvsize=16)
+        packets = [make_packet("x" * 1000, 1), make_packet("y" * 3, 2)]
+        data = "".join(packets)
+        # deliver the stream in pieces splitting headers and payloads.
+        for i in range(0, len(data), 7):
+            self._peer.sendall(data[i:i + 7])
+        self.assertEqual(self._socket.recv(), packets[0])
+        self.assertEqual(self._socket.recv(), packets[1])
+
+    def testConnectionLost(self):
+        self._socket.set_buffered(recvsize=64)
+        self._peer.sendall(make_packet("abc", 0)[0:5])
+        self._peer.close()
+        self.assertRaises(errors.InterfaceError, self._socket.recv)
+
+
+if __name__ == "__main__":
+    unittest.main()
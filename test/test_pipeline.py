@@ -0,0 +1,197 @@
+'''
+Tests for the pipelined decoding of the stream.
+'''
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.event import *
+from mysqlsub.filesource import BinlogFileSource
+from mysqlsub.schema import SchemaCache
+from mysqlsub import source as source_module
+from mysqlsub.source import Source
+from mysqlsub.synthetic import SyntheticTable, BinlogGenerator
+from mysql.connector import errors
+from mysql.connector.constants import FieldType
+from fake_master import FakeMaster
+from test_event import make_table_map, FakeConnection
+from test_filesource import write_binlog
+from test_transaction import make_query, make_write_rows, make_xid, FakeSocket
+
+
+def make_packets():
+    packets = []
+    for i in range(50):
+        packets += [make_query("BEGIN"),
+                    make_table_map(3, "db", "t", [FieldType.LONG], ""),
+                    make_write_rows(3, range(i, i + 1 + i % 7)),
+                    make_table_map(4, "db", "u", [FieldType.LONG], ""),
+                    make_write_rows(4, [i]),
+                    make_xid(i, 1000)]
+    return packets
+
+
+class TestPipelined(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, "mysql-bin.000001")
+        write_binlog(self._path, make_packets())
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def subscribe(self, source):
+        conn = FakeConnection([{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(11)"}])
+        source._schema_cache = SchemaCache(conn.query)
+        source.add_table("db", "t", ["id"])
+        return source
+
+    def summary(self, events):
+        res = []
+        for event in events:
+            if isinstance(event, RowsEvent):
+                res.append((event.header.log_pos, list(event.rows())))
+            else:
+                res.append((event.header.log_pos, event.__class__))
+        return res
+
+    def testFileSource(self):
+        source = self.subscribe(BinlogFileSource(self._path))
+        source.connect()
+        expected = self.summary(source)
+        source.binlog_dump()
+        res = self.summary(source.pipelined(processes=2, min_size=0, depth=8))
+        source.disconnect()
+        self.assertEqual(res, expected)
+        self.assertEqual(len([r for r in res if isinstance(r[1], list)]), 50)
+
+    def testNetworkSource(self):
+        source = self.subscribe(Source())
+        source._socket = FakeSocket(make_packets())
+        expected = self.summary(source)
+        source._socket = FakeSocket(make_packets())
+        res = self.summary(source.pipelined(processes=2, min_size=0))
+        self.assertEqual(res, expected)
+
+    def testWorkerTables(self):
+        source = self.subscribe(Source())
+        source._socket = FakeSocket(make_packets()[:3])
+        event = [e for e in source if isinstance(e, RowsEvent)][0]
+        expected = list(event.rows())
+        table = dict(source._table_map[3])
+        del table["decoders"]
+        key = source_module._table_key(3, table)
+        packet = make_packets()[2]
+        source_module._worker_tables.clear()
+        # the key alone is not enough until the entry came once.
+        task = (packet, EVENT_HEADER_OFFSET, 0, key, None)
+        self.assertEqual(source_module._decode_rows(task), None)
+        rows = source_module._decode_rows(task[:4] + (table,))
+        self.assertEqual(rows, expected)
+        decoders = source_module._worker_tables[key]["decoders"]
+        self.assertEqual(source_module._decode_rows(task), rows)
+        # the decoder compiled for the first task is reused.
+        self.assertTrue(source_module._worker_tables[key]["decoders"]
+                        is decoders)
+        self.assertEqual(len(decoders), 1)
+        decoder = decoders.values()[0]
+        source_module._decode_rows(task)
+        self.assertTrue(decoders.values()[0] is decoder)
+
+    def testStall(self):
+        table = SyntheticTable(3, "db", "t", "mixed")
+        events = list(BinlogGenerator([table], checksum=True).events(20))
+        res = []
+        # the first dump stalls in the third transaction.
+        for stall_after in (None, 1 + 2 * 4 + 2):
+            master = FakeMaster(binlog_checksum="CRC32",
+                                stall_after=stall_after)
+            master.add_events("mysql-bin.000001", events)
+            master.add_table("db", "t", table.columns())
+            master.start()
+            source = Source(stall_timeout=0.3, verify_checksums=True,
+                            **master.conf())
+            source.add_table("db", "t", ["c0", "c1", "c5"])
+            try:
+                source.connect()
+                source.binlog_dump("mysql-bin.000001", 4)
+                # a new dump starts with a rotate and format description.
+                res.append([e for e in self.summary(
+                    self.slow(source.pipelined(processes=2, min_size=0)))
+                            if e[1] not in (RotateEvent,
+                                            FormatDescriptionEvent)])
+                self.assertEqual(source.position(),
+                                 ("mysql-bin.000001",
+                                  len(master.binlogs[0][1])))
+            finally:
+                source.disconnect()
+                master.stop()
+        self.assertEqual(res[1], res[0])
+        self.assertEqual(len([e for e in res[0] if e[1] is XidEvent]), 20)
+        # again from the end of the second transaction.
+        self.assertEqual(master.dumps, [("mysql-bin.000001", 4),
+                                        ("mysql-bin.000001",
+                                         4 + sum(map(len, events[:9])))])
+
+    def testStopEarly(self):
+        table = SyntheticTable(3, "db", "t", "mixed")
+        events = list(BinlogGenerator([table]).events(5))
+        # kept open after the events, the reader blocks receiving.
+        master = FakeMaster(eof=False)
+        master.add_events("mysql-bin.000001", events)
+        master.add_table("db", "t", table.columns())
+        master.start()
+        try:
+            for stall_timeout in (None, 3):
+                source = Source(stall_timeout=stall_timeout,
+                                **master.conf())
+                source.connect()
+                source.binlog_dump("mysql-bin.000001", 4)
+                xids = []
+                for event in source.pipelined(processes=1):
+                    if isinstance(event, XidEvent):
+                        xids.append(event.xid)
+                        if event.xid == 2:
+                            break
+                # the reader is gone, the master threads are subclasses.
+                self.assertEqual([t for t in threading.enumerate()
+                                  if type(t) is threading.Thread], [])
+                if stall_timeout is None:
+                    # the packets taken by the reader are not lost silently.
+                    self.assertRaises(errors.InterfaceError, source.next)
+                else:
+                    # dumped again after the last transaction done with,
+                    # the consumer did not ask for the event after xid 2.
+                    while xids[-1] != 5:
+                        event = source.next()
+                        if isinstance(event, XidEvent):
+                            xids.append(event.xid)
+                    self.assertEqual(xids, [1, 2, 2, 3, 4, 5])
+                source.disconnect()
+        finally:
+            master.stop()
+        self.assertEqual(master.dumps[-1],
+                         ("mysql-bin.000001", 4 + sum(map(len, events[:5]))))
+
+    def slow(self, events):
+        # the stall is queued behind the events received before it.
+        yield events.next()
+        time.sleep(1.0)
+        for event in events:
+            yield event
+
+    def testReaderError(self):
+        source = self.subscribe(Source())
+        source._socket = FakeSocket(make_packets()[:6])
+        source._socket.packets[-1] = None
+        events = source.pipelined(processes=1)
+        self.assertRaises(TypeError, list, events)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+'''
+Tests for the parallel scan of binlog files.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.index import build_index, index_path
+from mysqlsub.scanner import expand_files, scan, _chunks
+from test_filesource import write_binlog
+from test_index import make_transaction
+
+T0 = 1362100020
+
+
+class TestScanner(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        for n in (1, 2):
+            packets = []
+            for i in range(10):
+                packets += make_transaction(T0 + (n * 10 + i) * 60, 1, "a")
+            write_binlog(os.path.join(self._dir, "mysql-bin.00000%d" % n),
+                         packets)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def testExpandFiles(self):
+        self.assertEqual(expand_files("mysql-bin.000099..000101"),
+                         ["mysql-bin.000099", "mysql-bin.000100",
+                          "mysql-bin.000101"])
+        self.assertEqual(expand_files("mysql-bin.000001..mysql-bin.000002",
+                                      "/data"),
+                         ["/data/mysql-bin.000001", "/data/mysql-bin.000002"])
+        self.assertEqual(expand_files(["a", "b"]), ["a", "b"])
+
+    def testOrdered(self):
+        path = os.path.join(self._dir, "mysql-bin.000001")
+        build_index(path).save(index_path(path))
+        res = list(scan("mysql-bin.000001..000002", processes=3,
+                        chunk_size=200, directory=self._dir))
+        self.assertEqual(len(res), 20)
+        # rows hold the timestamp of their transaction.
+        values = [rows[0][3][0] for (_, _, _, rows) in res]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), 20)
+        self.assertEqual(res[0][0], "mysql-bin.000001")
+        self.assertEqual(res[-1][0], "mysql-bin.000002")
+
+    def testChunksWithoutIndex(self):
+        path = os.path.join(self._dir, "mysql-bin.000001")
+        chunks = _chunks(path, 200)
+        self.assertTrue(len(chunks) > 2)
+        self.assertEqual(chunks[-1][2], None)
+        # cut after commits, every chunk starts where the last ended.
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous[2], chunk[1])
+        res = list(scan(["mysql-bin.000001"], processes=2, chunk_size=200,
+                        directory=self._dir))
+        values = [rows[0][3][0] for (_, _, _, rows) in res]
+        self.assertEqual(len(values), 10)
+        self.assertEqual(values, sorted(set(values)))
+
+    def testWindow(self):
+        # more chunks than the window, still handed back in order.
+        res = list(scan("mysql-bin.000001..000002", processes=1,
+                        chunk_size=100, directory=self._dir))
+        windowed = list(scan("mysql-bin.000001..000002", processes=2,
+                             chunk_size=100, directory=self._dir))
+        self.assertEqual(windowed, res)
+        self.assertEqual(len(res), 20)
+
+    def testSingleProcess(self):
+        res = list(scan(["mysql-bin.000002"], processes=1,
+                        directory=self._dir))
+        self.assertEqual(len(res), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
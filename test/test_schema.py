@@ -0,0 +1,42 @@
+'''
+Tests for DDL detection of the schema cache.
+'''
+
+import os
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.schema import ddl_tables
+
+
+class TestDdlTables(unittest.TestCase):
+
+    def testAlter(self):
+        self.assertEqual(ddl_tables("db", "ALTER TABLE t ADD COLUMN c INT"),
+                         [("db", "t")])
+        self.assertEqual(ddl_tables("db", "/* x */ alter ignore table "
+                                          "`FC_Word`.`wordinfo0` drop c"),
+                         [("FC_Word", "wordinfo0")])
+
+    def testCreateDrop(self):
+        self.assertEqual(ddl_tables("db", "CREATE TABLE IF NOT EXISTS "
+                                          "t2 (id INT)"),
+                         [("db", "t2")])
+        self.assertEqual(ddl_tables("db", "DROP TABLE IF EXISTS a, o.b"),
+                         [("db", "a"), ("o", "b")])
+
+    def testRename(self):
+        self.assertEqual(ddl_tables("db", "RENAME TABLE a TO b, x.c TO d"),
+                         [("db", "a"), ("db", "b"), ("x", "c"), ("db", "d")])
+
+    def testDatabase(self):
+        self.assertEqual(ddl_tables("db", "DROP DATABASE IF EXISTS old"),
+                         [("old", None)])
+
+    def testNotDdl(self):
+        self.assertEqual(ddl_tables("db", "BEGIN"), [])
+        self.assertEqual(ddl_tables("db", "INSERT INTO t VALUES (1)"), [])
+        self.assertEqual(ddl_tables("db", "TRUNCATE TABLE t"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
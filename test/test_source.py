@@ -1,112 +1,157 @@
-'''
-Created on 2013-2-27
-
-@author: yelu01
-'''
-
-import os
-import time
-os.sys.path.append("/home/yelu/mycode/mysqlsub/")
-import unittest
-from mysqlsub import source
-from mysqlsub.constants import EventType
-from mysqlsub.event import *
-
-'''
-class TestSource(unittest.TestCase):
-    def setUp(self):
-        self._source = source.Source(host = "10.48.78.23",
-                        port = 5858,
-                        user = "yelu",
-                        password = "yelu123456")
-        pass
-
-    def tearDown(self):
-        self._source.disconnect()
-        pass
-
-    def testName(self):
-        self._source.connect()
-        self._source.show_master_status()
-        pass
-
-
-class TestBinlogdump(unittest.TestCase):
-
-    def setUp(self):
-        self._source = source.Source(host = "10.48.78.23",
-                        port = 5858,
-                        user = "yelu",
-                        password = "yelu123456")
-
-    def tearDown(self):
-        self._source.disconnect()
-
-    def testName(self):
-        self._source.connect()
-        self._source.binlog_dump("mysql-bin.000299", 386074393)
-
-      
-
-class TestIter(unittest.TestCase):
-
-    def setUp(self):
-        self._source = source.Source(host = "10.48.78.23",
-                        port = 5858,
-                        user = "yelu",
-                        password = "yelu123456")
-        self._source.connect()
-        self._source.binlog_dump("mysql-bin.000299", 406207379)
-
-    def tearDown(self):
-        self._source.disconnect()
-
-    def testName(self):
-        for i in self._source:
-            #time.sleep(1)
-            pass
-
-'''
-class Test_get_columns_map(unittest.TestCase):
-
-    def setUp(self):
-        self._source = source.Source(host = "10.48.78.23",
-                        port = 5858,
-                        user = "yelu",
-                        password = "yelu123456")
-        self._source.connect()
-        self._source.add_table("FC_Word", "wordinfo0", ["userid", "winfoid"])
-        self._source.add_table("FC_Word", "unitinfo0", ["userid", "unitid"])
-        
-    def tearDown(self):
-        self._source.disconnect()
-
-    def testName(self):
-        self._source.get_columns_info()
-
-
-'''                 
-class Test_table_map_event(unittest.TestCase):
-
-    def setUp(self):
-        self._source = source.Source(host = "10.48.78.23",
-                        port = 5858,
-                        user = "yelu",
-                        password = "yelu123456")
-        self._source.connect()
-        self._source.binlog_dump("mysql-bin.000400", 4)
-        self._source._query("select * from FC_Word.wordinfo0 limit 0;")
-        
-    def tearDown(self):
-        self._source.disconnect()
-
-    def testName(self):
-        for i in self._source:
-            time.sleep(1)
-            pass        
-'''
-    
-
-if __name__ == "__main__":
-    #import sys;sys.argv = ['', 'Test.testName']
-    unittest.main()
+'''
+Tests for Source against the fake master, over a real connection.
+'''
+
+import os
+import struct
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.constants import EventType
+from mysqlsub.event import *
+from mysqlsub.source import Source
+from mysqlsub.synthetic import SyntheticTable, BinlogGenerator
+from mysql.connector import errors
+from fake_master import FakeMaster
+
+
+class TestSource(unittest.TestCase):
+
+    def setUp(self):
+        self.table = SyntheticTable(3, "db", "t", "mixed")
+        self.generator = BinlogGenerator([self.table], rows_per_event=4)
+        self.master = FakeMaster(user="yelu", password="yelu123456")
+        self.master.add_events("mysql-bin.000001", self.generator.events(5))
+        self.master.add_table("db", "t", self.table.columns())
+        self.master.start()
+        self.source = Source(**self.master.conf())
+
+    def tearDown(self):
+        if self.source._conn is not None:
+            self.source.disconnect()
+        self.master.stop()
+
+    def testShowMasterStatus(self):
+        self.source.connect()
+        status = self.source.show_master_status()
+        self.assertEqual(status["File"], "mysql-bin.000001")
+        self.assertEqual(status["Position"],
+                         len(self.master.binlogs[0][1]))
+
+    def testColumns(self):
+        self.source.connect()
+        self.source.add_table("db", "t", ["c0", "c2"])
+        self.source.get_full_columns()
+        info = self.source._tables["db"]["t"]["columns_info"]
+        self.assertEqual(sorted([c["name"] for c in info.values()]),
+                         ["c0", "c2"])
+        self.assertEqual(info[0]["type"], "int(11)")
+
+    def testAccessDenied(self):
+        source = Source(host=self.master.host, port=self.master.port,
+                        user="yelu", password="wrong")
+        self.assertRaises(errors.Error, source.connect)
+
+    def testDump(self):
+        self.source.add_table("db", "t", ["c0", "c1"])
+        self.source.connect()
+        self.source.binlog_dump("mysql-bin.000001", 4)
+        rows = []
+        xids = []
+        for event in self.source:
+            if isinstance(event, RowsEvent):
+                rows += list(event.rows())
+            elif isinstance(event, XidEvent):
+                xids.append(event.xid)
+        self.assertEqual(xids, [1, 2, 3, 4, 5])
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(sorted(rows[0].keys()), ["c0", "c1"])
+        self.assertEqual(self.source.position(),
+                         ("mysql-bin.000001", len(self.master.binlogs[0][1])))
+        self.assertEqual(self.master.dumps, [("mysql-bin.000001", 4)])
+
+    def testDumpFromMasterStatus(self):
+        self.source.connect()
+        self.source.binlog_dump()
+        # only the format description, sent first.
+        self.assertEqual([e.__class__ for e in self.source],
+                         [FormatDescriptionEvent])
+
+    def testRotate(self):
+        self.master.add_events("mysql-bin.000002",
+                               BinlogGenerator([self.table], seed=1).events(2))
+        self.source.connect()
+        self.source.binlog_dump("mysql-bin.000001", 4)
+        rotates = [e.next_log_file for e in self.source
+                   if isinstance(e, RotateEvent)]
+        self.assertEqual(rotates, ["mysql-bin.000002"])
+        self.assertEqual(self.source.position(),
+                         ("mysql-bin.000002", len(self.master.binlogs[1][1])))
+
+    def testChecksum(self):
+        master = FakeMaster(binlog_checksum="CRC32")
+        generator = BinlogGenerator([self.table], checksum=True)
+        master.add_events("mysql-bin.000001", generator.events(3))
+        master.start()
+        try:
+            self.assertRaises(errors.Error, self.dump, master, None)
+            source = self.dump(master, verify_checksums=True)
+            xids = [e.xid for e in source if isinstance(e, XidEvent)]
+            self.assertEqual(xids, [1, 2, 3])
+            self.assertEqual(source._checksummed, 3 * 4)
+            source.disconnect()
+        finally:
+            master.stop()
+
+    def testChecksumMismatch(self):
+        master = FakeMaster(binlog_checksum="CRC32")
+        generator = BinlogGenerator([self.table], checksum=True)
+        data = ''.join(generator.events(3))
+        # a byte of the second xid.
+        i = data.index(struct.pack('<Q', 2))
+        master.add_events("mysql-bin.000001",
+                          [data[:i] + '\x03' + data[i + 1:]])
+        master.start()
+        try:
+            source = self.dump(master, verify_checksums=1)
+            self.assertRaises(ValueError, list, source)
+            source.disconnect()
+            source = self.dump(master, verify_checksums=0)
+            xids = [e.xid for e in source if isinstance(e, XidEvent)]
+            self.assertEqual(xids, [1, 3, 3])
+            source.disconnect()
+        finally:
+            master.stop()
+
+    def dump(self, master, announce=True, **kwargs):
+        source = Source(**dict(master.conf(), **kwargs))
+        source.connect()
+        if not announce:
+            # a client unaware of checksums.
+            source._conn.query = lambda sql: ([], None)
+        source.binlog_dump("mysql-bin.000001", 4)
+        return source
+
+    def testUnknownLogFile(self):
+        self.source.connect()
+        self.assertRaises(errors.Error, self.source.binlog_dump,
+                          "mysql-bin.000009", 4)
+
+    def testHeartbeat(self):
+        self.master.eof = False
+        source = Source(heartbeat_period=0.05, **self.master.conf())
+        source.connect()
+        source.binlog_dump("mysql-bin.000001", 4)
+        try:
+            for i in range(1 + 5 * 4):
+                source.next()
+            packet, offset = source._read_event()
+            self.assertEqual(EventHeader(packet, offset).event_type,
+                             EventType.HEARTBEAT_LOG_EVENT)
+        finally:
+            source.disconnect()
+        self.assertTrue("SET @master_heartbeat_period = 50000000" in
+                        self.master.queries)
+
+
+if __name__ == "__main__":
+    unittest.main()
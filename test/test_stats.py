@@ -0,0 +1,109 @@
+'''
+Tests for the statistics of a source.
+'''
+
+import os
+import time
+import unittest
+import urllib2
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.schema import SchemaCache
+from mysqlsub.source import Source
+from mysqlsub.stats import Stats
+from mysql.connector.constants import FieldType
+from test_event import make_table_map, FakeConnection
+from test_transaction import make_query, make_write_rows, make_xid, FakeSocket
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        self._source = Source(stats=True)
+        conn = FakeConnection([{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(11)"}])
+        self._source._schema_cache = SchemaCache(conn.query)
+        self._source.add_table("db", "t", ["id"])
+        self._packets = [make_query("BEGIN"),
+                         make_table_map(3, "db", "t", [FieldType.LONG], ""),
+                         make_write_rows(3, [1, 2, 3]),
+                         make_table_map(4, "db", "u", [FieldType.LONG], ""),
+                         make_write_rows(4, [1]),
+                         make_xid(1, 1000)]
+        self._source._socket = FakeSocket(self._packets)
+
+    def testSnapshot(self):
+        for event in self._source:
+            if hasattr(event, "rows"):
+                list(event.rows())
+        stats = self._source.stats()
+        # behind by the age of the header timestamp of the last event.
+        self.assertTrue(abs(stats["lag"] - (time.time() - 1362100000)) < 60)
+        self.assertTrue(stats["since_last_event"] < 60)
+        types = stats["event_types"]
+        self.assertEqual(types["WRITE_ROWS_EVENT"]["events"], 2)
+        self.assertEqual(types["WRITE_ROWS_EVENT"]["bytes"],
+                         len(self._packets[2]) + len(self._packets[4]) - 10)
+        self.assertEqual(types["XID_EVENT"]["events"], 1)
+        self.assertTrue(types["XID_EVENT"]["events_per_sec"] > 0)
+        # one observation per decoded event, header, body and rows, the
+        # event of db.u being dropped.
+        decoded = sum([n for (_, n) in
+                       types["WRITE_ROWS_EVENT"]["decode_buckets"]])
+        self.assertEqual(decoded, 1)
+        self.assertTrue(types["WRITE_ROWS_EVENT"]["decode_seconds"] > 0)
+        self.assertEqual(sum([n for (_, n) in
+                              types["TABLE_MAP_EVENT"]["decode_buckets"]]), 1)
+        self.assertEqual(stats["tables"].keys(), ["db.t"])
+        self.assertEqual(stats["tables"]["db.t"]["events"], 2)
+
+    def testRowsStreamed(self):
+        event = [e for e in self._source if hasattr(e, "rows")][0]
+        rows = event.rows()
+        self.assertEqual(rows.next(), {"id":1})
+
+        def observed():
+            types = self._source.stats()["event_types"]
+            return sum([n for (_, n) in
+                        types["WRITE_ROWS_EVENT"]["decode_buckets"]])
+        # observed once the last row is decoded.
+        self.assertEqual(observed(), 0)
+        self.assertEqual(len(list(rows)), 2)
+        self.assertEqual(observed(), 1)
+
+    def testDisabled(self):
+        source = Source()
+        source._socket = FakeSocket(self._packets)
+        self.assertEqual(len(list(source)), 6)
+        self.assertEqual(source.stats(), None)
+        self.assertRaises(ValueError, source.serve_stats, 0)
+
+    def testPrometheus(self):
+        for event in self._source:
+            event.decode()
+        server = self._source.serve_stats(0)
+        try:
+            text = urllib2.urlopen("http://127.0.0.1:%d/metrics" %
+                                   server.port).read()
+        finally:
+            server.stop()
+        lines = text.splitlines()
+        self.assertTrue('mysqlsub_events_total{type="QUERY_EVENT"} 1.0' in lines)
+        self.assertTrue('mysqlsub_table_events_total{table="db.t"} 2.0' in lines)
+        self.assertTrue('mysqlsub_decode_seconds_count{type="XID_EVENT"} 1'
+                        in lines)
+        self.assertTrue('mysqlsub_decode_seconds_bucket{type="XID_EVENT",'
+                        'le="+Inf"} 1' in lines)
+        self.assertTrue("# TYPE mysqlsub_lag_seconds gauge" in lines)
+
+    def testRates(self):
+        stats = Stats(window=10)
+        stats.record(1, None, 100, 0)
+        stats.record(1, None, 100, 0)
+        # totals as sampled 10 seconds ago.
+        stats._samples[0] = (time.time() - 10, {1:0}, {1:0}, {}, {})
+        snapshot = stats.snapshot()["event_types"]["START_EVENT_V3"]
+        self.assertTrue(0.15 < snapshot["events_per_sec"] < 0.25)
+        self.assertTrue(15 < snapshot["bytes_per_sec"] < 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
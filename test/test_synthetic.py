@@ -0,0 +1,177 @@
+'''
+Tests for the synthetic binlog generator.
+'''
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import datetime
+import decimal
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub import utils
+from mysqlsub.constants import EventType, ColumnType
+from mysqlsub.decoder import RowDecoder
+from mysqlsub.event import *
+from mysqlsub.filesource import BinlogFileSource
+from mysqlsub.source import Source
+from mysqlsub.synthetic import *
+from test_transaction import FakeSocket
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self.tables = [SyntheticTable(3, "db", "t", "mixed"),
+                       SyntheticTable(4, "db", "u", "strings",
+                                      string_length=300),
+                       SyntheticTable(5, "db", "v", "temporal")]
+        self.generator = BinlogGenerator(
+            self.tables, rows_per_event=5, events_per_transaction=2,
+            null_density=0.3, seed=7,
+            rows_event_types=(EventType.WRITE_ROWS_EVENT,
+                              EventType.UPDATE_ROWS_EVENT_V2,
+                              EventType.DELETE_ROWS_EVENT))
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def subscribe(self, source):
+        source._schema_cache = schema_cache(self.tables)
+        for table in self.tables:
+            source.add_table(table.schema, table.table,
+                             [c["COLUMN_NAME"] for c in table.columns()])
+        return source
+
+    def check(self, source):
+        rows = 0
+        xids = []
+        for event in source:
+            if isinstance(event, RowsEvent):
+                for row in event.rows():
+                    if isinstance(event, UpdateRowsEvent):
+                        row = row[1]
+                    self.assertEqual(len(row), len(self.tables[
+                        event.table_id - 3].kinds))
+                    rows += 1
+            elif isinstance(event, XidEvent):
+                xids.append(event.xid)
+        self.assertEqual(rows, 10 * 2 * 5)
+        self.assertEqual(xids, range(1, 11))
+
+    def testDecimal(self):
+        for precision, scale, value in ((10, 2, "-12345678.90"),
+                                        (14, 4, "1234567890.1234"),
+                                        (20, 10, "-0.0000000001"),
+                                        (5, 0, "99999"),
+                                        (19, 9, "123456789.987654321"),
+                                        (65, 30, "-" + "9" * 35 + "." +
+                                         "1" * 30),
+                                        (16, 6, "-0.000001"),
+                                        (16, 6, "0.000000"),
+                                        (7, 7, "-0.9999999")):
+            scaled = int(value.replace(".", ""))
+            raw = pack_new_decimal(scaled, precision, scale)
+            reader = utils.BufferReader(raw)
+            result = utils.read_new_decimal(reader, precision, scale)
+            self.assertEqual(result, decimal.Decimal(value))
+            self.assertEqual(result.as_tuple(),
+                             decimal.Decimal(value).as_tuple())
+            self.assertEqual(reader.remaining(), 0)
+            convert = utils.new_decimal_converter(precision, scale, "int")
+            self.assertEqual(convert(raw), scaled)
+            convert = utils.new_decimal_converter(precision, scale, "float")
+            self.assertAlmostEqual(convert(raw), float(value))
+        self.assertRaises(ValueError, utils.new_decimal_converter, 10, 2,
+                          "str")
+
+    def testTemporal(self):
+        def decode(real_type, fsp, raw):
+            decoder = RowDecoder([{"REAL_TYPE":real_type, "FSP":fsp,
+                                   "IS_UNSIGNED":False}])
+            reader = utils.BufferReader('\x00' + raw)
+            row = decoder.decode(reader)
+            self.assertEqual(reader.remaining(), 0)
+            return row[0]
+
+        for fsp in range(7):
+            usec = 123456 - 123456 % 10 ** (6 - fsp)
+            value = datetime.datetime(2013, 3, 1, 23, 59, 58, usec)
+            self.assertEqual(decode(ColumnType.DATETIME2, fsp,
+                                    pack_datetime2(value, fsp)), value)
+            self.assertEqual(decode(ColumnType.TIMESTAMP2, fsp,
+                                    pack_timestamp2(1362100000, usec, fsp)),
+                             datetime.datetime.fromtimestamp(1362100000)
+                             .replace(microsecond=usec))
+            for seconds in (0, 1, -1, 838 * 3600 + 59 * 60 + 59, -3723):
+                for micros in (0, usec):
+                    value = datetime.timedelta(0, seconds, micros)
+                    if seconds < 0:
+                        value = -datetime.timedelta(0, -seconds, micros)
+                    self.assertEqual(decode(ColumnType.TIME2, fsp,
+                                            pack_time2(value, fsp)), value)
+
+    def testStream(self):
+        source = self.subscribe(Source())
+        source._socket = FakeSocket(self.generator.packets(10))
+        self.check(source)
+
+    def testDecimalMode(self):
+        # two tables with a DECIMAL c5, the second one overriding the mode.
+        self.tables[1:] = [SyntheticTable(6, "db", "w", "mixed")]
+        generator = BinlogGenerator(self.tables, rows_per_event=5,
+                                    events_per_transaction=2, seed=7)
+        source = self.subscribe(Source(decimal_mode="int"))
+        source.add_table("db", "w", ["c5"], decimal_mode="float")
+        source._socket = FakeSocket(generator.packets(10))
+        modes = {3:set(), 6:set()}
+        for event in source:
+            if isinstance(event, RowsEvent):
+                for row in event.rows():
+                    modes[event.table_id].add(type(row["c5"]))
+        self.assertTrue(modes[3])
+        self.assertTrue(modes[3] <= set([int, long]))
+        self.assertEqual(modes[6], set([float]))
+        self.assertEqual(source._tables["db"]["w"]["decimal_mode"], "float")
+        self.assertRaises(ValueError, Source, decimal_mode="str")
+
+    def testSourceDecimalMode(self):
+        # no subscription, every table in the mode of the source.
+        source = Source(decimal_mode="float")
+        source._schema_cache = schema_cache(self.tables)
+        source._socket = FakeSocket(self.generator.packets(10))
+        values = set()
+        for event in source:
+            if isinstance(event, RowsEvent) and event.table_id == 3:
+                for row in event.rows():
+                    if isinstance(event, UpdateRowsEvent):
+                        row = row[1]
+                    values.add(type(row[5]))
+        self.assertEqual(values - set([type(None)]), set([float]))
+
+    def testFile(self):
+        path = os.path.join(self._dir, "mysql-bin.000001")
+        size = self.generator.write(path, 10)
+        self.assertEqual(size, os.path.getsize(path))
+        source = self.subscribe(BinlogFileSource(path))
+        source.connect()
+        source.binlog_dump()
+        self.check(source)
+        self.assertEqual(source.position(), ("mysql-bin.000001", size))
+        source.disconnect()
+
+    def testSeed(self):
+        self.assertEqual(list(self.generator.events(3)),
+                         list(self.generator.events(3)))
+
+    def testNulls(self):
+        table = self.tables[0]
+        rng = random.Random(1)
+        self.assertEqual(len(table.row(rng, 1.0)), 2)
+        self.assertTrue(len(table.row(rng, 0.0)) > 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+'''
+Tests for the logging of mysqlsub.
+'''
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import StringIO
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.tools import log, logger, setup_logging
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class Costly(object):
+    formatted = 0
+
+    def __str__(self):
+        Costly.formatted += 1
+        return "costly"
+
+
+class TestLogging(unittest.TestCase):
+
+    def tearDown(self):
+        for hdlr in logger.handlers[1:]:
+            logger.removeHandler(hdlr)
+        logger.setLevel(logging.NOTSET)
+        Costly.formatted = 0
+
+    def testImport(self):
+        # importing leaves the directory and the root logger alone.
+        cwd = tempfile.mkdtemp()
+        try:
+            script = ("import logging, sys; sys.path.insert(0, %r);"
+                      "import mysqlsub.source;"
+                      "print len(logging.getLogger().handlers),"
+                      "logging.getLogger().level" % ROOT)
+            out = subprocess.check_output([sys.executable, "-c", script],
+                                          cwd=cwd)
+            self.assertEqual(out.split(), ["0", str(logging.WARNING)])
+            self.assertEqual(os.listdir(cwd), [])
+        finally:
+            shutil.rmtree(cwd)
+
+    def testDisabled(self):
+        logger.setLevel(logging.INFO)
+        self.assertFalse(log.enabled())
+        log.debug("value %s", Costly())
+        self.assertEqual(Costly.formatted, 0)
+
+    def testSetup(self):
+        stream = StringIO.StringIO()
+        setup_logging(logging.DEBUG, stream)
+        self.assertTrue(log.enabled())
+        log.debug("value %s", Costly())
+        self.assertEqual(Costly.formatted, 1)
+        self.assertTrue(stream.getvalue().startswith("DEBUG: "))
+        self.assertTrue(stream.getvalue().endswith("value costly\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
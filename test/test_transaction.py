@@ -0,0 +1,115 @@
+'''
+Tests for transaction assembly, memory bounded and spilled to disk.
+'''
+
+import os
+import struct
+import unittest
+os.sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from mysqlsub.constants import EventType
+from mysqlsub.event import *
+from mysqlsub.schema import SchemaCache
+from mysqlsub.source import Source
+from mysqlsub.transaction import Transaction
+from mysql.connector.constants import FieldType
+from test_event import make_event, make_table_map, FakeConnection
+
+
+def make_query(query, log_pos=1000, timestamp=1362100000):
+    body = struct.pack('<IIBHH', 7, 0, 2, 0, 0) + 'db\x00' + query
+    return make_event(EventType.QUERY_EVENT, body, timestamp, log_pos)
+
+
+def make_write_rows(table_id, ids):
+    body = struct.pack('<IH', table_id, 0) + '\x00\x00' + '\x01\x01'
+    for id in ids:
+        body += '\x00' + struct.pack('<i', id)
+    return make_event(EventType.WRITE_ROWS_EVENT, body)
+
+
+def make_xid(xid, log_pos):
+    return make_event(EventType.XID_EVENT, struct.pack('<Q', xid),
+                      log_pos=log_pos)
+
+
+class FakeSocket(object):
+
+    def __init__(self, packets):
+        self.packets = list(packets) + ['\x01\x00\x00\x09\xfe']
+
+    def recv(self):
+        return self.packets.pop(0)
+
+
+class TestTransaction(unittest.TestCase):
+
+    def setUp(self):
+        self._source = Source(transaction_memory_limit=1000)
+        conn = FakeConnection([{"COLUMN_NAME":"id", "COLUMN_TYPE":"int(11)"}])
+        self._source._schema_cache = SchemaCache(conn.query)
+        self._source.add_table("db", "t", ["id"])
+
+    def run_source(self, packets):
+        self._source._socket = FakeSocket(packets)
+        res = []
+        for trans in self._source.transactions():
+            res.append((trans.log_pos, trans.xid, trans.spilled, list(trans)))
+        return res
+
+    def testSmallTransaction(self):
+        res = self.run_source([
+            make_query("BEGIN"),
+            make_table_map(3, "db", "t", [FieldType.LONG], ""),
+            make_write_rows(3, [1, 2]),
+            make_xid(42, 2000)])
+        write = EventType.WRITE_ROWS_EVENT
+        self.assertEqual(res, [(2000, 42, False,
+                                [(write, "db", "t", {"id":1}),
+                                 (write, "db", "t", {"id":2})])])
+
+    def testSpilledTransaction(self):
+        packets = [make_query("BEGIN"),
+                   make_table_map(3, "db", "t", [FieldType.LONG], "")]
+        for i in range(20):
+            packets.append(make_write_rows(3, range(i * 10, i * 10 + 10)))
+        packets.append(make_query("COMMIT", log_pos=3000))
+        packets.append(make_query("BEGIN"))
+        packets.append(make_xid(43, 4000))
+        res = self.run_source(packets)
+        self.assertEqual(len(res), 2)
+        log_pos, xid, spilled, rows = res[0]
+        self.assertEqual((log_pos, xid, spilled), (3000, None, True))
+        self.assertEqual([row["id"] for (_, _, _, row) in rows], range(200))
+        self.assertEqual(res[1], (4000, 43, False, []))
+
+    def testLargeEvent(self):
+        # one event of 1000 rows, spilled as it is added.
+        trans = Transaction(2000)
+        trans.add(WriteRowsEvent(make_write_rows(3, range(1000)),
+                                 {3:{"schema":"db", "table":"t",
+                                     "column_schemas":[{"COLUMN_NAME":"id",
+                                         "REAL_TYPE":FieldType.LONG,
+                                         "IS_UNSIGNED":False}]}}, {}))
+        self.assertTrue(trans.spilled)
+        self.assertTrue(0 < len(trans._rows) < 100)
+        self.assertTrue(trans._size <= 2000)
+        self.assertEqual([row["id"] for (_, _, _, row) in trans],
+                         range(1000))
+        trans.close()
+
+    def testClose(self):
+        trans = Transaction(0)
+        trans.add(WriteRowsEvent(make_write_rows(3, [1]),
+                                 {3:{"schema":"db", "table":"t",
+                                     "column_schemas":[{"COLUMN_NAME":"id",
+                                         "REAL_TYPE":FieldType.LONG,
+                                         "IS_UNSIGNED":False}]}}, {}))
+        self.assertTrue(trans.spilled)
+        self.assertEqual(len(trans), 1)
+        trans.close()
+        self.assertFalse(trans.spilled)
+        self.assertEqual(list(trans), [])
+
+
+if __name__ == "__main__":
+    unittest.main()